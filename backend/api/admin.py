@@ -0,0 +1,100 @@
+"""节点运维接口：需 X-Admin-Token 与环境变量 ADMIN_TOKEN 一致；未配置 ADMIN_TOKEN 时全部禁用。"""
+
+import os
+import hmac
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+from core.data_manager import data_manager
+from core.profiler import profile_store
+from core.snapshot import build_manifest, snapshot_part, encode_part, CHECKSUM_HEADER
+from api.encoding import ARROW_STREAM_MEDIA_TYPE
+
+router = APIRouter(prefix="/api/v1/admin")
+
+# 快照分区大小：每个分区包含的股票/板块代码数
+SNAPSHOT_CODES_PER_PART = int(os.getenv("SNAPSHOT_CODES_PER_PART", "200"))
+
+# 后台任务引用（防止事件循环只持有弱引用导致任务被回收）
+_background = set()
+
+
+def is_admin(token: Optional[str]) -> bool:
+    expected = os.getenv("ADMIN_TOKEN", "")
+    return bool(expected) and token is not None and hmac.compare_digest(token, expected)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not os.getenv("ADMIN_TOKEN"):
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled (ADMIN_TOKEN not set)")
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def _reload_status() -> dict:
+    return {"reloading": data_manager.reloading, "generation": data_manager.generation,
+            "revision": data_manager.dataset_revision, "inflight": data_manager.inflight(),
+            "last_reload": data_manager.last_reload}
+
+
+@router.post("/reload", status_code=202, dependencies=[Depends(require_admin)])
+async def reload_dataset(force: bool = False, max_rss_gb: Optional[float] = None):
+    """后台加载新一代数据集并原子替换，旧代在途请求排空后释放；进度见 GET /admin/reload"""
+    if data_manager.reloading:
+        raise HTTPException(status_code=409, detail="Reload already in progress")
+    task = asyncio.create_task(data_manager.reload(force=force, max_rss_gb=max_rss_gb))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    # 让出一次事件循环，使重载报告进入 loading 状态后再返回
+    await asyncio.sleep(0)
+    return _reload_status()
+
+
+@router.get("/reload", dependencies=[Depends(require_admin)])
+def reload_status():
+    return {**_reload_status(), "resident_bytes": data_manager.resident_bytes()}
+
+
+@router.get("/snapshot", dependencies=[Depends(require_admin)])
+def snapshot_manifest():
+    """热启动快照清单：build_id、revision、数据版本、本节点分片与各表分区数"""
+    if data_manager.df_daily is None:
+        raise HTTPException(status_code=503, detail="Nodes are loading data...")
+    return build_manifest(data_manager, SNAPSHOT_CODES_PER_PART)
+
+
+@router.get("/snapshot/part", dependencies=[Depends(require_admin)])
+def snapshot_part_endpoint(table: str, shard: str, part: int, version: int):
+    """单个快照分区（LZ4 Arrow IPC stream），SHA-256 见 X-Snapshot-SHA256；数据版本已变化返回 409"""
+    gen = data_manager.view()
+    if gen.df_daily is None:
+        raise HTTPException(status_code=503, detail="Nodes are loading data...")
+    if version != gen.data_version:
+        raise HTTPException(status_code=409, detail=f"Snapshot version changed ({gen.data_version})")
+    try:
+        frame = snapshot_part(data_manager, table, shard, part, SNAPSHOT_CODES_PER_PART)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    body, checksum = encode_part(frame)
+    return Response(content=body, media_type=ARROW_STREAM_MEDIA_TYPE,
+                    headers={CHECKSUM_HEADER: checksum, "X-Count": str(len(frame))})
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+def list_profiles():
+    """环形缓冲区内的剖析记录摘要（最新在前）"""
+    return {"capacity": profile_store.capacity, "profiles": profile_store.list()}
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def get_profile(profile_id: str, format: str = "json"):
+    """单条剖析记录；format=collapsed 返回纯文本折叠栈（flamegraph.pl / speedscope 可直接读取）"""
+    record = profile_store.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found (expired from ring buffer or never recorded)")
+    if format == "collapsed":
+        return PlainTextResponse("\n".join(record["collapsed"]) + "\n")
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be json or collapsed")
+    return record
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException
+from api.routes import SelectionRequest, BatchSelectionRequest, BacktestRequest
+from core.coordinator import coordinator, NodeClientError
+
+router = APIRouter(prefix="/api/v1")
+
+
+async def _run(call, payload: dict, timeout_ms=None):
+    if not coordinator.nodes:
+        raise HTTPException(status_code=503, detail="COORDINATOR_NODES not configured")
+    try:
+        merged = await call(payload, timeout_ms / 1000 if timeout_ms else None)
+    except NodeClientError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if not merged["shards"]["ok"]:
+        raise HTTPException(status_code=503, detail={"error": "All shards unavailable", "shards": merged["shards"]})
+    return merged
+
+
+@router.post("/select")
+async def coordinated_select(req: SelectionRequest):
+    """全市场选股：扇出到所有分片并合并（Top-K 归并、投影列重排），缺失分片见 shards.missing"""
+    if req.format != "json":
+        raise HTTPException(status_code=400, detail="Coordinator only supports format=json")
+    return await _run(coordinator.select, req.model_dump(exclude_none=True), req.timeout_ms)
+
+
+@router.post("/select-batch")
+async def coordinated_select_batch(req: BatchSelectionRequest):
+    return await _run(coordinator.select_batch, req.model_dump(exclude_none=True), req.timeout_ms)
+
+
+@router.post("/backtest")
+async def coordinated_backtest(req: BacktestRequest):
+    return await _run(coordinator.backtest, req.model_dump(exclude_none=True), req.timeout_ms)
+
+
+@router.get("/coordinator/status")
+def coordinator_status():
+    return {"nodes": coordinator.nodes, "routes": coordinator.routes, "node_health": coordinator.node_health,
+            "node_requests": coordinator.node_requests, "timeout_s": coordinator.timeout_s,
+            "hedge_after_s": coordinator.hedge_after_s, "stats": coordinator.stats}
@@ -0,0 +1,187 @@
+"""批量数据接口的响应编码与内容协商，以及按构建预压缩的静态响应。
+
+- Parquet（ZSTD）：体积最小，适合公网/移动端链路
+- Arrow IPC 流：免解码、客户端可零拷贝读取，适合内网与批量消费方；
+  可选 LZ4/ZSTD 缓冲区压缩，在带宽与 CPU 之间折中
+
+Arrow 编码直接由 Polars 的 Arrow 缓冲区写入 pyarrow 输出流，响应体以 memoryview
+引用该缓冲区，不经过 BytesIO 与 getvalue() 的额外拷贝。
+"""
+
+import io
+import os
+import gzip
+import json
+import hashlib
+import threading
+from typing import Optional
+import zstandard
+import polars as pl
+import pyarrow as pa
+from fastapi import HTTPException
+from fastapi.responses import Response
+from core.metrics import cache_hit
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：未安装时不提供 br 编码
+    brotli = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/octet-stream"
+
+FORMATS = ("parquet", "arrow")
+ARROW_COMPRESSIONS = ("none", "lz4", "zstd")
+
+
+def negotiate_format(fmt: Optional[str], accept: Optional[str], default: str = "parquet") -> str:
+    """
+    显式 format 参数优先；否则按 Accept 头选择（包含 Arrow 流媒体类型即返回 arrow）。
+    未声明时保持历史默认（Parquet），老客户端行为不变。
+    """
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt} (expected {'|'.join(FORMATS)})")
+        return fmt
+    if accept and ARROW_STREAM_MEDIA_TYPE in accept.lower():
+        return "arrow"
+    return default
+
+
+def arrow_ipc_response(df: pl.DataFrame, compression: Optional[str] = None, headers: dict = None) -> Response:
+    """将 DataFrame 编码为 Arrow IPC 流；compression 为 lz4/zstd 时对记录批缓冲区压缩"""
+    return arrow_ipc_batches_response([df], compression, headers)
+
+
+def arrow_ipc_batches_response(frames: list, compression: Optional[str] = None, headers: dict = None) -> Response:
+    """
+    多个同构 DataFrame 依次写成同一 IPC 流中的独立记录批（如批量 K 线每只股票一批），
+    客户端可按批拆分，服务端无需先 concat 成一张大表。
+    """
+    compression = (compression or "none").lower()
+    if compression not in ARROW_COMPRESSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported compression: {compression} (expected {'|'.join(ARROW_COMPRESSIONS)})")
+
+    tables = [df.to_arrow() for df in frames]
+    options = pa.ipc.IpcWriteOptions(compression=None if compression == "none" else compression)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tables[0].schema, options=options) as writer:
+        for table in tables:
+            writer.write_table(table)
+    body = memoryview(sink.getvalue())
+
+    rows = sum(len(df) for df in frames)
+    out = {"X-Node": str(os.getenv("NODE_INDEX")), "X-Count": str(rows), "X-Arrow-Compression": compression}
+    out.update(headers or {})
+    return Response(content=body, media_type=ARROW_STREAM_MEDIA_TYPE, headers=out)
+
+
+def parquet_response(df: pl.DataFrame, headers: dict = None) -> Response:
+    # 将 Polars DataFrame 写入内存中的 Parquet 文件，并使用 ZSTD 压缩；getbuffer() 直接引用内部缓冲区
+    buffer = io.BytesIO()
+    df.write_parquet(buffer, compression="zstd")
+    return Response(content=buffer.getbuffer(), media_type=PARQUET_MEDIA_TYPE, headers=headers)
+
+
+def frame_response(df: pl.DataFrame, fmt: str, compression: Optional[str] = None, headers: dict = None) -> Response:
+    if fmt == "arrow":
+        return arrow_ipc_response(df, compression, headers)
+    return parquet_response(df, headers)
+
+
+# ---- 预压缩静态响应（/stock-list、/nl-meta 等每个构建内不变的数据） ----
+
+STATIC_MAX_AGE_S = int(os.getenv("STATIC_MAX_AGE_S", "300"))
+# 协商优先级：压缩率高者优先
+ENCODING_PREFERENCE = ("br", "zstd", "gzip")
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available) -> str:
+    """按 Accept-Encoding（含 q 值）在已有编码中选择；无可用编码时返回 identity"""
+    if not accept_encoding:
+        return "identity"
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = "identity", 0.0
+    for enc in ENCODING_PREFERENCE:
+        if enc not in available:
+            continue
+        q = accepted.get(enc, wildcard)
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+class PrecompressedPayload:
+    """一次序列化、一次压缩的响应体；按客户端 Accept-Encoding 直接返回对应字节"""
+
+    def __init__(self, body: bytes, version: str, media_type: str = "application/json"):
+        self.media_type = media_type
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        self.etag = f'"{version}-{digest}"'
+        self.bodies = {
+            "identity": body,
+            "gzip": gzip.compress(body, compresslevel=9),
+            "zstd": zstandard.ZstdCompressor(level=19).compress(body),
+        }
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=11)
+
+    def respond(self, request) -> Response:
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": f"public, max-age={STATIC_MAX_AGE_S}",
+            "Vary": "Accept-Encoding",
+        }
+        inm = request.headers.get("if-none-match")
+        if inm and (inm.strip() == "*" or self.etag in [t.strip().removeprefix("W/") for t in inm.split(",")]):
+            return Response(status_code=304, headers=headers)
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), self.bodies)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.bodies[encoding], media_type=self.media_type, headers=headers)
+
+
+class StaticPayloadCache:
+    """
+    按 (名称, 版本键) 保存预压缩响应。序列化与压缩只在 put 中进行（数据加载/重载/挂接路径），
+    请求路径的 get 只做查找；每个名称保留最近 KEEP_VERSIONS 个版本，切换瞬间的旧版本请求仍可命中。
+    """
+
+    KEEP_VERSIONS = 2
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def put(self, name: str, version: str, payload) -> PrecompressedPayload:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        built = PrecompressedPayload(body, version)
+        with self._lock:
+            versions = {k: v for k, v in self._entries.get(name, {}).items() if k != version}
+            versions[version] = built
+            self._entries[name] = dict(list(versions.items())[-self.KEEP_VERSIONS:])
+        return built
+
+    def get(self, name: str, version: str) -> Optional[PrecompressedPayload]:
+        entry = self._entries.get(name, {}).get(version)
+        cache_hit("static_payload", entry is not None)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+static_payloads = StaticPayloadCache()
@@ -1,128 +1,455 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
 from fastapi.responses import Response # New import
 from pydantic import BaseModel
+from typing import List, Optional
 import polars as pl
 import os
 import re
 import psutil
-import psycopg2
 from pypinyin import pinyin, Style
 from core.data_manager import data_manager
-from core.engine import selection_engine
-from core.indicator_registry import nl_meta as build_nl_meta
+from core.engine import selection_engine, DEFAULT_DEADLINE_S, QueryTimeout, deadline_after, time_left
+from core.backtest import backtest_engine
+from core.usage import usage_aggregator
+from core.decimate import decimate as decimate_bars, DECIMATE_MODES
+from core.indicator_registry import nl_meta as build_nl_meta, WINDOW_NAMES, FIELDS
+from core.metrics import metrics, CONTENT_TYPE
+from core.profiler import profile_store, ProfilerBusy
+from api.encoding import arrow_ipc_response, arrow_ipc_batches_response, frame_response, negotiate_format, static_payloads
+from api.admin import is_admin
+import anyio
+import functools
 import logging
-import io # New import
+import time
+from contextlib import contextmanager
+from datetime import date
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1")
 
-# 正则用于提取公式中的指标 (从 engine 指标注册表派生，确保与支持指标同步)
-METRIC_REGEX = selection_engine.metric_pattern
+# Top-K 单节点返回上限
+SELECT_LIMIT_MAX = 5000
+# 投影列数上限
+SELECT_FIELDS_MAX = 20
+# 单次批量选股公式数上限
+BATCH_FORMULAS_MAX = 20
+# 采样剖析开关：请求头或查询参数，需同时携带 X-Admin-Token
+PROFILE_HEADER = "X-Profile-Run"
+PROFILE_QUERY = "sample_profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
 
 class SelectionRequest(BaseModel):
     formula: str
     timeframe: str = "D"
+    order_by: Optional[str] = None
+    limit: Optional[int] = None
+    descending: bool = True
+    fields: Optional[List[str]] = None
+    format: str = "json"
+    timeout_ms: Optional[int] = None
+    shards: Optional[List[int]] = None
+
+class BatchSelectionRequest(BaseModel):
+    formulas: List[str]
+    timeframe: str = "D"
+    compare_sequential: bool = False
+    timeout_ms: Optional[int] = None
+    shards: Optional[List[int]] = None
+
+class KlineBatchRequest(BaseModel):
+    codes: List[str]
+    timeframe: str = "D"
+    columns: Optional[List[str]] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    since: Optional[str] = None
+    format: Optional[str] = None
+    compression: Optional[str] = None
+
+class BacktestRequest(BaseModel):
+    formula: str
+    timeframe: str = "D"
+    horizons: Optional[List[int]] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    timeout_ms: Optional[int] = None
+    shards: Optional[List[int]] = None
 
 def report_metrics_usage(formula: str):
     """
-    后台任务：上报指标计数
+    后台任务：上报指标计数（进程内聚合，由 usage_aggregator 定期批量落库）
     策略：全周期统一 Key (如 MA_CLOSE_20)，不带后缀
     """
-    if not data_manager.postgres_url: return
-    
-    matches = METRIC_REGEX.findall(formula)
-    if not matches: return
-
+    usage_aggregator.record(formula)
+
+def _timeout_s(timeout_ms: Optional[int]) -> Optional[float]:
+    """请求级时限只能收紧、不能放宽节点默认时限"""
+    if timeout_ms is None:
+        return None
+    if timeout_ms <= 0:
+        raise HTTPException(status_code=400, detail="timeout_ms must be positive")
+    limit_s = timeout_ms / 1000
+    return min(limit_s, DEFAULT_DEADLINE_S) if DEFAULT_DEADLINE_S > 0 else limit_s
+
+def _raise_engine_error(result: dict):
+    # 422: 代价超预算；504: 超过墙钟时限已取消；其余为公式错误
+    raise HTTPException(status_code=result.get("status", 400), detail=result["error"])
+
+def _validate_shards(shards: Optional[List[int]]):
+    """请求限定的分片必须由本节点持有；421 表示路由到了错误节点（协调端换副本重试）"""
+    if shards is None:
+        return
+    if not shards:
+        raise HTTPException(status_code=400, detail="shards must not be empty")
+    missing = sorted(set(shards) - set(data_manager.shards))
+    if missing:
+        raise HTTPException(status_code=421, detail=f"Shards {missing} not served by this node (serves {data_manager.shards})")
+
+def _profile_requested(request: Request) -> bool:
+    """是否对本次请求做采样剖析；未携带开关时只做一次字典查找"""
+    flag = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY)
+    if not flag or flag.lower() in ("0", "false"):
+        return False
+    if not is_admin(request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=403, detail="Request profiling requires a valid X-Admin-Token")
+    return True
+
+@contextmanager
+def _profiled(kind: str, params: dict):
+    """剖析 with 块；失败的请求同样留存剖析记录，并在错误响应头中返回 ID"""
     try:
-        conn = psycopg2.connect(data_manager.postgres_url)
-        cur = conn.cursor()
-        for func, field, param in matches:
-            # 统一 Key 格式: MA_CLOSE_20
-            metric_key = f"{func.upper()}_{field.upper()}_{param}"
-            
-            # UPSERT
-            cur.execute("""
-                INSERT INTO metrics_stats (metric_key, usage_count, last_used)
-                VALUES (%s, 1, CURRENT_TIMESTAMP)
-                ON CONFLICT (metric_key) 
-                DO UPDATE SET usage_count = metrics_stats.usage_count + 1, last_used = CURRENT_TIMESTAMP;
-            """, (metric_key,))
-        conn.commit()
-        cur.close()
-        conn.close()
-    except Exception as e:
-        print(f"DB Report Error: {e}")
+        with profile_store.capture(kind, params) as session:
+            try:
+                yield session
+            except HTTPException as e:
+                e.headers = {**(e.headers or {}), PROFILE_ID_HEADER: session.id}
+                raise
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+def _validate_selection(req: SelectionRequest):
+    if req.limit is not None and not (1 <= req.limit <= SELECT_LIMIT_MAX):
+        raise HTTPException(status_code=400, detail=f"limit must be within 1..{SELECT_LIMIT_MAX}")
+    if req.fields is not None and len(req.fields) > SELECT_FIELDS_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {SELECT_FIELDS_MAX} fields allowed")
+    if req.format not in ("json", "arrow"):
+        raise HTTPException(status_code=400, detail="format must be json or arrow")
+    _validate_shards(req.shards)
+
+def _selection_payload(req: SelectionRequest, frame: pl.DataFrame) -> dict:
+    response = {"node": os.getenv("NODE_INDEX"), "count": len(frame), "results": frame["code"].to_list()}
+    if req.order_by:
+        # 有界 Top-K：结果按 order_by 有序，values 与 results 一一对应，便于协调端 K 路归并
+        response.update({"values": frame["_order"].to_list(), "order_by": req.order_by,
+                         "descending": req.descending})
+    if req.limit is not None:
+        response["limit"] = req.limit
+    if req.fields:
+        # 列式 JSON：每列一个数组，按行对齐
+        response["columns"] = {c: frame[c].to_list() for c in frame.columns if c != "_order"}
+    return response
 
 @router.post("/select")
-async def select_stocks(req: SelectionRequest, background_tasks: BackgroundTasks):
+async def select_stocks(req: SelectionRequest, background_tasks: BackgroundTasks, request: Request, response: Response,
+                        profile: int = 0):
     if data_manager.df_daily is None:
         raise HTTPException(status_code=503, detail="Nodes are loading data...")
-    
-    results = selection_engine.execute_selector(req.formula, req.timeframe, background_tasks)
-    
-    if isinstance(results, dict) and "error" in results:
-        raise HTTPException(status_code=400, detail=results["error"])
-    
+    _validate_selection(req)
+    if profile and req.format != "json":
+        raise HTTPException(status_code=400, detail="profile is only supported with format=json")
+
+    # 选股为 CPU 密集的同步计算，放到线程池执行，不阻塞事件循环
+    return await anyio.to_thread.run_sync(_select_request, req, background_tasks, request, response, profile)
+
+def _select_request(req: SelectionRequest, background_tasks: BackgroundTasks, request: Request, response: Response,
+                    profile: int):
+    # X-Profile-Run / sample_profile=1（管理员）：整次请求在采样剖析下执行，记录存入环形缓冲区
+    # （采样器按线程采样，因此剖析与选股须在同一工作线程内）
+    if _profile_requested(request):
+        with _profiled("select", req.model_dump(exclude_none=True)) as session:
+            result = _select(req, background_tasks, profile, session)
+        if isinstance(result, Response):
+            result.headers[PROFILE_ID_HEADER] = session.id
+        else:
+            result["profile_id"] = session.id
+            response.headers[PROFILE_ID_HEADER] = session.id
+        return result
+    return _select(req, background_tasks, profile)
+
+def _select(req: SelectionRequest, background_tasks: BackgroundTasks, profile: int, session=None):
+    # profile=1：在真实执行路径上采集分阶段耗时与执行计划，随结果一并返回
+    prof = None
+    if profile or session is not None:
+        frame, prof = selection_engine.explain(req.formula, req.timeframe, order_by=req.order_by, limit=req.limit,
+                                               descending=req.descending, fields=req.fields,
+                                               timeout_s=_timeout_s(req.timeout_ms), shards=req.shards)
+        if session is not None:
+            session.attach(selection=prof.to_dict())
+    else:
+        frame = selection_engine.select_frame(req.formula, req.timeframe, req.order_by, req.limit,
+                                              req.descending, req.fields, timeout_s=_timeout_s(req.timeout_ms),
+                                              shards=req.shards)
+    if isinstance(frame, dict):
+        _raise_engine_error(frame)
+
     # 上报热度 (不再需要传 timeframe)
     background_tasks.add_task(report_metrics_usage, req.formula)
-    
-    return {"node": os.getenv("NODE_INDEX"), "count": len(results), "results": results}
 
-@router.get("/kline")
-def get_kline(code: str, timeframe: str = "D"):
-    df = data_manager.df_daily
-    if timeframe == "W": df = data_manager.df_weekly
-    elif timeframe == "M": df = data_manager.df_monthly
+    if req.format == "arrow":
+        return arrow_ipc_response(frame)
 
-    if df is None: raise HTTPException(status_code=503, detail="Data not ready")
-    
-    # 过滤并排序
-    stock_df = df.filter(pl.col("code") == code).sort("date")
+    t0 = time.perf_counter()
+    payload = _selection_payload(req, frame)
+    if profile:
+        prof.timings_ms["serialize"] = round((time.perf_counter() - t0) * 1000, 3)
+        payload["profile"] = prof.to_dict()
+    return payload
 
-    # 动态选择存在的列，防止请求周/月线时崩溃
-    target_cols = ["date", "code", "open", "high", "low", "close", "volume", "amount", "turn", "pctChg", "peTTM", "pbMRQ", "isST", "adjustFactor", "net_amount", "main_net", "super_net", "large_net", "medium_net", "small_net", "total_shares", "float_shares", "total_mv", "float_mv", "product_ratios", "forecast_type", "forecast_yoy", "is_forecast_good", "is_forecast_bad"]
-    available_cols = [col for col in target_cols if col in stock_df.columns]
-    stock_df = stock_df.select(available_cols)
+@router.post("/explain")
+async def explain_selection(req: SelectionRequest):
+    """选股诊断：执行一次真实选股，仅返回规范化公式、回看窗口、Hot-JIT 命中、优化计划与分阶段耗时"""
+    if data_manager.df_daily is None:
+        raise HTTPException(status_code=503, detail="Nodes are loading data...")
+    _validate_selection(req)
+
+    frame, prof = await anyio.to_thread.run_sync(functools.partial(
+        selection_engine.explain, req.formula, req.timeframe, order_by=req.order_by, limit=req.limit,
+        descending=req.descending, fields=req.fields, timeout_s=_timeout_s(req.timeout_ms), shards=req.shards))
+    if isinstance(frame, dict):
+        _raise_engine_error(frame)
+
+    t0 = time.perf_counter()
+    _selection_payload(req, frame)
+    prof.timings_ms["serialize"] = round((time.perf_counter() - t0) * 1000, 3)
+    return {"node": os.getenv("NODE_INDEX"), "count": len(frame), "profile": prof.to_dict()}
+
+@router.post("/select-batch")
+async def select_batch(req: BatchSelectionRequest, background_tasks: BackgroundTasks):
+    """批量选股：N 个公式单次扫描，按公式顺序返回各自结果"""
+    if data_manager.df_daily is None:
+        raise HTTPException(status_code=503, detail="Nodes are loading data...")
+    if not req.formulas or len(req.formulas) > BATCH_FORMULAS_MAX:
+        raise HTTPException(status_code=400, detail=f"formulas must contain 1..{BATCH_FORMULAS_MAX} items")
+    _validate_shards(req.shards)
+
+    t0 = time.perf_counter()
+    outputs = await anyio.to_thread.run_sync(selection_engine.execute_batch, req.formulas, req.timeframe,
+                                             _timeout_s(req.timeout_ms), req.shards)
+    response = {"node": os.getenv("NODE_INDEX"), "timeframe": req.timeframe,
+                "batch": outputs, "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2)}
+
+    if req.compare_sequential:
+        # 吞吐对比：同一批公式逐个走单公式路径（Hot-JIT 已挂载，对比的是扫描/Join/计算开销），
+        # 与批量路径相同的分片与墙钟时限；超时即停止对比并报告
+        sequential_ms, error = await anyio.to_thread.run_sync(_run_sequential, req)
+        if error:
+            response["sequential_error"] = error
+            response["sequential_ms"] = response["speedup"] = None
+        else:
+            response["sequential_ms"] = round(sequential_ms, 2)
+            response["speedup"] = round(sequential_ms / response["elapsed_ms"], 2) if response["elapsed_ms"] else None
+
+    for formula in req.formulas:
+        background_tasks.add_task(report_metrics_usage, formula)
+
+    return response
+
+def _run_sequential(req: BatchSelectionRequest):
+    """逐个公式执行单公式路径，返回 (耗时毫秒, 超时错误或 None)"""
+    deadline = deadline_after(_timeout_s(req.timeout_ms))
+    t0 = time.perf_counter()
+    for formula in req.formulas:
+        try:
+            result = selection_engine.select_frame(formula, req.timeframe, timeout_s=time_left(deadline),
+                                                   shards=req.shards)
+        except QueryTimeout as e:
+            result = {"error": str(e), "status": 504}
+        if isinstance(result, dict) and result.get("status") == 504:
+            return None, result["error"]
+    return (time.perf_counter() - t0) * 1000, None
+
+@router.post("/backtest")
+async def backtest(req: BacktestRequest, background_tasks: BackgroundTasks):
+    """全历史信号回测：返回本节点可合并的部分聚合（协调端用 merge_backtest_partials 合并）"""
+    if data_manager.df_daily is None:
+        raise HTTPException(status_code=503, detail="Nodes are loading data...")
+    _validate_shards(req.shards)
+
+    result = await anyio.to_thread.run_sync(backtest_engine.run, req.formula, req.timeframe, req.horizons,
+                                            req.start, req.end, _timeout_s(req.timeout_ms), req.shards)
 
+    if "error" in result:
+        _raise_engine_error(result)
+
+    background_tasks.add_task(report_metrics_usage, req.formula)
 
+    return {"node": os.getenv("NODE_INDEX"), **result}
 
-    if len(stock_df) == 0:
+KLINE_TABLES = {"D": "df_daily", "W": "df_weekly", "M": "df_monthly"}
+SECTOR_KLINE_TABLES = {"D": "df_sector_daily", "W": "df_sector_weekly", "M": "df_sector_monthly"}
+KLINE_COLUMNS = ["date", "code", "open", "high", "low", "close", "volume", "amount", "turn", "pctChg", "peTTM", "pbMRQ", "isST", "adjustFactor", "net_amount", "main_net", "super_net", "large_net", "medium_net", "small_net", "total_shares", "float_shares", "total_mv", "float_mv", "product_ratios", "forecast_type", "forecast_yoy", "is_forecast_good", "is_forecast_bad"]
+# 降采样目标点数范围
+KLINE_POINTS_MIN = 10
+KLINE_POINTS_MAX = 10000
+# 单次批量 K 线代码数上限
+KLINE_BATCH_MAX = 500
+SECTOR_KLINE_COLUMNS = ["date", "code", "name", "type", "open", "high", "low", "close", "volume", "amount"]
+
+
+def _parse_date_param(name: str, value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: {value} (expected YYYY-MM-DD)")
+
+
+def _date_window(df: pl.DataFrame, start_d=None, end_d=None, since_d=None) -> pl.DataFrame:
+    """单代码切片内日期有序：用二分查找定位区间，避免逐行比较"""
+    if start_d is None and end_d is None and since_d is None:
+        return df
+    dates = df["date"]
+    lo, hi = 0, len(df)
+    if start_d is not None:
+        lo = max(lo, dates.search_sorted(start_d, side="left"))
+    if since_d is not None:
+        lo = max(lo, dates.search_sorted(since_d, side="right"))
+    if end_d is not None:
+        hi = min(hi, dates.search_sorted(end_d, side="right"))
+    return df.slice(lo, max(hi - lo, 0))
+
+
+def _kline_columns(columns) -> list:
+    """解析 columns=close,volume（或列表）形式的列投影；date/code 总是返回"""
+    if not columns:
+        return KLINE_COLUMNS
+    if isinstance(columns, str):
+        columns = columns.split(",")
+    requested = [c.strip() for c in columns if c.strip()]
+    unknown = [c for c in requested if c not in KLINE_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+    return ["date", "code"] + [c for c in requested if c not in ("date", "code")]
+
+
+@router.get("/kline")
+def get_kline(request: Request, code: str, timeframe: str = "D", columns: Optional[str] = None,
+              start: Optional[str] = None, end: Optional[str] = None, since: Optional[str] = None,
+              format: Optional[str] = None, compression: Optional[str] = None,
+              points: Optional[int] = None, decimate: str = "ohlc"):
+    """
+    单票 K 线（默认 Parquet；format=arrow 或 Accept: application/vnd.apache.arrow.stream 返回 Arrow IPC 流，
+    compression=lz4|zstd 压缩 Arrow 缓冲区）。
+    - columns: 逗号分隔的列投影，如 columns=close,volume（date/code 总是返回）
+    - start/end: 闭区间日期过滤 (YYYY-MM-DD)
+    - since: 增量拉取，仅返回 date > since 的新 K 线；无新数据时返回空表而非 404
+    - points: 目标点数，超出时服务端降采样；decimate=ohlc（K 线分桶聚合，默认）| lttb（折线保形选点）
+    """
+    if _profile_requested(request):
+        params = {k: v for k, v in request.query_params.items() if k != PROFILE_QUERY}
+        with _profiled("kline", params) as session:
+            resp = _kline(request, code, timeframe, columns, start, end, since, format, compression, points, decimate)
+        resp.headers[PROFILE_ID_HEADER] = session.id
+        return resp
+    return _kline(request, code, timeframe, columns, start, end, since, format, compression, points, decimate)
+
+def _kline(request, code, timeframe, columns, start, end, since, format, compression, points, decimate):
+    fmt = negotiate_format(format, request.headers.get("accept"))
+    if points is not None and not (KLINE_POINTS_MIN <= points <= KLINE_POINTS_MAX):
+        raise HTTPException(status_code=400, detail=f"points must be within {KLINE_POINTS_MIN}..{KLINE_POINTS_MAX}")
+    if decimate not in DECIMATE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported decimate: {decimate} (expected {'|'.join(DECIMATE_MODES)})")
+    target_cols = _kline_columns(columns)
+    if points is not None and decimate == "lttb" and "close" not in target_cols:
+        # LTTB 以 close 为折线纵轴，投影中没有 close 时无法降采样
+        raise HTTPException(status_code=422, detail="decimate=lttb requires the close column")
+    start_d = _parse_date_param("start", start)
+    end_d = _parse_date_param("end", end)
+    since_d = _parse_date_param("since", since)
+
+    attr = KLINE_TABLES.get(timeframe, "df_daily")
+    gen = data_manager.view()
+    if getattr(gen, attr, None) is None:
+        raise HTTPException(status_code=503, detail="Data not ready")
+
+    # 行区间索引切片（无索引时退化为过滤），已按日期升序
+    stock_df = gen.code_slice(attr, code)
+    if stock_df is None:
         raise HTTPException(status_code=404, detail="Stock not found")
 
-    # 将 Polars DataFrame 写入内存中的 Parquet 文件，并使用 ZSTD 压缩
-    buffer = io.BytesIO()
-    stock_df.write_parquet(buffer, compression="zstd")
-    buffer.seek(0) # 将文件指针移到开头
-    
+    # 动态选择存在的列，防止请求周/月线时崩溃
+    stock_df = stock_df.select([col for col in target_cols if col in stock_df.columns])
+    stock_df = _date_window(stock_df, start_d, end_d, since_d)
 
-    # 以二进制响应的形式返回 Parquet 数据
-    return Response(content=buffer.getvalue(), media_type="application/octet-stream")
+    headers = None
+    if points is not None and len(stock_df) > points:
+        source_count = len(stock_df)
+        stock_df = decimate_bars(stock_df, points, decimate)
+        # 仅在确实减少了行数时声明降采样
+        if len(stock_df) < source_count:
+            headers = {"X-Source-Count": str(source_count), "X-Decimated": decimate}
+
+    return frame_response(stock_df, fmt, compression, headers)
 
-@router.get("/sector-kline")
-def get_sector_kline(code: str, timeframe: str = "D"):
-    if timeframe == "W":
-        df = getattr(data_manager, "df_sector_weekly", None)
-    elif timeframe == "M":
-        df = getattr(data_manager, "df_sector_monthly", None)
-    else:
-        df = data_manager.df_sector_daily
 
+@router.post("/kline-batch")
+def get_kline_batch(req: KlineBatchRequest, request: Request):
+    """
+    多代码批量 K 线：逐个按行区间索引取切片，一次编码返回。
+    - Parquet：按请求顺序拼接为一张表，同一代码的行连续
+    - Arrow：每个代码一个记录批，客户端可按批拆分
+    非本节点负责（或不存在）的代码静默跳过，前端可直接向所有节点广播同一请求。
+    """
+    if not req.codes:
+        raise HTTPException(status_code=400, detail="codes must not be empty")
+    if len(req.codes) > KLINE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {KLINE_BATCH_MAX} codes per request")
+    fmt = negotiate_format(req.format, request.headers.get("accept"))
+    target_cols = _kline_columns(req.columns)
+    start_d = _parse_date_param("start", req.start)
+    end_d = _parse_date_param("end", req.end)
+    since_d = _parse_date_param("since", req.since)
+
+    attr = KLINE_TABLES.get(req.timeframe, "df_daily")
+    gen = data_manager.view()
+    df = getattr(gen, attr, None)
     if df is None:
         raise HTTPException(status_code=503, detail="Data not ready")
+    cols = [col for col in target_cols if col in df.columns]
+
+    frames = []
+    for code in dict.fromkeys(req.codes):
+        sliced = gen.code_slice(attr, code)
+        if sliced is None:
+            continue
+        sliced = _date_window(sliced.select(cols), start_d, end_d, since_d)
+        if len(sliced):
+            frames.append(sliced)
+    if not frames:
+        frames = [df.head(0).select(cols)]
+
+    headers = {"X-Codes": str(sum(1 for f in frames if len(f)))}
+    if fmt == "arrow":
+        return arrow_ipc_batches_response(frames, req.compression, headers)
+    return frame_response(pl.concat(frames, rechunk=False), fmt, headers=headers)
 
-    sector_df = df.filter(pl.col("code") == code).sort("date")
-    if len(sector_df) == 0:
-        raise HTTPException(status_code=404, detail="Sector not found")
+@router.get("/sector-kline")
+def get_sector_kline(request: Request, code: str, timeframe: str = "D",
+                     format: Optional[str] = None, compression: Optional[str] = None):
+    fmt = negotiate_format(format, request.headers.get("accept"))
+    attr = SECTOR_KLINE_TABLES.get(timeframe, "df_sector_daily")
+    gen = data_manager.view()
+    if getattr(gen, attr, None) is None:
+        raise HTTPException(status_code=503, detail="Data not ready")
 
-    target_cols = ["date", "code", "name", "type", "open", "high", "low", "close", "volume", "amount"]
-    available_cols = [col for col in target_cols if col in sector_df.columns]
-    sector_df = sector_df.select(available_cols)
+    sector_df = gen.code_slice(attr, code)
+    if sector_df is None:
+        raise HTTPException(status_code=404, detail="Sector not found")
 
-    buffer = io.BytesIO()
-    sector_df.write_parquet(buffer, compression="zstd")
-    buffer.seek(0)
-    return Response(content=buffer.getvalue(), media_type="application/octet-stream")
+    available_cols = [col for col in SECTOR_KLINE_COLUMNS if col in sector_df.columns]
+    return frame_response(sector_df.select(available_cols), fmt, compression)
 
 def _get_pinyin_initials(text: str) -> str:
     """获取中文文本的拼音首字母，并转换为小写"""
@@ -150,7 +477,7 @@ def search_stocks(q: str):
 
     results = []
     
-    for code, name in data_manager.code_to_name.items():
+    for code, name in data_manager.view().code_to_name.items():
         name_lower = name.lower()
         name_pinyin_initials = _get_pinyin_initials(name)
         logger.debug(f"Checking stock: code={code}, name={name}, name_lower={name_lower}, name_pinyin_initials={name_pinyin_initials}")
@@ -164,25 +491,43 @@ def search_stocks(q: str):
             
     return results
 
-@router.get("/stock-list")
-def get_stock_list():
-    """返回所有股票代码与名称的映射，仅用于前端缓存"""
-    # 调试：打印前10条数据
-    sample = list(data_manager.code_to_name.items())[:10]
-    logger.info(f"Stock list sample: {sample}")
-    
+def _static_version(data_version: int = None) -> str:
+    return f"{data_manager.build_id}.{data_manager.view().data_version if data_version is None else data_version}"
+
+
+def _build_stock_list(source) -> list:
     # 过滤掉空名称的股票
-    filtered = [{"code": code, "name": name}
-                for code, name in data_manager.code_to_name.items()
-                if name and name.strip()]
-    
-    logger.info(f"Total stocks: {len(data_manager.code_to_name)}, Filtered: {len(filtered)}")
-    return filtered
+    return [{"code": code, "name": name}
+            for code, name in source.code_to_name.items()
+            if name and name.strip()]
+
+
+@data_manager.on_dataset_ready
+def prepare_static_payloads(source, data_version: int):
+    """新一代数据开始服务前序列化并预压缩股票列表，请求路径只做查找"""
+    static_payloads.put("stock-list", _static_version(data_version), _build_stock_list(source))
+
+
+# 指标注册表运行期不变：按构建在导入时预压缩一次
+static_payloads.put("nl-meta", data_manager.build_id, build_nl_meta())
+
+
+def _static_payload(name: str, version: str, request: Request):
+    payload = static_payloads.get(name, version)
+    if payload is None:
+        raise HTTPException(status_code=503, detail="Nodes are loading data...")
+    return payload.respond(request)
+
+
+@router.get("/stock-list")
+def get_stock_list(request: Request):
+    """返回所有股票代码与名称的映射，仅用于前端缓存（每个数据版本序列化并预压缩一次，支持 ETag/304）"""
+    return _static_payload("stock-list", _static_version(), request)
 
 @router.get("/stock-sectors")
 def get_stock_sectors(code: str):
     """返回股票所属的全部板块（行业+概念+地域）"""
-    sectors = data_manager.stock_sectors.get(code, [])
+    sectors = data_manager.view().sector_index.sectors_of(code)
     return {
         "code": code,
         "sectors": [
@@ -191,10 +536,26 @@ def get_stock_sectors(code: str):
         ],
     }
 
+@router.get("/sector-constituents")
+def get_sector_constituents(code: str):
+    """返回板块全部成分股（代码+名称），与 /stock-sectors 共用双向成员索引"""
+    gen = data_manager.view()
+    info = gen.sector_index.sector_info(code)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Sector not found")
+    members = gen.sector_index.constituents(code)
+    return {
+        "code": info[0],
+        "name": info[1],
+        "type": info[2],
+        "count": len(members),
+        "constituents": [{"code": c, "name": gen.code_to_name.get(c)} for c in members],
+    }
+
 @router.get("/nl-meta")
-def get_nl_meta():
-    """自然语言选股元数据：字段/指标/单位/示例（公开只读）"""
-    return build_nl_meta()
+def get_nl_meta(request: Request):
+    """自然语言选股元数据：字段/指标/单位/示例（公开只读；注册表运行期不变，按构建预压缩缓存）"""
+    return _static_payload("nl-meta", data_manager.build_id, request)
 
 @router.get("/status")
 def get_node_status():
@@ -208,6 +569,8 @@ def get_node_status():
     return {
         "node": os.getenv("NODE_INDEX"),
         "status": "healthy" if data_manager.df_daily is not None else "loading",
+        "shards": data_manager.shards,
+        "shared": data_manager.shared_status(),
         
         # 进程内存
         "process_memory_gb": round(mem_info.rss / (1024**3), 2),
@@ -228,7 +591,66 @@ def get_node_status():
 def health_check():
     # 只要 Uvicorn 跑起来就回 200，防止 HF 杀掉进程
     # 增加 build_id 返回以进行高可用的版本比对，防止滚动更新假阳性
+    # shards/total_shards 供协调端发现副本并构建路由表
+    # 加载失败（含共享加载者失败）时报 failed 并附带原因，协调端不会把它当作可用副本
     b_id = getattr(data_manager, "build_id", "unknown")
     if data_manager.df_daily is not None:
-        return {"status": "healthy", "build_id": b_id}
-    return {"status": "initializing", "build_id": b_id}
+        status = "healthy"
+    else:
+        status = "failed" if data_manager.load_error else "initializing"
+    body = {"status": status, "build_id": b_id, "node": data_manager.node_index,
+            "shards": data_manager.shards, "total_shards": data_manager.total_nodes}
+    if status == "failed":
+        body["error"] = data_manager.load_error
+    return body
+
+
+# ---- Prometheus 指标：采集时计算的 gauge ----
+_HOT_JIT_COLUMN = re.compile(rf"^({'|'.join(WINDOW_NAMES)})_({'|'.join(FIELDS)})_\d+$")
+
+
+def _frames():
+    for attr in data_manager.DATASET_ATTRS:
+        df = getattr(data_manager, attr, None)
+        if isinstance(df, pl.DataFrame):
+            yield attr, df
+
+
+def _hot_jit_columns():
+    for attr, df in _frames():
+        cols = [c for c in df.columns if _HOT_JIT_COLUMN.match(c)]
+        if cols:
+            yield attr, cols, df.select(cols).estimated_size()
+
+
+def _threadpool():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return [({"state": "busy"}, limiter.borrowed_tokens), ({"state": "capacity"}, limiter.total_tokens)]
+
+
+metrics.gauge("blinkquant_resident_bytes", "Estimated resident bytes per table/index of the current generation",
+              lambda: [({"object": k}, v) for k, v in data_manager.resident_bytes().items()])
+metrics.gauge("blinkquant_table_rows", "Rows per loaded table",
+              lambda: [({"table": attr}, df.height) for attr, df in _frames()])
+metrics.gauge("blinkquant_hot_jit_columns", "Hot-JIT mounted indicator columns per table",
+              lambda: [({"table": attr}, len(cols)) for attr, cols, _ in _hot_jit_columns()])
+metrics.gauge("blinkquant_hot_jit_bytes", "Estimated bytes held by Hot-JIT mounted columns per table",
+              lambda: [({"table": attr}, size) for attr, _, size in _hot_jit_columns()])
+metrics.gauge("blinkquant_loader_stage_seconds", "Wall time of each stage of the last dataset load",
+              lambda: [({"stage": k}, v) for k, v in (data_manager.load_stages or {}).items()])
+metrics.gauge("blinkquant_requests_in_flight", "Requests currently pinned to any data generation",
+              lambda: [({}, data_manager.inflight_total())])
+metrics.gauge("blinkquant_threadpool_tokens", "Worker threadpool tokens (busy vs capacity) for sync endpoints",
+              _threadpool)
+metrics.gauge("blinkquant_data_generation", "Current in-process data generation",
+              lambda: [({}, data_manager.generation)])
+metrics.gauge("blinkquant_data_version", "Data version used for static payload ETags",
+              lambda: [({}, data_manager.data_version)])
+metrics.gauge("process_resident_memory_bytes", "Resident set size of this process",
+              lambda: [({}, psutil.Process(os.getpid()).memory_info().rss)])
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """Prometheus 文本格式指标（async：不占用线程池，线程池饱和时仍可抓取）"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
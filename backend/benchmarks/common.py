@@ -0,0 +1,147 @@
+"""基准测试公共部分：计时与分位数、RSS 时间线采样、运行环境信息、结果 JSON 与基线比较。"""
+
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import subprocess
+import psutil
+import polars as pl
+
+
+def percentiles(samples_ms: list) -> dict:
+    """{n, min, p50, p95, max}（毫秒，最近秩法；样本少时 p95 即最大值附近）"""
+    xs = sorted(samples_ms)
+    if not xs:
+        return {"n": 0}
+
+    def rank(q):
+        return xs[min(len(xs) - 1, max(0, round(q * (len(xs) - 1))))]
+    return {"n": len(xs), "min": round(xs[0], 3), "p50": round(rank(0.5), 3),
+            "p95": round(rank(0.95), 3), "max": round(xs[-1], 3)}
+
+
+def timed_ms(fn, *args, **kwargs):
+    """→ (耗时毫秒, 返回值)"""
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - t0) * 1000, result
+
+
+def rss() -> int:
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+class RssTimeline:
+    """后台线程按固定间隔记录 (相对秒, RSS)，事后按阶段时间窗取峰值"""
+
+    def __init__(self, interval_s: float = 0.02):
+        self.interval_s = interval_s
+        self.samples = []
+        self._halt = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._halt.wait(self.interval_s):
+            self.samples.append((time.perf_counter() - self.t0, rss()))
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        self.samples.append((0.0, rss()))
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._halt.set()
+        self._thread.join()
+        self.samples.append((time.perf_counter() - self.t0, rss()))
+
+    def peak(self, start_s: float = 0.0, end_s: float = float("inf")) -> int:
+        window = [r for t, r in self.samples if start_s <= t <= end_s]
+        return max(window) if window else 0
+
+    def stage_peaks(self, stages: list) -> dict:
+        """stages: 按执行顺序的 [(名称, 秒)]，首尾相接划分时间窗 → {名称: 峰值 RSS 字节}"""
+        peaks, start = {}, 0.0
+        for name, seconds in stages:
+            peaks[name] = self.peak(start, start + seconds + self.interval_s)
+            start += seconds
+        return peaks
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "commit": commit,
+            "python": sys.version.split()[0], "polars": pl.__version__, "platform": platform.platform(),
+            "cpus": os.cpu_count(), "polars_threads": pl.thread_pool_size(),
+            "memory_gb": round(psutil.virtual_memory().total / 1024 ** 3, 1)}
+
+
+def write_json(data: dict, path: str):
+    if path == "-":
+        json.dump(data, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+    with open(path, "w") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """嵌套结果 → {"select.D.CLOSE > MA(CLOSE, 20).warm.p50": 值}，只保留数值叶子"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def metric_unit(key: str):
+    """按路径判断指标单位：*_ms / p50 / p95 → ms，*_s → s，*_bytes → bytes；其余（命中数等）不参与比较"""
+    parts = key.split(".")
+    if parts[-1] in ("p50", "p95"):
+        return "ms"
+    for part in reversed(parts):
+        for unit in ("ms", "s", "bytes"):
+            if part.endswith("_" + unit):
+                return unit
+    return None
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2, floor_ms: float = 1.0) -> dict:
+    """
+    与基线逐项比较两边都有的计时/内存指标（越小越好）。比基线大 threshold 比例以上、
+    且绝对差超过噪声下限（floor_ms 毫秒 / 50ms / 16MiB）记为回归，反向记为改进。
+    """
+    floors = {"ms": floor_ms, "s": 0.05, "bytes": 16 * 1024 ** 2}
+    cur, base = flatten(current.get("results", current)), flatten(baseline.get("results", baseline))
+    regressions, improvements, compared = [], [], 0
+    for key in sorted(set(cur) & set(base)):
+        unit = metric_unit(key)
+        if unit is None:
+            continue
+        compared += 1
+        before, after = base[key], cur[key]
+        ratio = after / before if before else (float("inf") if after else 1.0)
+        row = {"metric": key, "baseline": before, "current": after, "ratio": round(ratio, 3)}
+        if after - before > floors[unit] and ratio > 1 + threshold:
+            regressions.append(row)
+        elif before - after > floors[unit] and ratio < 1 - threshold:
+            improvements.append(row)
+    return {"threshold": threshold, "compared": compared, "regressions": regressions, "improvements": improvements}
+
+
+def print_comparison(report: dict, out=sys.stderr):
+    print(f"Compared {report['compared']} metrics (threshold {report['threshold']:.0%}): "
+          f"{len(report['regressions'])} regressions, {len(report['improvements'])} improvements", file=out)
+    for title, rows in (("REGRESSION", report["regressions"]), ("improved", report["improvements"])):
+        for r in rows:
+            print(f"  {title:10s} {r['metric']}: {r['baseline']} -> {r['current']} (x{r['ratio']})", file=out)
@@ -0,0 +1,225 @@
+"""端到端基准：在合成数据集上测量加载（分阶段耗时与峰值 RSS）、/select、/kline、/search 延迟。
+
+- 数据集：--data-dir 已有目录直接使用；不存在时按 --codes/--years/--seed 用 scripts/gen_synthetic_data.py 生成
+- 加载：DataManager.async_load_data 的各阶段耗时（load_stages）与对应时间窗内的峰值 RSS
+  （下载与解析逐文件交替，合并为 read 阶段）
+- /select：EXAMPLE_QUERIES × 时间周期（跳过该周期表缺列的组合）；cold 为移除全部 Hot-JIT 挂载列后的首次执行，
+  warm 为挂载后重复执行；cold 未挂载任何列时两者走同一路径，条目标记 cold_vs_warm = "same_path"
+- /kline：按周期、Parquet/Arrow 两种编码，对抽样代码逐一请求；/search：代码前缀、名称子串、拼音首字母、未命中
+- 请求经完整 ASGI 应用（含中间件）在进程内发出，不含网络开销
+
+用法（在 backend 目录）：
+  python -m benchmarks.e2e --codes 1000 --years 5 --out bench.json
+  python -m benchmarks.e2e --codes 1000 --years 5 --baseline bench.json     # 与基线比较，回归时退出码 1
+  python -m benchmarks.e2e --compare old.json new.json                      # 只比较两份已有结果
+"""
+
+import os
+import sys
+import json
+import random
+import asyncio
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import (percentiles, timed_ms, rss, RssTimeline, environment, write_json,
+                               compare, print_comparison)
+
+# 与 DataManager.async_load_data 的阶段顺序一致
+LOAD_STAGES = ("list_files", "read", "integrate", "adjust", "resample", "indexes")
+KLINE_FORMATS = ("parquet", "arrow")
+# EXAMPLE_QUERIES 中的窗口指标（MA/SUM）首行为空，会被 Hot-JIT 的 head(1) 探测跳过；
+# 追加首行非空、可挂载的 EMA 查询，保证至少有一组真实的冷热对比
+HOT_JIT_QUERIES = ["CLOSE > EMA(CLOSE, 20)"]
+
+
+def ensure_dataset(args) -> str:
+    data_dir = args.data_dir or os.path.join(
+        "/tmp", f"blinkquant-bench-{args.codes}x{args.years}-s{args.seed}")
+    if not (os.path.isdir(data_dir) and any(f.endswith(".parquet") for f in os.listdir(data_dir))):
+        from scripts.gen_synthetic_data import generate
+        print(f"Generating synthetic dataset in {data_dir} ...", file=sys.stderr)
+        generate(data_dir, n_codes=args.codes, years=args.years, seed=args.seed)
+    return data_dir
+
+
+def bench_load(dm, data_dir: str) -> dict:
+    dm.data_dir = data_dir
+    before = rss()
+    with RssTimeline() as timeline:
+        ok = asyncio.run(dm.async_load_data())
+    if not ok:
+        raise RuntimeError(f"Dataset load failed: {dm.load_error}")
+    st = dm.load_stages
+    durations = {"list_files": st.get("list_files", 0.0), "read": st.get("download", 0.0) + st.get("parse", 0.0),
+                 **{name: st.get(name, 0.0) for name in LOAD_STAGES[2:]}}
+    return {
+        "stages_s": {**durations, "total": st.get("total", 0.0)},
+        "peak_rss_bytes": {**timeline.stage_peaks([(n, durations[n]) for n in LOAD_STAGES]),
+                           "total": timeline.peak()},
+        "rss_before_bytes": before,
+        "rss_after_bytes": rss(),
+        "resident_bytes": sum(dm.resident_bytes().values()),
+    }
+
+
+class HotJitReset:
+    """记录加载后各表的原始列，cold 运行前移除 Hot-JIT 挂载列（行序不变，行区间索引随表转移）"""
+
+    def __init__(self, dm):
+        self.dm = dm
+        self.base = {attr: getattr(dm, attr).columns for attr in dm.MOUNT_TABLES if getattr(dm, attr) is not None}
+
+    def __call__(self):
+        # 直接发布去掉挂载列的新代：Generation.with_table 保证行区间索引随表转移
+        with self.dm._gen_lock:
+            gen = self.dm._current
+            for attr, cols in self.base.items():
+                gen = gen.with_table(attr, getattr(gen, attr).select(cols))
+            self.dm._current = gen
+
+    def mounted(self) -> list:
+        """自上次重置以来新挂载的列（attr.column）"""
+        return [f"{attr}.{c}" for attr, cols in self.base.items()
+                for c in getattr(self.dm, attr).columns if c not in cols]
+
+
+def missing_columns(query: str, timeframe: str) -> list:
+    """查询在该周期（含板块关联后）的查询表上缺少的列；周/月线没有 peTTM、pctChg 等日线专有列"""
+    from core.engine import selection_engine
+    from core.security import blink_parser
+    _, lf = selection_engine._build_lazy_frame(timeframe)
+    available = set(lf.collect_schema().names())
+    try:
+        referenced = blink_parser.parse(query, timeframe).expr.meta.root_names()
+    except Exception:
+        return []   # 解析错误交由请求本身报告
+    return sorted(set(referenced) - available)
+
+
+def bench_select(client, reset, queries: list, timeframes: list, repeat: int) -> dict:
+    """
+    cold 与 warm 只有在 cold 运行实际挂载了 Hot-JIT 列时才走不同路径；
+    未挂载（如首行为空的窗口被 head(1) 探测跳过）的条目标记 cold_vs_warm = "same_path"。
+    缺列的 (查询, 周期) 组合不执行，记入 skipped。
+    """
+    out = {}
+    for tf in timeframes:
+        out[tf] = {}
+        for query in queries:
+            missing = missing_columns(query, tf)
+            if missing:
+                out.setdefault("skipped", {}).setdefault(tf, {})[query] = f"missing columns: {', '.join(missing)}"
+                continue
+            body = {"formula": query, "timeframe": tf}
+            reset()
+            cold_ms, res = timed_ms(client.post, "/api/v1/select", json=body)
+            entry = {"status": res.status_code, "cold_ms": round(cold_ms, 3)}
+            if res.status_code != 200:
+                entry["error"] = res.json().get("detail")
+                out[tf][query] = entry
+                continue
+            entry["hot_jit_mounted"] = reset.mounted()
+            entry["cold_vs_warm"] = "hot_jit" if entry["hot_jit_mounted"] else "same_path"
+            entry["hits"] = res.json()["count"]
+            entry["warm"] = percentiles([timed_ms(client.post, "/api/v1/select", json=body)[0]
+                                         for _ in range(repeat)])
+            out[tf][query] = entry
+    return out
+
+
+def bench_kline(client, codes: list, timeframes: list) -> dict:
+    out = {}
+    for tf in timeframes:
+        out[tf] = {}
+        for fmt in KLINE_FORMATS:
+            samples = []
+            for code in codes:
+                ms, res = timed_ms(client.get, "/api/v1/kline", params={"code": code, "timeframe": tf, "format": fmt})
+                if res.status_code == 200:
+                    samples.append(ms)
+            out[tf][fmt] = percentiles(samples)
+    return out
+
+
+def search_queries(dm, rng: random.Random) -> dict:
+    from api.routes import _get_pinyin_initials
+    names = sorted(dm.code_to_name.items())
+    code, name = rng.choice(names)
+    return {"code_prefix": code.split(".")[-1][:3], "name_substring": name[:2],
+            "pinyin_initials": _get_pinyin_initials(name)[:2], "miss": "zzzzzz"}
+
+
+def bench_search(client, queries: dict, repeat: int) -> dict:
+    return {label: percentiles([timed_ms(client.get, "/api/v1/search", params={"q": q})[0] for _ in range(repeat)])
+            for label, q in queries.items()}
+
+
+def run(args) -> dict:
+    data_dir = ensure_dataset(args)
+
+    # 导入应用时才构造 DataManager 单例；基准只关心 WARNING 以上日志
+    from fastapi.testclient import TestClient
+    from core.data_manager import data_manager as dm
+    from core.indicator_registry import EXAMPLE_QUERIES, TIMEFRAMES
+    import main
+    logging.getLogger().setLevel(logging.WARNING)
+    dm.shards = dm.parse_shards(args.shards, dm.node_index, dm.total_nodes)
+
+    load = bench_load(dm, data_dir)
+    client = TestClient(main.app)
+    rng = random.Random(args.seed)
+    timeframes = args.timeframes.split(",") if args.timeframes else TIMEFRAMES
+    universe = sorted(c for codes in dm.shard_codes.values() for c in codes)
+    codes = rng.sample(universe, min(args.kline_codes, len(universe)))
+
+    return {
+        "meta": {**environment(), "dataset": {"dir": data_dir, "revision": dm.dataset_revision,
+                                              "codes": len(universe), "daily_rows": dm.df_daily.height},
+                 "config": {"repeat": args.repeat, "shards": dm.shards, "kline_codes": len(codes),
+                            "timeframes": timeframes}},
+        "results": {
+            "load": load,
+            "select": bench_select(client, HotJitReset(dm), EXAMPLE_QUERIES + HOT_JIT_QUERIES, timeframes, args.repeat),
+            "kline": bench_kline(client, codes, timeframes),
+            "search": bench_search(client, search_queries(dm, rng), args.repeat),
+        },
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="BlinkQuant end-to-end benchmark")
+    ap.add_argument("--data-dir", help="synthetic dataset directory (generated if missing)")
+    ap.add_argument("--codes", type=int, default=1000)
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--shards", default="0,1,2", help="NODE_SHARDS to load (default: all shards on one node)")
+    ap.add_argument("--timeframes", help="comma list, default D,W,M")
+    ap.add_argument("--repeat", type=int, default=5, help="warm repetitions per measurement")
+    ap.add_argument("--kline-codes", type=int, default=50)
+    ap.add_argument("--out", default="-", help="result JSON path ('-' for stdout)")
+    ap.add_argument("--baseline", help="compare against a stored result; exit 1 on regressions")
+    ap.add_argument("--threshold", type=float, default=0.2, help="relative slowdown counted as regression")
+    ap.add_argument("--floor-ms", type=float, default=1.0, help="ignore latency differences below this")
+    ap.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two result files and exit")
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f0, open(args.compare[1]) as f1:
+            report = compare(json.load(f1), json.load(f0), args.threshold, args.floor_ms)
+        print_comparison(report)
+        return 1 if report["regressions"] else 0
+
+    result = run(args)
+    if args.baseline:
+        with open(args.baseline) as f:
+            result["comparison"] = compare(result, json.load(f), args.threshold, args.floor_ms)
+        print_comparison(result["comparison"])
+    write_json(result, args.out)
+    return 1 if result.get("comparison", {}).get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
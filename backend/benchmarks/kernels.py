@@ -0,0 +1,227 @@
+"""指标内核微基准：按注册表 signature 逐个构造参数，在合成 OHLCV 表上测量每个内核的耗时、吞吐与内存，
+并拟合出 cost_model 可直接加载的实测代价表。
+
+- 网格：股票数 × 历史长度（每股 bar 数）× 窗口；无 pos_int 参数的内核只测一次窗口（记为 1）
+- 参数：field/series → CLOSE，cond → CLOSE > OPEN，sector → 约 10% 股票，product → 约 10% 股票的暴露度，
+  pos_int 全部取当前窗口（多参数内核如 MACD 各参数同取 w，与 cost_model 取最大 pos_int 一致）
+- 单次测量超过 --time-cap-s 后，该内核同一窗口更大的规模记为 skipped（即"规模上危险"的内核）
+- 内存：结果列字节数 + 执行期间相对起点的峰值 RSS 增量（后台线程采样，短内核偏低）
+
+代价表拟合：每个内核按窗口汇总单行耗时 t(w) = Σ秒 / Σ行，对数空间最小二乘拟合 t(w) = a · w^b；
+以 MA 在参考窗口（默认 20）的单行耗时 / 20 为一个代价单位，cost = a / 单位，window_exponent = b。
+于是 cost_model 估算 cost × w^b × rows 时，MA(CLOSE, 20) 仍为 20 × rows，SELECT_COST_BUDGET 的量级不变。
+
+用法（在 backend 目录）：
+  python -m benchmarks.kernels --out kernel_costs.json
+  python -m benchmarks.kernels --kernels MA,SAR,AROON_UP --codes 500,2000 --bars 250 --windows 5,60
+  KERNEL_COST_TABLE=kernel_costs.json uvicorn main:app      # 引擎按实测代价表估算
+"""
+
+import os
+import sys
+import math
+import time
+import argparse
+import statistics
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import polars as pl
+from benchmarks.common import rss, RssTimeline, environment, write_json
+from core.indicator_registry import INDICATORS
+
+REFERENCE_KERNEL = "MA"
+START = date(2000, 1, 3)
+
+
+def make_frame(n_codes: int, bars: int, seed: int = 42) -> pl.DataFrame:
+    """按 (code, date) 排序的合成 OHLCV 表：对数收益随机游走，列名与引擎一致"""
+    idx = pl.int_range(n_codes * bars, dtype=pl.Int64)
+
+    def uniform(k):
+        return (idx.hash(seed + k) % 1_000_003).cast(pl.Float64) / 1_000_003
+
+    code_id = idx // bars
+    return (pl.select(
+                code=pl.lit("sz.") + code_id.cast(pl.String).str.zfill(6),
+                date=pl.lit(START) + pl.duration(days=idx % bars),
+                ret=(uniform(0) - 0.5) * 0.06, u_high=uniform(1), u_low=uniform(2), u_open=uniform(3),
+                volume=(uniform(4) * 5e6 + 1e5).floor(), code_id=code_id)
+            .with_columns(close=(pl.col("ret").cum_sum().over("code_id").exp() * 10).cast(pl.Float32))
+            .with_columns(open=pl.col("close") * (1 + (pl.col("u_open") - 0.5) * 0.02),
+                          high=pl.col("close") * (1 + pl.col("u_high") * 0.03),
+                          low=pl.col("close") * (1 - pl.col("u_low") * 0.03))
+            .with_columns(amount=pl.col("close") * pl.col("volume"))
+            .select("code", "date", "open", "high", "low", "close", "volume", "amount"))
+
+
+def kernel_args(signature: list, window: int, codes: pl.Series) -> list:
+    """按签名形态构造参数（同 Parser._visit_arg 的产物类型）"""
+    picked = codes.gather_every(10)
+    args = []
+    for kind in signature:
+        if kind in ("field", "series"):
+            args.append(pl.col("close"))
+        elif kind == "pos_int":
+            args.append(window)
+        elif kind == "cond":
+            args.append(pl.col("close") > pl.col("open"))
+        elif kind == "sector":
+            args.append(picked)
+        elif kind == "product":
+            args.append((picked.to_list(), [float(i % 100) for i in range(picked.len())]))
+        else:
+            raise ValueError(f"Unknown signature kind {kind}")
+    return args
+
+
+def measure(df: pl.DataFrame, expr: pl.Expr, repeat: int) -> dict:
+    """首轮同时采样 RSS；repeat 取中位数。单次超过 1 秒的内核不再重复"""
+    start = rss()
+    with RssTimeline(interval_s=0.005) as timeline:
+        t0 = time.perf_counter()
+        out = df.lazy().select(expr.alias("out")).collect()
+        samples = [time.perf_counter() - t0]
+    if samples[0] < 1.0:
+        for _ in range(repeat - 1):
+            t0 = time.perf_counter()
+            df.lazy().select(expr.alias("out")).collect()
+            samples.append(time.perf_counter() - t0)
+    median = statistics.median(samples)
+    return {"median_ms": round(median * 1000, 3), "min_ms": round(min(samples) * 1000, 3),
+            "rows_per_s": round(df.height / median) if median > 0 else None,
+            "out_bytes": out.estimated_size(), "peak_rss_delta_bytes": max(0, timeline.peak() - start)}
+
+
+def run_grid(kernels: list, sizes: list, windows: list, repeat: int, time_cap_s: float, seed: int, log=None) -> list:
+    """sizes: [(股票数, bar 数)]，按总行数升序执行；返回测量记录列表"""
+    records = []
+    capped = set()
+    for n_codes, bars in sorted(sizes, key=lambda s: s[0] * s[1]):
+        df = make_frame(n_codes, bars, seed)
+        codes = df["code"].unique(maintain_order=True)
+        for name in kernels:
+            entry = INDICATORS[name]
+            for window in (windows if "pos_int" in entry["signature"] else [1]):
+                base = {"kernel": name, "codes": n_codes, "bars": bars, "rows": df.height, "window": window}
+                if (name, window) in capped:
+                    records.append({**base, "skipped": f"exceeded {time_cap_s}s at a smaller size"})
+                    continue
+                expr = entry["func"](*kernel_args(entry["signature"], window, codes))
+                result = measure(df, expr, repeat)
+                if result["median_ms"] > time_cap_s * 1000:
+                    capped.add((name, window))
+                records.append({**base, **result})
+                if log:
+                    log(f"{name:<16} codes={n_codes:<6} bars={bars:<5} w={window:<4} "
+                        f"{result['median_ms']:>10.2f} ms  {result['rows_per_s'] or 0:>12,} rows/s")
+        del df
+    return records
+
+
+def loglog_fit(points: list):
+    """[(x, y)] → (a, b)，y = a · x^b 的对数空间最小二乘；x 只有一个取值时 b = 0"""
+    points = [(x, y) for x, y in points if x > 0 and y > 0]
+    if not points:
+        return 0.0, 0.0
+    lx = [math.log(x) for x, _ in points]
+    ly = [math.log(y) for _, y in points]
+    mx, my = sum(lx) / len(lx), sum(ly) / len(ly)
+    var = sum((v - mx) ** 2 for v in lx)
+    if var == 0:
+        return math.exp(my), 0.0
+    b = sum((u - mx) * (v - my) for u, v in zip(lx, ly)) / var
+    return math.exp(my - b * mx), b
+
+
+def fit_cost_table(records: list, reference_window: int = 20) -> dict:
+    """测量记录 → {内核: {cost, window_exponent, rows_exponent, rows_per_s, registry_cost}}，单位见模块说明"""
+    measured = [r for r in records if "median_ms" in r]
+    by_kernel = {}
+    for r in measured:
+        by_kernel.setdefault(r["kernel"], []).append(r)
+
+    fits = {}
+    for name, rows in by_kernel.items():
+        per_window = {}
+        for r in rows:
+            secs, n = per_window.get(r["window"], (0.0, 0))
+            per_window[r["window"]] = (secs + r["median_ms"] / 1000, n + r["rows"])
+        a, b = loglog_fit([(w, secs / n) for w, (secs, n) in per_window.items()])
+        b = min(max(b, 0.0), 2.0)
+        # 窗口指数截断后按截断值重估系数，保证 a · w^b 穿过各窗口的几何中心
+        a = math.exp(statistics.fmean(math.log(secs / n) - b * math.log(w) for w, (secs, n) in per_window.items()))
+        # 行数扩展性：最大窗口上的耗时 ~ rows^e（e > 1 表示随规模超线性变慢）
+        top = max(per_window)
+        _, rows_exp = loglog_fit([(r["rows"], r["median_ms"]) for r in rows if r["window"] == top])
+        largest = max((r for r in rows if r["window"] == top), key=lambda r: r["rows"])
+        fits[name] = {"a": a, "b": b, "rows_exponent": round(rows_exp, 3), "rows_per_s": largest["rows_per_s"],
+                      "largest_rows": largest["rows"]}
+
+    if REFERENCE_KERNEL not in fits:
+        raise ValueError(f"Reference kernel {REFERENCE_KERNEL} was not measured")
+    ref = fits[REFERENCE_KERNEL]
+    unit = ref["a"] * reference_window ** ref["b"] / reference_window
+    return {name: {"cost": round(f["a"] / unit, 4), "window_exponent": round(f["b"], 3),
+                   "rows_exponent": f["rows_exponent"], "rows_per_s": f["rows_per_s"],
+                   "largest_rows": f["largest_rows"], "registry_cost": INDICATORS[name].get("cost", 1)}
+            for name, f in sorted(fits.items())}
+
+
+def print_report(table: dict, reference_window: int, out=sys.stderr):
+    """按参考窗口上的单行代价降序列出内核，对照注册表代价等级"""
+    print(f"{'kernel':<16} {'cost@w' + str(reference_window):>10} {'registry':>9} {'w_exp':>6} {'rows_exp':>8} "
+          f"{'rows/s':>14}", file=out)
+    ranked = sorted(table.items(), key=lambda kv: -kv[1]["cost"] * reference_window ** kv[1]["window_exponent"])
+    for name, row in ranked:
+        at_ref = row["cost"] * reference_window ** row["window_exponent"]
+        registry = row["registry_cost"] * reference_window
+        print(f"{name:<16} {at_ref:>10.1f} {registry:>9} {row['window_exponent']:>6.2f} {row['rows_exponent']:>8.2f} "
+              f"{row['rows_per_s'] or 0:>14,}", file=out)
+
+
+def int_list(text: str) -> list:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="BlinkQuant indicator kernel micro-benchmark")
+    ap.add_argument("--kernels", help="comma list of INDICATORS names (default: all; MA is always included)")
+    ap.add_argument("--codes", default="200,1000,4000", help="universe sizes")
+    ap.add_argument("--bars", default="250,750", help="history lengths (bars per code)")
+    ap.add_argument("--windows", default="5,20,60", help="window sizes for pos_int arguments")
+    ap.add_argument("--reference-window", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--time-cap-s", type=float, default=5.0, help="skip larger sizes once a kernel exceeds this")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default="-", help="result / cost table JSON path ('-' for stdout)")
+    args = ap.parse_args(argv)
+
+    kernels = [k.strip().upper() for k in args.kernels.split(",")] if args.kernels else list(INDICATORS)
+    unknown = [k for k in kernels if k not in INDICATORS]
+    if unknown:
+        ap.error(f"Unknown kernels: {', '.join(unknown)}")
+    if REFERENCE_KERNEL not in kernels:
+        kernels.insert(0, REFERENCE_KERNEL)
+    windows = sorted(set(int_list(args.windows)) | {args.reference_window})
+    sizes = [(c, b) for c in int_list(args.codes) for b in int_list(args.bars)]
+
+    records = run_grid(kernels, sizes, windows, args.repeat, args.time_cap_s, args.seed,
+                       log=lambda line: print(line, file=sys.stderr))
+    table = fit_cost_table(records, args.reference_window)
+    print_report(table, args.reference_window)
+    write_json({
+        "meta": {**environment(), "grid": {"codes": int_list(args.codes), "bars": int_list(args.bars),
+                                           "windows": windows, "repeat": args.repeat, "time_cap_s": args.time_cap_s},
+                 "reference_kernel": REFERENCE_KERNEL, "reference_window": args.reference_window,
+                 "unit": f"{REFERENCE_KERNEL} per-row time at window {args.reference_window} / "
+                         f"{args.reference_window}; estimate = cost * window^window_exponent * rows"},
+        "kernels": table,
+        "measurements": records,
+    }, args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
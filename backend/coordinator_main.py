@@ -0,0 +1,37 @@
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+from api.coordinator_routes import router as coordinator_router
+from core.coordinator import coordinator
+import os
+import asyncio
+import logging
+
+# 协调端入口：uvicorn coordinator_main:app（COORDINATOR_NODES=节点地址,逗号分隔）
+# 路由表由各节点 /health 上报的分片发现，每 COORD_ROUTE_REFRESH_S 秒刷新（0 关闭，按节点顺序映射分片）
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"Coordinator nodes: {coordinator.nodes}")
+    refresh_s = float(os.getenv("COORD_ROUTE_REFRESH_S", "30"))
+    refresher = None
+    if refresh_s > 0 and coordinator.nodes:
+        refresher = asyncio.create_task(coordinator.refresh_routes_forever(refresh_s))
+    yield
+    if refresher is not None:
+        refresher.cancel()
+    await coordinator.aclose()
+
+app = FastAPI(title="BlinkQuant Coordinator", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.include_router(coordinator_router)
@@ -0,0 +1,202 @@
+"""信号回测：全历史单次向量化评估公式信号，输出可跨节点合并的分节点聚合。
+
+每个节点只返回部分聚合（次数/求和/平方和/胜场/固定边界直方图），协调端用
+merge_backtest_partials 逐项相加即可得到全市场结果，无需搬运逐笔数据。
+count/sum/wins/min/max/直方图合并后精确；中位数在多节点时由直方图插值，属近似值。
+"""
+
+import math
+import logging
+import polars as pl
+from .engine import (selection_engine, collect_with_deadline, prune_universe, shard_universe,
+                     intersect_universe, QueryTimeout, deadline_after, time_left)
+from .security import blink_parser
+from .data_manager import data_manager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HORIZONS = [1, 5, 10, 20]
+HORIZON_MAX = 250
+# 直方图固定边界（单位 %）：[-50, 50) 每 1% 一格，外加下溢/上溢两格，保证跨节点可逐格相加
+HIST_LO = -50.0
+HIST_HI = 50.0
+HIST_WIDTH = 1.0
+
+
+def _hist_bins() -> int:
+    return int(round((HIST_HI - HIST_LO) / HIST_WIDTH))
+
+
+def _horizon_stats(hits: pl.DataFrame, col: str) -> dict:
+    """单个持有期的部分聚合：count/sum/sum_sq/wins/min/max/median + 直方图。
+
+    收盘价为 0 或缺失时远期收益为 inf/NaN，会污染求和与分桶，聚合前剔除。
+    """
+    r = hits.select(pl.col(col)).drop_nulls().filter(pl.col(col).is_finite())
+    n_bins = _hist_bins()
+    hist = [0] * (n_bins + 2)
+    if r.is_empty():
+        return {"count": 0, "sum": 0.0, "sum_sq": 0.0, "wins": 0,
+                "min": None, "max": None, "median": None, "mean": None,
+                "win_rate": None, "histogram": hist}
+
+    stats = r.select([
+        pl.len().alias("count"),
+        pl.col(col).sum().alias("sum"),
+        (pl.col(col) ** 2).sum().alias("sum_sq"),
+        (pl.col(col) > 0).sum().alias("wins"),
+        pl.col(col).min().alias("min"),
+        pl.col(col).max().alias("max"),
+        pl.col(col).median().alias("median"),
+    ]).row(0, named=True)
+
+    # 分桶：下溢 → 0，[-50,50) → 1..n，上溢 → n+1
+    bucket = (((pl.col(col) - HIST_LO) / HIST_WIDTH).floor().clip(-1, n_bins) + 1).cast(pl.Int32)
+    counts = r.group_by(bucket.alias("b")).agg(pl.len().alias("n"))
+    for b, n in counts.iter_rows():
+        hist[b] = n
+
+    count = stats["count"]
+    return {
+        "count": count,
+        "sum": float(stats["sum"]),
+        "sum_sq": float(stats["sum_sq"]),
+        "wins": int(stats["wins"]),
+        "min": float(stats["min"]),
+        "max": float(stats["max"]),
+        "median": float(stats["median"]),
+        "mean": float(stats["sum"]) / count,
+        "win_rate": int(stats["wins"]) / count,
+        "histogram": hist,
+    }
+
+
+def _median_from_histogram(hist: list, count: int):
+    """合并后的近似中位数：在固定直方图上线性插值。
+
+    桶内误差不超过一个桶宽（1%）；落在下溢/上溢桶时只能返回边界值。
+    """
+    if count == 0:
+        return None
+    target = count / 2.0
+    acc = 0
+    for i, n in enumerate(hist):
+        if n and acc + n >= target:
+            lo = HIST_LO + (i - 1) * HIST_WIDTH
+            if i == 0:
+                return HIST_LO
+            if i == len(hist) - 1:
+                return HIST_HI
+            return lo + (target - acc) / n * HIST_WIDTH
+        acc += n
+    return None
+
+
+def merge_backtest_partials(partials: list) -> dict:
+    """合并各节点 run() 的部分聚合。
+
+    count/sum/sum_sq/wins/min/max/直方图逐项合并，与单机全量计算一致；
+    中位数只有在仅一个节点有样本时才是精确值，否则为直方图插值近似，
+    由 median_exact 标明。
+    """
+    partials = [p for p in partials if p and "error" not in p]
+    if not partials:
+        return {"signals": 0, "horizons": {}}
+
+    merged = {
+        "formula": partials[0].get("formula"),
+        "timeframe": partials[0].get("timeframe"),
+        "signals": sum(p.get("signals", 0) for p in partials),
+        "bins": partials[0].get("bins"),
+        "horizons": {},
+    }
+    keys = sorted({h for p in partials for h in p.get("horizons", {})}, key=int)
+    for h in keys:
+        parts = [p["horizons"][h] for p in partials if h in p.get("horizons", {})]
+        count = sum(s["count"] for s in parts)
+        total = sum(s["sum"] for s in parts)
+        sum_sq = sum(s["sum_sq"] for s in parts)
+        wins = sum(s["wins"] for s in parts)
+        hist = [sum(col) for col in zip(*(s["histogram"] for s in parts))]
+        mins = [s["min"] for s in parts if s["min"] is not None]
+        maxs = [s["max"] for s in parts if s["max"] is not None]
+        non_empty = [s for s in parts if s["count"]]
+        median_exact = len(non_empty) <= 1
+        if len(non_empty) == 1:
+            median = non_empty[0]["median"]
+        else:
+            median = _median_from_histogram(hist, count)
+        mean = total / count if count else None
+        std = math.sqrt(max(sum_sq / count - mean * mean, 0.0)) if count else None
+        merged["horizons"][h] = {
+            "count": count, "sum": total, "sum_sq": sum_sq, "wins": wins,
+            "min": min(mins) if mins else None, "max": max(maxs) if maxs else None,
+            "median": median, "median_exact": median_exact, "mean": mean, "std": std,
+            "win_rate": wins / count if count else None,
+            "histogram": hist,
+        }
+    return merged
+
+
+class BacktestEngine:
+    def run(self, formula: str, timeframe: str = "D", horizons=None, start=None, end=None,
+            timeout_s: float = None, shards: list = None) -> dict:
+        """
+        全历史信号回测（shards 限定仅回测这些分片的股票）：
+        1. 复用 SelectionEngine 的 Hot-JIT 与板块关联，在所有日期上一次性求出信号
+        2. 用前复权收盘价计算各持有期远期收益 close[t+h]/close[t]-1（单位 %）
+        3. 仅保留信号为真的行做列式聚合，不构造逐笔 Python 对象
+        """
+        horizons = sorted(set(horizons or DEFAULT_HORIZONS))
+        if any(h <= 0 or h > HORIZON_MAX for h in horizons):
+            return {"error": f"Horizons must be within 1..{HORIZON_MAX}"}
+
+        gen = data_manager.view()
+        universe = selection_engine.static_universe([formula], timeframe, gen, shards)
+        rejected = selection_engine.check_cost([formula], timeframe, gen=gen, universe=universe)
+        if rejected:
+            return rejected
+
+        deadline = deadline_after(timeout_s)
+        try:
+            gen, _ = selection_engine._prepare_hot_jit(formula, deadline, gen)
+        except QueryTimeout as e:
+            return {"error": str(e), "status": 504}
+        df, lf = selection_engine._build_lazy_frame(timeframe, gen)
+        if df is None:
+            return {"error": "Data not loaded."}
+
+        try:
+            parsed = blink_parser.parse(formula, timeframe, gen)
+            expr = parsed.expr
+            universe = intersect_universe(parsed.universe, shard_universe(shards, gen))
+            if universe is not None:
+                lf = prune_universe(lf, universe)
+            fwd_cols = [f"_fwd_{h}" for h in horizons]
+            close = pl.col("close")
+            lf = lf.with_columns(
+                [expr.alias("_signal")]
+                + [((close.shift(-h).over("code") / close - 1) * 100).alias(c) for h, c in zip(horizons, fwd_cols)]
+            ).filter(pl.col("_signal").fill_null(False) == True)
+
+            if start:
+                lf = lf.filter(pl.col("date") >= pl.lit(start).str.to_date("%Y-%m-%d"))
+            if end:
+                lf = lf.filter(pl.col("date") <= pl.lit(end).str.to_date("%Y-%m-%d"))
+
+            hits = collect_with_deadline(lf.select(fwd_cols), time_left(deadline))
+        except QueryTimeout as e:
+            return {"error": str(e), "status": 504}
+        except Exception as e:
+            return {"error": str(e)}
+
+        return {
+            "formula": formula,
+            "timeframe": timeframe,
+            "signals": len(hits),
+            "bins": {"lo": HIST_LO, "hi": HIST_HI, "width": HIST_WIDTH},
+            "horizons": {str(h): _horizon_stats(hits, c) for h, c in zip(horizons, fwd_cols)},
+        }
+
+
+backtest_engine = BacktestEngine()
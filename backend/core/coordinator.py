@@ -0,0 +1,321 @@
+"""Scatter-Gather 协调端：把选股类请求扇出到各分片节点并合并结果。
+
+- 每个分片独立超时；慢节点在 hedge_after_s 后补发一次对冲请求，先返回者胜出，另一个取消
+- 节点失败/超时不拖垮整次请求：返回已到达分片的合并结果，并在 shards.missing 中列出缺失分片
+- 4xx（公式错误、超预算等）对所有分片一致，直接透传给调用方，不做重试
+- httpx.AsyncClient 连接池复用 keep-alive 连接
+- 路由表 shard → [副本节点]：由各节点 /health 上报的 shards 发现（NODE_SHARDS 多分片加载）；
+  读请求在副本间轮转分摊负载，失败立即转移到下一个副本，对冲请求同样发往另一副本
+"""
+
+import os
+import time
+import asyncio
+import logging
+import httpx
+from .engine import merge_topk
+from .backtest import merge_backtest_partials
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NODE_TIMEOUT_S = 10.0
+DEFAULT_HEDGE_AFTER_S = 1.5
+DEFAULT_MAX_CONNECTIONS = 32
+DEFAULT_HEALTH_TIMEOUT_S = 2.0
+
+# 421 Misdirected Request：节点不持有被请求的分片（路由表过期），视为节点错误并换副本
+RETRYABLE_CLIENT_STATUSES = {421}
+
+
+class NodeClientError(Exception):
+    """节点返回 4xx：请求本身有误，所有分片结果一致，直接透传"""
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _env_nodes() -> list:
+    return [u.strip().rstrip("/") for u in os.getenv("COORDINATOR_NODES", "").split(",") if u.strip()]
+
+
+class Coordinator:
+    def __init__(self, nodes: list = None, timeout_s: float = None, hedge_after_s: float = None,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS, routes: dict = None):
+        # 节点地址列表；未发现路由前默认 nodes[i] 持有分片 i
+        self.nodes = [u.rstrip("/") for u in nodes] if nodes is not None else _env_nodes()
+        self.timeout_s = timeout_s if timeout_s is not None else float(os.getenv("COORD_NODE_TIMEOUT_S", DEFAULT_NODE_TIMEOUT_S))
+        self.hedge_after_s = hedge_after_s if hedge_after_s is not None else float(os.getenv("COORD_HEDGE_AFTER_S", DEFAULT_HEDGE_AFTER_S))
+        self.max_connections = max_connections
+        self._client = None
+        # 路由表：shard → [持有该分片的节点地址]
+        self.routes = {}
+        self.set_routes(routes if routes is not None else {i: [u] for i, u in enumerate(self.nodes)})
+        # 最近一次 /health 探测结果：url → {status, build_id, shards, ...}
+        self.node_health = {}
+        # 各副本轮转起点
+        self._rr = {}
+        self.stats = {"requests": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0, "failover_wins": 0,
+                      "node_errors": 0, "node_timeouts": 0, "route_refreshes": 0}
+        # 各节点实际承接的请求数（观察副本间负载分摊）
+        self.node_requests = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """首次使用时创建连接池（需在事件循环内），之后复用 keep-alive 连接"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(self.timeout_s))
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def n_shards(self) -> int:
+        return len(self.routes)
+
+    def set_routes(self, routes: dict):
+        """routes: {shard: [url, ...]}；分片号需连续覆盖 0..N-1，缺失的分片记为无副本"""
+        n = max(routes) + 1 if routes else 0
+        self.routes = {s: [u.rstrip("/") for u in routes.get(s, [])] for s in range(n)}
+
+    def candidates(self, shard: int) -> list:
+        """分片 shard 的候选副本：每次调用轮转起点，把读负载均摊到所有副本；后续项用于失败转移与对冲"""
+        urls = self.routes.get(shard, [])
+        if len(urls) <= 1:
+            return list(urls)
+        start = self._rr.get(shard, 0) % len(urls)
+        self._rr[shard] = start + 1
+        return urls[start:] + urls[:start]
+
+    async def refresh_routes(self, timeout_s: float = DEFAULT_HEALTH_TIMEOUT_S) -> dict:
+        """
+        探测全部节点 /health，按上报的 shards 重建路由表（仅 healthy 节点参与）。
+        全部节点不可达时保留旧路由表；未上报 shards 的旧版本节点按 nodes 顺序视为持有自身分片。
+        """
+        async def probe(url):
+            res = await self.client.get(f"{url}/api/v1/health", timeout=timeout_s)
+            res.raise_for_status()
+            return res.json()
+
+        outcomes = await asyncio.gather(*(probe(u) for u in self.nodes), return_exceptions=True)
+        health, routes, total = {}, {}, 0
+        for i, (url, out) in enumerate(zip(self.nodes, outcomes)):
+            if isinstance(out, BaseException):
+                health[url] = {"status": "unreachable", "error": str(out) or type(out).__name__}
+                continue
+            health[url] = out
+            total = max(total, out.get("total_shards") or 0)
+            if out.get("status") != "healthy":
+                continue
+            for shard in out.get("shards", [i]):
+                routes.setdefault(shard, []).append(url)
+        self.node_health = health
+        self.stats["route_refreshes"] += 1
+        if routes:
+            total = max(total, max(routes) + 1)
+            self.set_routes({s: routes.get(s, []) for s in range(total)})
+        else:
+            logger.warning("Coordinator: no healthy node found, keeping previous routes")
+        return self.routes
+
+    async def refresh_routes_forever(self, interval_s: float):
+        while True:
+            try:
+                await self.refresh_routes()
+            except Exception as e:
+                logger.warning(f"Coordinator: route refresh failed: {e!r}")
+            await asyncio.sleep(interval_s)
+
+    async def _attempt(self, url: str, path: str, payload: dict) -> dict:
+        self.node_requests[url] = self.node_requests.get(url, 0) + 1
+        res = await self.client.post(f"{url}{path}", json=payload)
+        if 400 <= res.status_code < 500 and res.status_code not in RETRYABLE_CLIENT_STATUSES:
+            try:
+                detail = res.json().get("detail")
+            except ValueError:
+                detail = res.text
+            raise NodeClientError(res.status_code, detail)
+        res.raise_for_status()
+        return res.json()
+
+    async def call_shard(self, shard: int, path: str, payload: dict, timeout_s: float = None) -> dict:
+        """
+        请求单个分片（请求体附带 shards=[shard]，多分片副本只回答该分片）：
+        - 失败：立即转移到下一个未尝试的副本
+        - 主请求超过 hedge_after_s 未返回（或全部副本已失败）：补发一次对冲请求，发往下一个副本（单副本时为同一节点）
+        任一成功即返回并取消其余请求；整体超过 timeout_s 抛 TimeoutError。
+        """
+        timeout_s = timeout_s or self.timeout_s
+        urls = self.candidates(shard)
+        if not urls:
+            raise RuntimeError(f"shard {shard} has no live replica")
+        body = {**payload, "shards": [shard]}
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + timeout_s
+        kinds = {}
+        launched = 0
+
+        def launch(kind):
+            nonlocal launched
+            task = asyncio.create_task(self._attempt(urls[launched % len(urls)], path, body))
+            launched += 1
+            kinds[task] = kind
+            return task
+
+        pending = {launch("primary")}
+        hedged = False
+        last_exc = None
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError(f"shard {shard} timed out after {timeout_s}s")
+                wait_s = remaining if hedged else min(remaining, self.hedge_after_s)
+                done, pending = await asyncio.wait(pending, timeout=wait_s, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    exc = task.exception()
+                    if exc is None:
+                        if kinds[task] != "primary":
+                            self.stats[f"{kinds[task]}_wins"] += 1
+                        return task.result()
+                    if isinstance(exc, NodeClientError):
+                        raise exc
+                    last_exc = exc
+                if done and launched < len(urls):
+                    self.stats["failovers"] += 1
+                    pending.add(launch("failover"))
+                elif not hedged and (done or loop.time() - started >= self.hedge_after_s):
+                    hedged = True
+                    self.stats["hedges"] += 1
+                    pending.add(launch("hedge"))
+            raise last_exc or RuntimeError(f"shard {shard} failed")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def scatter(self, path: str, payload: dict, timeout_s: float = None):
+        """并发请求全部分片，返回 ({shard: 响应}, [{"shard","nodes","error"}])"""
+        self.stats["requests"] += 1
+        calls = [self.call_shard(i, path, payload, timeout_s) for i in range(self.n_shards)]
+        outcomes = await asyncio.gather(*calls, return_exceptions=True)
+        ok, missing = {}, []
+        for shard, out in enumerate(outcomes):
+            if isinstance(out, NodeClientError):
+                raise out
+            if isinstance(out, BaseException):
+                if isinstance(out, asyncio.TimeoutError):
+                    self.stats["node_timeouts"] += 1
+                else:
+                    self.stats["node_errors"] += 1
+                logger.warning(f"Coordinator: shard {shard} missing: {out!r}")
+                missing.append({"shard": shard, "nodes": self.routes.get(shard, []),
+                                "error": str(out) or type(out).__name__})
+            else:
+                ok[shard] = out
+        return ok, missing
+
+    def _shard_report(self, ok: dict, missing: list) -> dict:
+        return {"shards": {"total": self.n_shards, "ok": sorted(ok), "missing": missing},
+                "partial": bool(missing)}
+
+    async def select(self, payload: dict, timeout_s: float = None) -> dict:
+        t0 = time.perf_counter()
+        ok, missing = await self.scatter("/api/v1/select", payload, timeout_s)
+        merged = merge_select(payload, [ok[s] for s in sorted(ok)])
+        merged.update(self._shard_report(ok, missing))
+        merged["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return merged
+
+    async def select_batch(self, payload: dict, timeout_s: float = None) -> dict:
+        t0 = time.perf_counter()
+        ok, missing = await self.scatter("/api/v1/select-batch", payload, timeout_s)
+        merged = merge_batch([ok[s] for s in sorted(ok)], sorted(ok))
+        merged.update(self._shard_report(ok, missing))
+        merged["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return merged
+
+    async def backtest(self, payload: dict, timeout_s: float = None) -> dict:
+        ok, missing = await self.scatter("/api/v1/backtest", payload, timeout_s)
+        merged = merge_backtest_partials([ok[s] for s in sorted(ok)])
+        merged.update(self._shard_report(ok, missing))
+        return merged
+
+
+def _rows(partial: dict) -> dict:
+    """列式投影 → {code: {列: 值}}"""
+    columns = partial.get("columns") or {}
+    codes = columns.get("code", partial.get("results", []))
+    return {code: {c: vals[i] for c, vals in columns.items()} for i, code in enumerate(codes)}
+
+
+def merge_select(payload: dict, partials: list) -> dict:
+    """
+    合并各分片 /select 响应：
+    - order_by：K 路归并有序 Top-K（merge_topk），values 与 results 对齐
+    - 仅 limit：各分片已按 code 排序截断，并集排序后再截断即为全局结果
+    - fields：按合并后的代码顺序重排列式投影
+    """
+    order_by = payload.get("order_by")
+    limit = payload.get("limit")
+    merged = {}
+    if order_by:
+        descending = payload.get("descending", True)
+        total = sum(len(p.get("results", [])) for p in partials)
+        pairs = merge_topk(partials, limit if limit is not None else total, descending)
+        codes = [c for c, _ in pairs]
+        merged.update({"values": [v for _, v in pairs], "order_by": order_by, "descending": descending})
+    else:
+        codes = sorted(c for p in partials for c in p.get("results", []))
+        if limit is not None:
+            codes = codes[:limit]
+    merged.update({"count": len(codes), "results": codes})
+    if limit is not None:
+        merged["limit"] = limit
+    if payload.get("fields"):
+        rows = {}
+        for p in partials:
+            rows.update(_rows(p))
+        names = next((list(p["columns"].keys()) for p in partials if p.get("columns")), ["code"])
+        merged["columns"] = {c: [rows.get(code, {}).get(c) for code in codes] for c in names}
+    return merged
+
+
+def merge_batch(partials: list, shards: list = None) -> dict:
+    """
+    合并 /select-batch：逐公式取成功分片的并集。
+    部分分片对某公式报错时保留其余分片结果，并在该公式上标记 partial 与 errors:[{shard,error}]；
+    全部分片报错时该公式报错。shards 为与 partials 对齐的分片号（缺省按序号）。
+    """
+    batches = [p.get("batch", []) for p in partials]
+    if not batches:
+        return {"batch": []}
+    shards = shards if shards is not None else list(range(len(partials)))
+    merged = []
+    for i, first in enumerate(batches[0]):
+        parts = [(shard, b[i]) for shard, b in zip(shards, batches) if i < len(b)]
+        errors = [{"shard": shard, "error": p["error"]} for shard, p in parts if "error" in p]
+        ok = [p for _, p in parts if "error" not in p]
+        if not ok:
+            out = {"formula": first.get("formula"), "error": errors[0]["error"], "errors": errors}
+            status = next((p["status"] for _, p in parts if "status" in p), None)
+            if status is not None:
+                out["status"] = status
+            merged.append(out)
+            continue
+        codes = sorted(c for p in ok for c in p.get("results", []))
+        out = {"formula": first.get("formula"), "count": len(codes), "results": codes}
+        if errors:
+            out.update({"partial": True, "errors": errors})
+        merged.append(out)
+    return {"batch": merged}
+
+
+coordinator = Coordinator()
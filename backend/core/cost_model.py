@@ -0,0 +1,80 @@
+"""公式代价估算：执行前按注册表的内核代价等级估算工作量，超预算直接拒绝。
+
+代价单位 = Σ(内核代价等级 × 窗口 × 扫描行数)，窗口取调用中最大的 pos_int 参数（无则为 1）；
+已挂载为 Hot-JIT 列的 window 型调用按列引用计，代价为 0。另计一次全表扫描（行数 × 1）。
+
+设置 KERNEL_COST_TABLE 时从 benchmarks/kernels.py 产出的实测代价表加载各内核的代价系数与窗口指数，
+单次调用代价 = 代价系数 × 窗口^窗口指数 × 行数（注册表的窗口指数缺省为 1）；表中缺失的内核沿用注册表。
+无法被查询时限取消的内核（注册表 uncancellable）取实测与注册表代价的较大者，保证全市场扫描仍被拦截。
+
+行数取裁剪后的行数：调用方按成员谓词与分片推导出静态股票池时，只计股票池内的行。
+"""
+
+import ast
+import os
+import json
+import logging
+from .indicator_registry import INDICATORS
+from .security import normalize_formula
+
+logger = logging.getLogger(__name__)
+
+# 单次选股代价预算（可由环境变量覆盖）；默认约为 8M 行上十余个常规窗口指标的量级
+DEFAULT_COST_BUDGET = 5e10
+
+
+class CostModel:
+    def __init__(self):
+        self.budget = float(os.getenv("SELECT_COST_BUDGET", DEFAULT_COST_BUDGET))
+        self.kernel_costs = {name: float(entry.get("cost", 1)) for name, entry in INDICATORS.items()}
+        self.window_exponents = {name: float(entry.get("window_exponent", 1.0)) for name, entry in INDICATORS.items()}
+        self.source = "registry"
+        table_path = os.getenv("KERNEL_COST_TABLE")
+        if table_path:
+            self.load_table(table_path)
+
+    def load_table(self, path: str) -> bool:
+        """加载实测代价表（JSON 的 "kernels" 字段）；读取失败时告警并保持当前代价。"""
+        try:
+            with open(path) as f:
+                kernels = json.load(f)["kernels"]
+            table = {name: (float(row["cost"]), float(row.get("window_exponent", 1.0)))
+                     for name, row in kernels.items() if name in INDICATORS}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Kernel cost table {path} not loaded, using registry costs: {e!r}")
+            return False
+        for name, (cost, exponent) in table.items():
+            if INDICATORS[name].get("uncancellable"):
+                floor = float(INDICATORS[name].get("cost", 1))
+                exponent = max(exponent, float(INDICATORS[name].get("window_exponent", 1.0)))
+                cost = max(cost, floor)
+            self.kernel_costs[name] = cost
+            self.window_exponents[name] = exponent
+        self.source = path
+        logger.info(f"Loaded measured costs for {len(table)}/{len(INDICATORS)} kernels from {path}")
+        return True
+
+    def estimate(self, formula: str, rows: int, mounted_columns=()) -> dict:
+        """估算公式代价（rows 为裁剪后的扫描行数），返回 {"cost", "budget", "breakdown": [{"call","cost"}...]}。"""
+        tree = ast.parse(normalize_formula(formula), mode='eval')
+        mounted = set(mounted_columns)
+        breakdown = []
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)):
+                continue
+            func = node.func.id.upper()
+            if func not in INDICATORS:
+                continue
+            ints = [a.value for a in node.args
+                    if isinstance(a, ast.Constant) and isinstance(a.value, int) and not isinstance(a.value, bool)]
+            window = max(ints) if ints else 1
+            if INDICATORS[func].get("window") and len(node.args) == 2 and isinstance(node.args[0], ast.Name):
+                if f"{func}_{node.args[0].id.upper()}_{window}" in mounted:
+                    continue
+            cost = self.kernel_costs[func] * window ** self.window_exponents[func] * rows
+            breakdown.append({"call": ast.unparse(node), "cost": cost})
+        cost = float(rows) + sum(b["cost"] for b in breakdown)
+        return {"cost": cost, "budget": self.budget, "breakdown": breakdown}
+
+
+cost_model = CostModel()
@@ -3,21 +3,188 @@ import gc
 import time
 import asyncio
 import io
+import hashlib
 import logging
+import threading
+import contextvars
+from contextlib import contextmanager
 import httpx
+import psutil
 import polars as pl
-from huggingface_hub import list_repo_files
+from huggingface_hub import list_repo_files, HfApi
 from .indicator_registry import INDICATOR_FUNCS
+from .sector_index import SectorIndex
+from .product_index import ProductIndex
+from .shared_store import SharedStore
+from .snapshot import SnapshotClient, SHARDED_TABLES
+from .metrics import cache_hit
 
 logger = logging.getLogger(__name__)
 
+GB = 1024 ** 3
+# 重载时等待旧代在途请求结束的上限（秒）
+RELOAD_DRAIN_TIMEOUT_S = float(os.getenv("RELOAD_DRAIN_TIMEOUT_S", "30"))
+# 未配置 RELOAD_MAX_RSS_GB 时，重载 RSS 上限取可用内存上限（容器 cgroup 限额与物理内存的较小者）的该比例
+RELOAD_RSS_FRACTION = float(os.getenv("RELOAD_RSS_FRACTION", "0.85"))
+
+
+def _memory_limit_bytes() -> int:
+    """本进程可用的内存上限：cgroup v2/v1 限额（未限额时为极大值）与物理内存取较小者"""
+    limit = psutil.virtual_memory().total
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit():
+            limit = min(limit, int(value))
+        break
+    return limit
+
+
+# 重载期间进程 RSS 上限（GB，显式设为 0 表示不限）：预检不足直接拒绝，加载中超限则中止并丢弃新代。
+# 缺省按内存上限的 RELOAD_RSS_FRACTION 计，新旧两代同时驻留时不会把进程推到 OOM
+RELOAD_MAX_RSS_GB = float(os.getenv("RELOAD_MAX_RSS_GB") or _memory_limit_bytes() * RELOAD_RSS_FRACTION / GB)
+# 热启动对等节点（逗号分隔地址）：重启时优先从 build_id 相同的健康节点拉取已处理快照
+PEER_NODES = [u.strip() for u in os.getenv("PEER_NODES", "").split(",") if u.strip()]
+# 多 worker 共享模式下检查新代/新挂载列的间隔（秒）
+SHARED_SYNC_S = float(os.getenv("SHARED_SYNC_S", "2"))
+# 共享加载者失败后，其余 worker 至少等待这么久再接手重试，避免 HF 不可用时反复全量加载
+SHARED_LOAD_RETRY_S = float(os.getenv("SHARED_LOAD_RETRY_S", "60"))
+
+
+def _rss() -> int:
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+class _PeakRssSampler:
+    """后台线程定期采样进程 RSS，记录重载期间峰值"""
+
+    def __init__(self, interval_s: float = 0.2):
+        self.interval_s = interval_s
+        self.peak = _rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.peak = max(self.peak, _rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss())
+
+
+class _StageClock:
+    """加载阶段计时：lap(name) 记录距上次 lap 的耗时；add(name, s) 累加不连续区间（如逐文件下载）"""
+
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+        self._start = self._last
+
+    def lap(self, name: str):
+        now = time.perf_counter()
+        self.add(name, now - self._last)
+        self._last = now
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = round(self.stages.get(name, 0.0) + seconds, 3)
+
+    def finish(self) -> dict:
+        self.stages["total"] = round(time.perf_counter() - self._start, 3)
+        return self.stages
+
+
+# 一代数据集包含的全部表与索引：重载时整体构建于新实例，再一次性替换
+DATASET_ATTRS = ("df_daily", "df_weekly", "df_monthly", "code_to_name", "df_stock_names",
+                 "df_sector_daily", "df_sector_weekly", "df_sector_monthly", "df_mapping", "df_sector_list",
+                 "sector_index", "product_index", "row_index", "shard_codes", "dataset_revision",
+                 "shared_generation", "load_stages")
+
+# 本请求钉住的 (DataManager, Generation)；由 pin() 设置，随 contextvars 传入线程池
+_pinned = contextvars.ContextVar("pinned_generation", default=None)
+
+
+class Generation:
+    """
+    一代数据集的不可变快照：DATASET_ATTRS 各表/索引、数据版本与代号。
+    请求开始时捕获一次（DataManager.pin / view），此后所有表与索引读取都经由同一对象，
+    切换新代不会让一个请求读到两代混合的数据；修改一律经 replace 生成新快照。
+    """
+    FIELDS = DATASET_ATTRS + ("data_version",)
+    __slots__ = FIELDS + ("number",)
+
+    def __init__(self, number: int = 0, **values):
+        object.__setattr__(self, "number", number)
+        for field in self.FIELDS:
+            object.__setattr__(self, field, values.get(field))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Generation is immutable; use replace({name}=...)")
+
+    def replace(self, number: int = None, **changes) -> "Generation":
+        values = {field: getattr(self, field) for field in self.FIELDS}
+        values.update(changes)
+        return Generation(self.number if number is None else number, **values)
+
+    def with_table(self, attr: str, new: pl.DataFrame) -> "Generation":
+        """以行序不变的新表（增删列）替换 attr；旧表上的行区间索引转移到新表"""
+        row_index = self.row_index or {}
+        entry = row_index.get(attr)
+        if entry is not None and entry[0] is getattr(self, attr):
+            row_index = {**row_index, attr: (new, entry[1])}
+        return self.replace(**{attr: new, "row_index": row_index})
+
+    def row_spans(self, attr: str):
+        """attr 表的 code → (offset, length) 索引；索引不是在当前这张表上构建的则返回 None"""
+        entry = (self.row_index or {}).get(attr)
+        if entry is None or entry[0] is not getattr(self, attr, None):
+            return None
+        return entry[1]
+
+    def code_slice(self, attr: str, code: str):
+        """
+        取单个代码按日期升序的全部行：命中行区间索引时为零拷贝切片，
+        无索引（或索引因表变化失效）时退化为全表过滤。代码不存在返回 None。
+        """
+        df = getattr(self, attr, None)
+        if df is None:
+            return None
+        spans = self.row_spans(attr)
+        if spans is not None:
+            cache_hit("row_index", True)
+            span = spans.get(code)
+            return df.slice(span[0], span[1]) if span else None
+        cache_hit("row_index", False)
+        sliced = df.filter(pl.col("code") == code).sort("date")
+        return sliced if len(sliced) else None
+
 
 class DataManager:
+    DATASET_ATTRS = DATASET_ATTRS
+    # 多 worker 共享模式导出的表（sector_index/product_index 另以底表导出，挂接后在各 worker 重建轻量索引）
+    SHARED_TABLES = ("df_daily", "df_weekly", "df_monthly", "df_stock_names", "df_sector_daily",
+                     "df_sector_weekly", "df_sector_monthly", "df_mapping", "df_sector_list")
+    # Hot-JIT 挂载列可能出现的表
+    MOUNT_TABLES = ("df_daily", "df_weekly", "df_monthly")
+
     def __init__(self):
+        # 当前代（不可变快照）；DATASET_ATTRS 与 data_version 是它的读写代理，写入即生成新快照
+        self._gen_lock = threading.Lock()
+        self._current = Generation()
         self.total_nodes = 3
         self.hf_token = os.getenv("HF_TOKEN")
         self.postgres_url = os.getenv("POSTGRES_URL")
         self.repo_id = "scanli/stocka-data"
+        # 本地数据目录（如 scripts/gen_synthetic_data.py 的产物）：设置后离线从目录加载，不访问 HF
+        self.data_dir = os.getenv("DATA_DIR", "").strip() or None
 
         # 健壮解析 NODE_INDEX，防范 HF Space UI 配置中的空格或非数字字符
         node_idx_env = os.getenv("NODE_INDEX", "0").strip()
@@ -31,6 +198,11 @@ class DataManager:
             logger.warning(f"Invalid NODE_INDEX {self.node_index} (out of bounds), resetting to 0")
             self.node_index = 0
 
+        # 本节点加载的分片集合：默认仅自身分片；NODE_SHARDS="0,1" 可额外加载相邻分片作为副本
+        self.shards = self.parse_shards(os.getenv("NODE_SHARDS"), self.node_index, self.total_nodes)
+        # 分片 → 该分片股票代码列表（加载后构建；请求限定分片时用于裁剪股票池）
+        self.shard_codes = {}
+
         # ---- 核心修改：读取本次容器唯一的 build_id.txt (用于部署版本校验) ----
         self.build_id = "unknown"
         try:
@@ -45,27 +217,77 @@ class DataManager:
         self.df_weekly = None
         self.df_monthly = None
         self.code_to_name = {}
+        self.df_stock_names = None
         self.df_sector_daily = None
+        self.df_sector_weekly = None
+        self.df_sector_monthly = None
         self.df_mapping = None
         self.df_sector_list = None
-        self.stock_sectors = {}
+        # 股票 ↔ 板块双向成员索引（CSR）
+        self.sector_index = SectorIndex()
+        # 产品关键词 → (代码, 暴露度) 倒排索引（最新 K 线的 product_ratios）
+        self.product_index = ProductIndex()
+        # 数据版本：每次加载完成 +1，与 build_id 一起作为静态响应缓存/ETag 的键
+        self.data_version = 0
+        # 按代码的行区间索引：{表名: (构建索引时的表对象, {code: (offset, length)})}，换表即失效
+        # （整体替换、不原地修改：旧代快照可能仍在被请求读取）
+        self.row_index = {}
+        # 已加载数据集对应的 HF 仓库提交（加载时钉住，保证同一代内文件一致）
+        self.dataset_revision = None
+        self.load_error = None
+        # 最近一次加载各阶段耗时（秒）：list_files/download/parse/integrate/adjust/resample/indexes/total
+        self.load_stages = {}
+
+        # 双缓冲重载：各代在途请求计数、最近一次重载报告（当前代号即 _current.number）
+        self._inflight = {}
+        self.reloading = False
+        self.last_reload = None
+
+        # 多 worker 共享数据集（SHARED_DATA_DIR）：当前挂接的共享代号；未启用时为 None
+        self.shared = SharedStore.from_env()
+        self.shared_generation = None
+        self._reload_task = None
+        # 新一代数据就绪（开始服务前）的回调：fn(source, data_version)，用于预构建静态响应等派生数据
+        self._ready_hooks = []
 
         # 指标计算算子映射（由注册表派生）
         self.INDICATOR_MAP = dict(INDICATOR_FUNCS)
 
-    async def async_load_data(self):
-        """流式、低内存占用的异步加载主入口（串行下载和解析，规避并发 OOM 与连接死锁）"""
+    async def fetch_revision(self) -> str:
+        """HF 数据集当前提交 sha；获取失败返回 "main"（不钉版本）。本地目录模式下为文件清单指纹"""
+        if self.data_dir:
+            return await asyncio.to_thread(self._local_revision)
+        try:
+            info = await asyncio.to_thread(HfApi(token=self.hf_token).dataset_info, self.repo_id)
+            return info.sha or "main"
+        except Exception as e:
+            logger.warning(f"Node {self.node_index}: Failed to resolve dataset revision: {e}")
+            return "main"
+
+    async def async_load_data(self, revision: str = None, memory_guard=None) -> bool:
+        """
+        流式、低内存占用的异步加载主入口（串行下载和解析，规避并发 OOM 与连接死锁）。
+        revision：钉住的仓库提交（默认解析当前 sha）；memory_guard(stage) 每个文件后调用，抛异常即中止加载。
+        成功返回 True；失败记录 load_error 并返回 False。
+        """
         start_time = time.time()
+        clock = _StageClock()
         try:
             logger.info(f"🚀 Node {self.node_index}: Starting streamlined memory-safe data load...")
+            revision = revision or await self.fetch_revision()
             
             # 1. 获取文件列表 (使用线程执行同步网络请求，防止阻塞事件循环)
-            all_files = await asyncio.to_thread(
-                list_repo_files, repo_id=self.repo_id, repo_type="dataset", token=self.hf_token
-            )
+            if self.data_dir:
+                all_files = await asyncio.to_thread(os.listdir, self.data_dir)
+            else:
+                all_files = await asyncio.to_thread(
+                    list_repo_files, repo_id=self.repo_id, repo_type="dataset", token=self.hf_token, revision=revision
+                )
             data_files = sorted([f for f in all_files if f.endswith(".parquet")])
+            clock.lap("list_files")
+            download_s = 0.0
             
-            base_url = f"https://huggingface.co/datasets/{self.repo_id}/resolve/main/"
+            base_url = f"https://huggingface.co/datasets/{self.repo_id}/resolve/{revision}/"
             headers = {"Authorization": f"Bearer {self.hf_token}"} if self.hf_token else {}
             
             kline_dfs = []
@@ -81,20 +303,27 @@ class DataManager:
                     url = base_url + fname
                     
                     content = None
-                    # 指数退避重试 3 次
-                    for attempt in range(1, 4):
-                        try:
-                            response = await client.get(url)
-                            response.raise_for_status()
-                            content = response.content
-                            break # 下载成功，跳出重试
-                        except Exception as download_err:
-                            if attempt == 3:
-                                logger.error(f"Node {self.node_index}: Failed to download {fname} after 3 attempts: {download_err}")
-                            else:
-                                wait_time = attempt * 3 # 分别等待 3s, 6s 重试
-                                logger.warning(f"Node {self.node_index}: Temp download error for {fname} ({download_err}). Retrying in {wait_time}s...")
-                                await asyncio.sleep(wait_time)
+                    if self.data_dir:
+                        t_dl = time.perf_counter()
+                        content = await asyncio.to_thread(self._read_local, fname)
+                        download_s += time.perf_counter() - t_dl
+                    else:
+                        # 指数退避重试 3 次
+                        for attempt in range(1, 4):
+                            try:
+                                t_dl = time.perf_counter()
+                                response = await client.get(url)
+                                response.raise_for_status()
+                                content = response.content
+                                download_s += time.perf_counter() - t_dl
+                                break # 下载成功，跳出重试
+                            except Exception as download_err:
+                                if attempt == 3:
+                                    logger.error(f"Node {self.node_index}: Failed to download {fname} after 3 attempts: {download_err}")
+                                else:
+                                    wait_time = attempt * 3 # 分别等待 3s, 6s 重试
+                                    logger.warning(f"Node {self.node_index}: Temp download error for {fname} ({download_err}). Retrying in {wait_time}s...")
+                                    await asyncio.sleep(wait_time)
                     
                     # 如果重试 3 次后该文件依然下载失败，为保证数据完整性，不应强行启动（否则可能导致空数据错乱）
                     if content is None:
@@ -108,6 +337,8 @@ class DataManager:
                         # 规范化股票代码为带市场前缀标准格式（纯数字补前缀，已带前缀原样保留）
                         sdf = sdf.with_columns(self._normalize_code_expr(pl.col("code")))
                         self.code_to_name = {row[0]: row[1] for row in sdf.select(["code", "code_name"]).iter_rows()}
+                        # 列式名称表：供选股投影在同一 Lazy 查询内 Join 出股票名称
+                        self.df_stock_names = sdf.select([pl.col("code"), pl.col("code_name").alias("name")]).unique(subset=["code"], keep="first")
                         del sdf
                     
                     elif "sector_list.parquet" in fname:
@@ -120,16 +351,14 @@ class DataManager:
                     
                     elif "stock_kline_" in fname:
                         df = pl.read_parquet(bio)
-                        node_filter = (df["code"].hash() % self.total_nodes) == self.node_index
-                        sharded_df = df.filter(node_filter)
+                        sharded_df = df.filter(self._shard_filter(df))
                         if not sharded_df.is_empty():
                             kline_dfs.append(sharded_df)
                         del df
                         
                     elif "stock_money_flow_" in fname:
                         df = pl.read_parquet(bio)
-                        node_filter = (df["code"].hash() % self.total_nodes) == self.node_index
-                        sharded_flow = df.filter(node_filter)
+                        sharded_flow = df.filter(self._shard_filter(df))
                         if not sharded_flow.is_empty():
                             flow_dfs.append(sharded_flow)
                         del df
@@ -142,8 +371,14 @@ class DataManager:
                     del content
                     del bio
                     gc.collect()
+                    if memory_guard is not None:
+                        memory_guard(fname)
 
             logger.info(f"Node {self.node_index}: All files downloaded. Integrating DataFrames...")
+            # 逐文件循环中：下载之外的时间计为解析（含重试等待）
+            clock.add("download", download_s)
+            clock.lap("parse")
+            clock.add("parse", -download_s)
 
             # 3. 合并并解析日线数据
             if kline_dfs:
@@ -174,13 +409,28 @@ class DataManager:
                 del sector_constituents_dfs
                 gc.collect()
 
+            if memory_guard is not None:
+                memory_guard("integrate")
+            clock.lap("integrate")
+
             # 6. 数据前复权与重采样
             if self.df_daily is not None:
                 self._apply_forward_adjustment()
                 self._optimize_memory(self.df_daily, "df_daily")
                 self._optimize_memory(self.df_sector_daily, "df_sector_daily")
+                clock.lap("adjust")
                 self._resample_all()
-                
+                clock.lap("resample")
+
+            # 6.1 构建按代码的行区间索引（K 线等单票查询 O(1) 切片）
+            self._build_row_indexes()
+            self._build_product_index()
+            self._build_shard_codes()
+            clock.lap("indexes")
+            self.load_stages = clock.finish()
+            self.dataset_revision = revision
+            self.data_version += 1
+
             gc.collect()
             
             # 7. 强制 Linux 归还幽灵内存
@@ -192,9 +442,423 @@ class DataManager:
                 logger.warning(f"Node {self.node_index}: malloc_trim failed: {e}")
                 
             logger.info(f"✅ Node {self.node_index}: RAM Load Complete. Total time: {time.time() - start_time:.2f}s")
+            self.load_error = None
+            return True
             
         except Exception as e:
             logger.error(f"❌ RAM Load Error: {e}", exc_info=True)
+            self.load_error = str(e) or type(e).__name__
+            return False
+
+    def _read_local(self, fname: str) -> bytes:
+        with open(os.path.join(self.data_dir, fname), "rb") as f:
+            return f.read()
+
+    def _local_revision(self) -> str:
+        """本地目录的 (文件名, 大小, mtime) 指纹：文件未变化时重载可跳过"""
+        entries = sorted((f, st.st_size, st.st_mtime_ns) for f in os.listdir(self.data_dir)
+                         if f.endswith(".parquet") for st in [os.stat(os.path.join(self.data_dir, f))])
+        return "local-" + hashlib.sha1(repr(entries).encode()).hexdigest()[:12]
+
+    # ------------------------------------------------------------------
+    # 双缓冲重载：新代在独立实例中后台加载，完成后一次性替换，旧代在途请求结束后释放
+    # ------------------------------------------------------------------
+
+    @property
+    def generation(self) -> int:
+        return self._current.number
+
+    @contextmanager
+    def pin(self):
+        """
+        请求开始时捕获当前代快照并登记在途，结束时注销；重载据此等待旧代在途请求排空。
+        请求内（含转入线程池的计算）经 view() 取到同一快照。
+        """
+        with self._gen_lock:
+            gen = self._current
+            self._inflight[gen.number] = self._inflight.get(gen.number, 0) + 1
+        token = _pinned.set((self, gen))
+        try:
+            yield gen
+        finally:
+            _pinned.reset(token)
+            with self._gen_lock:
+                self._inflight[gen.number] -= 1
+                if not self._inflight[gen.number]:
+                    del self._inflight[gen.number]
+
+    def view(self) -> Generation:
+        """本请求钉住的代快照；不在请求内（后台任务、测试）时为当前代"""
+        pinned = _pinned.get()
+        if pinned is not None and pinned[0] is self:
+            return pinned[1]
+        return self._current
+
+    def mount_columns(self, gen: Generation, attr: str, cols: list) -> Generation:
+        """
+        把 Hot-JIT 列挂载到 attr 表并发布为当前代（代号不变），返回挂载后的快照供本请求继续使用。
+        同代内其他请求已挂载的列一并保留；期间已切换到新代则不挂载，原样返回 gen。
+        """
+        with self._gen_lock:
+            current = self._current
+            if current.number != gen.number:
+                return gen
+            df = getattr(current, attr)
+            cols = [c for c in cols if c.name not in df.columns]
+            if cols:
+                self._current = current.with_table(attr, df.with_columns(cols))
+            return self._current
+
+    def inflight(self, generation: int = None) -> int:
+        gen = self.generation if generation is None else generation
+        return self._inflight.get(gen, 0)
+
+    def inflight_total(self) -> int:
+        """所有代上的在途请求数之和"""
+        with self._gen_lock:
+            return sum(self._inflight.values())
+
+    def resident_bytes(self) -> dict:
+        """当前代各表/索引的估算常驻字节数（DataFrame.estimated_size 与索引数组）"""
+        sizes = {}
+        for attr in self.DATASET_ATTRS:
+            value = getattr(self, attr, None)
+            if isinstance(value, pl.DataFrame):
+                sizes[attr] = value.estimated_size()
+        sizes["sector_index"] = self.sector_index.memory_bytes()
+        sizes["product_index"] = self.product_index.table.estimated_size()
+        return sizes
+
+    def _swap_generation(self, staging: "DataManager", data_version: int = None) -> tuple:
+        """
+        原子替换：把 staging 的快照换上为当前代（单次引用赋值，其他线程不会看到半代），
+        返回 (旧代号, 旧代快照)；已钉住旧代的请求继续读旧快照，旧代在它们结束后由引用计数释放。
+        data_version：共享模式下取共享代号，使各 worker 的静态响应 ETag 一致。
+        """
+        with self._gen_lock:
+            retired = self._current
+            self._current = staging._current.replace(
+                number=retired.number + 1,
+                data_version=data_version if data_version is not None else retired.data_version + 1)
+        return retired.number, retired
+
+    def on_dataset_ready(self, fn):
+        """注册数据就绪回调 fn(source, data_version)：在加载完成后、重载/挂接切换前于工作线程中调用"""
+        self._ready_hooks.append(fn)
+        return fn
+
+    def _dataset_ready(self, source: "DataManager", data_version: int):
+        for fn in self._ready_hooks:
+            try:
+                fn(source, data_version)
+            except Exception as e:
+                logger.warning(f"Node {self.node_index}: dataset ready hook {getattr(fn, '__name__', fn)} failed: {e}")
+
+    async def _drain(self, generation: int, timeout_s: float) -> bool:
+        """等待旧代在途请求结束；超时返回 False（旧代对象随最后一个请求结束由引用计数回收）"""
+        deadline = time.monotonic() + timeout_s
+        while self.inflight(generation):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    def _memory_guard(self, limit_bytes: int):
+        def guard(stage: str):
+            rss = _rss()
+            if rss > limit_bytes:
+                raise MemoryError(f"RSS {rss / GB:.2f} GB exceeded reload limit {limit_bytes / GB:.2f} GB at {stage}")
+        return guard
+
+    async def reload(self, force: bool = False, max_rss_gb: float = None) -> dict:
+        """
+        零停机重载：新代加载期间旧代继续服务，完成后原子替换并排空、释放旧代。
+        - 数据集提交未变化且非 force 时跳过（整代复用）
+        - max_rss_gb（默认 RELOAD_MAX_RSS_GB）：预检“当前 RSS + 当前代常驻估算”超限则拒绝；
+          加载中 RSS 超限则中止并丢弃新代，旧代不受影响
+        返回重载报告（同时记录于 last_reload）；已有重载进行中返回 {"error", "status": 409}。
+        """
+        if self.reloading:
+            return {"error": "Reload already in progress", "status": 409}
+        if self.shared is not None and not self.shared.is_loader:
+            # 共享模式下只有加载者从 HF 加载，其余 worker 转交请求并在下次同步时切换到新代
+            await asyncio.to_thread(self.shared.request_reload, force)
+            self.last_reload = {"status": "requested", "generation": self.generation, "requested_at": time.time()}
+            return self.last_reload
+        self.reloading = True
+        limit = (max_rss_gb if max_rss_gb is not None else RELOAD_MAX_RSS_GB) * GB
+        t0 = time.perf_counter()
+        report = {"status": "loading", "generation": self.generation, "started_at": time.time(),
+                  "rss_before_gb": round(_rss() / GB, 3),
+                  "resident_estimate_gb": round(sum(self.resident_bytes().values()) / GB, 3),
+                  "limit_gb": round(limit / GB, 3) if limit else None}
+        self.last_reload = report
+        try:
+            revision = await self.fetch_revision()
+            report["revision"] = revision
+            if not force and revision != "main" and revision == self.dataset_revision:
+                report["status"] = "unchanged"
+                return report
+            if limit and report["rss_before_gb"] + report["resident_estimate_gb"] > limit / GB:
+                report.update({"status": "refused", "error": "Not enough memory headroom for a second generation"})
+                return report
+
+            staging = DataManager()
+            with _PeakRssSampler() as sampler:
+                ok = await staging.async_load_data(revision, self._memory_guard(limit) if limit else None)
+            report["peak_rss_gb"] = round(sampler.peak / GB, 3)
+            report["load_s"] = round(time.perf_counter() - t0, 2)
+            if not ok or staging.df_daily is None:
+                report.update({"status": "failed", "error": staging.load_error or "No data loaded"})
+                return report
+
+            data_version = None
+            if self.shared is not None:
+                # 导出新代供所有 worker 挂接，本进程同样换成 memory-map 版本以释放堆上副本
+                manifest = await asyncio.to_thread(self._export_shared, staging)
+                del staging
+                staging = await asyncio.to_thread(self._attach_shared, manifest)
+                data_version = manifest["generation"]
+            await asyncio.to_thread(self._dataset_ready, staging,
+                                    data_version if data_version is not None else self.data_version + 1)
+            old_gen, retired = self._swap_generation(staging, data_version)
+            del staging
+            report.update({"status": "draining", "generation": self.generation})
+            t1 = time.perf_counter()
+            report["drained"] = await self._drain(old_gen, RELOAD_DRAIN_TIMEOUT_S)
+            report["drain_s"] = round(time.perf_counter() - t1, 3)
+            del retired
+            gc.collect()
+            self._malloc_trim()
+            report.update({"status": "swapped", "rss_after_gb": round(_rss() / GB, 3)})
+            logger.info(f"Node {self.node_index}: reloaded generation {self.generation} (revision {revision}), "
+                        f"peak RSS {report['peak_rss_gb']} GB")
+            return report
+        except Exception as e:
+            logger.error(f"Node {self.node_index}: reload failed: {e}", exc_info=True)
+            report.update({"status": "failed", "error": str(e) or type(e).__name__})
+            return report
+        finally:
+            report["elapsed_s"] = round(time.perf_counter() - t0, 2)
+            self.reloading = False
+            gc.collect()
+
+    # ------------------------------------------------------------------
+    # 多 worker 共享数据集：加载者导出 memory-map Arrow，其余 worker 零拷贝挂接
+    # ------------------------------------------------------------------
+
+    async def load(self) -> bool:
+        """启动加载：配置了 PEER_NODES 时先尝试对等节点热启动，失败回退到 HF 全量加载"""
+        ok = bool(PEER_NODES) and await self.warm_start(PEER_NODES)
+        if not ok:
+            ok = await self.async_load_data()
+        if ok:
+            await asyncio.to_thread(self._dataset_ready, self, self.data_version)
+        return ok
+
+    async def warm_start(self, peers: list) -> bool:
+        """
+        从 build_id 相同的健康对等节点拉取已处理表（个股表按本节点分片、板块表与元数据整表），
+        在本地重建代码映射、行区间、板块/产品与分片索引。build_id 未知或任一分片无人持有时返回 False。
+        """
+        if self.build_id == "unknown":
+            return False
+        t0 = time.time()
+        client = SnapshotClient(peers, self.build_id, os.getenv("ADMIN_TOKEN"))
+        pulled = await client.pull(self.shards)
+        if pulled is None or pulled[0].get("df_daily") is None:
+            return False
+        tables, manifest = pulled
+
+        def install():
+            for attr, df in tables.items():
+                if attr == "sector_index":
+                    self.sector_index = SectorIndex.build(df)
+                elif attr in SHARDED_TABLES:
+                    # 对端可能持有更多分片（副本），只保留本节点分片
+                    setattr(self, attr, df.filter(self._shard_filter(df)))
+                else:
+                    setattr(self, attr, df)
+            if self.df_stock_names is not None:
+                self.code_to_name = dict(zip(self.df_stock_names["code"].to_list(), self.df_stock_names["name"].to_list()))
+            self._build_row_indexes()
+            self._build_product_index()
+            self._build_shard_codes()
+
+        await asyncio.to_thread(install)
+        self.load_stages = {"warm_start": round(time.time() - t0, 3), "total": round(time.time() - t0, 3)}
+        self.dataset_revision = manifest.get("revision")
+        self.data_version += 1
+        self.load_error = None
+        logger.info(f"✅ Node {self.node_index}: warm start from peers complete in {time.time() - t0:.2f}s "
+                    f"({client.stats['parts']} parts, {client.stats['bytes'] / 1024 ** 2:.1f} MB)")
+        return True
+
+    async def start(self):
+        """
+        进程启动入口。未配置 SHARED_DATA_DIR 时直接加载（对等节点热启动或 HF）；否则争抢加载者锁：
+        加载者加载并导出（同一 build_id 的现存共享代直接复用），其余 worker 等待清单后挂接；
+        之后所有 worker 每 SHARED_SYNC_S 秒同步新代与 Hot-JIT 挂载列。
+        加载者失败时发布失败原因并释放锁，等待中的 worker 上报该错误并在 SHARED_LOAD_RETRY_S 后接手重试。
+        """
+        if self.shared is None:
+            await self.load()
+            return
+        if self.shared.try_lead():
+            manifest = self.shared.manifest()
+            reusable = (manifest is not None and self.build_id != "unknown"
+                        and manifest.get("build_id") == self.build_id)
+            logger.info(f"Node {self.node_index}: elected shared loader (pid {os.getpid()}), "
+                        f"{'reusing generation ' + str(manifest['generation']) if reusable else 'loading from HF'}")
+            if not reusable:
+                await self._lead_shared_load()
+        else:
+            logger.info(f"Node {self.node_index}: worker {os.getpid()} attaching shared dataset from {self.shared.root}")
+        while True:
+            try:
+                await self.sync_shared()
+            except Exception as e:
+                logger.warning(f"Node {self.node_index}: shared sync failed: {e}", exc_info=True)
+            await asyncio.sleep(SHARED_SYNC_S)
+
+    async def sync_shared(self):
+        """切换到新发布的共享代（排空后释放旧代），或挂接其他 worker 新发布的 Hot-JIT 列；加载者顺带处理转交的重载请求"""
+        if self.shared is None or self.reloading:
+            return
+        manifest = await asyncio.to_thread(self.shared.manifest)
+        if manifest is None:
+            await self._await_shared_loader()
+        elif manifest["generation"] != self.shared_generation:
+            staging = await asyncio.to_thread(self._attach_shared, manifest)
+            await asyncio.to_thread(self._dataset_ready, staging, manifest["generation"])
+            old_gen, retired = self._swap_generation(staging, manifest["generation"])
+            del staging
+            self.load_error = None
+            logger.info(f"Node {self.node_index}: attached shared generation {manifest['generation']}")
+            await self._drain(old_gen, RELOAD_DRAIN_TIMEOUT_S)
+            del retired
+            gc.collect()
+        else:
+            await asyncio.to_thread(self._sync_mounts)
+        if self.shared.is_loader and self._reload_task is None:
+            request = await asyncio.to_thread(self.shared.pop_reload_request)
+            if request is not None:
+                self._reload_task = asyncio.create_task(self.reload(force=request.get("force", False)))
+                self._reload_task.add_done_callback(lambda _: setattr(self, "_reload_task", None))
+
+    async def _lead_shared_load(self) -> bool:
+        """加载者加载并导出；失败时发布失败原因并释放锁，由其他 worker 接手重试"""
+        try:
+            if await self.load():
+                await asyncio.to_thread(self._export_shared, self)
+                return True
+            error = self.load_error or "No data loaded"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            self.load_error = error
+        logger.error(f"Node {self.node_index}: shared loader {os.getpid()} failed: {error}; releasing loader lock")
+        await asyncio.to_thread(self.shared.publish_load_error, error)
+        self.shared.release()
+        return False
+
+    async def _await_shared_loader(self):
+        """尚无清单：上报加载者的失败原因；失败已超过退避时间（或加载者已退出）时争抢锁接手加载"""
+        failure = await asyncio.to_thread(self.shared.load_error)
+        if failure is not None:
+            self.load_error = f"shared loader failed: {failure.get('error')}"
+            if time.time() - failure.get("failed_at", 0) < SHARED_LOAD_RETRY_S:
+                return
+        if self.shared.try_lead():
+            logger.info(f"Node {self.node_index}: worker {os.getpid()} took over shared loading")
+            await self._lead_shared_load()
+
+    def _shared_tables(self) -> dict:
+        tables = {attr: getattr(self, attr) for attr in self.SHARED_TABLES}
+        tables["sector_index"] = self.sector_index.to_frame()
+        tables["product_index"] = self.product_index.table
+        return tables
+
+    def _export_shared(self, source: "DataManager") -> dict:
+        manifest = self.shared.export(source._shared_tables(), {
+            "revision": source.dataset_revision, "build_id": self.build_id,
+            "node": self.node_index, "shards": self.shards, "pid": os.getpid(),
+            "load_stages": source.load_stages})
+        logger.info(f"Node {self.node_index}: exported shared generation {manifest['generation']} to {self.shared.root}")
+        return manifest
+
+    def _attach_shared(self, manifest: dict) -> "DataManager":
+        """按清单挂接共享代到新实例：表为 memory-map，代码映射/行区间/板块/产品索引在本进程重建"""
+        t0 = time.perf_counter()
+        tables = self.shared.attach(manifest)
+        staging = DataManager()
+        for attr in self.SHARED_TABLES:
+            setattr(staging, attr, tables.get(attr))
+        names = staging.df_stock_names
+        if names is not None:
+            staging.code_to_name = dict(zip(names["code"].to_list(), names["name"].to_list()))
+        if tables.get("sector_index") is not None:
+            staging.sector_index = SectorIndex.build(tables["sector_index"])
+        if tables.get("product_index") is not None:
+            staging.product_index = ProductIndex(tables["product_index"])
+        staging.dataset_revision = manifest.get("revision")
+        staging.shared_generation = manifest["generation"]
+        staging._build_row_indexes()
+        staging._build_shard_codes()
+        staging._sync_mounts()
+        # 加载者的各阶段耗时随清单发布，本进程追加挂接耗时
+        staging.load_stages = {**manifest.get("load_stages", {}), "shared_attach": round(time.perf_counter() - t0, 3)}
+        return staging
+
+    def _sync_mounts(self) -> list:
+        """挂接本代已发布、但本进程表中尚缺的 Hot-JIT 列（memory-map，不重复计算）"""
+        if self.shared is None or self.shared_generation is None:
+            return []
+        gen = self.shared_generation
+        mounted = []
+        for attr, columns in self.shared.list_mounts(gen).items():
+            if attr not in self.MOUNT_TABLES:
+                continue
+            df = getattr(self, attr, None)
+            if df is None:
+                continue
+            current = self._current
+            cols = [self.shared.mounted_column(gen, attr, c) for c in columns if c not in df.columns]
+            cols = [c for c in cols if c is not None and len(c) == df.height]
+            if cols and current.shared_generation == gen:
+                self.mount_columns(current, attr, cols)
+                mounted += [f"{attr}.{c.name}" for c in cols]
+        if mounted:
+            logger.info(f"Node {self.node_index}: attached shared Hot-JIT columns {mounted}")
+        return mounted
+
+    def shared_column(self, attr: str, generation, column: str):
+        """其他 worker 已为 generation 发布的挂载列；非共享模式或不存在返回 None"""
+        if self.shared is None or generation is None:
+            return None
+        return self.shared.mounted_column(generation, attr, column)
+
+    def publish_column(self, attr: str, generation, series: pl.Series) -> pl.Series:
+        """发布本进程算出的挂载列并换成 memory-map 版本；代已切换或非共享模式时原样返回"""
+        if self.shared is None or generation is None or self.shared_generation != generation:
+            return series
+        try:
+            return self.shared.publish_mount(generation, attr, series)
+        except Exception as e:
+            logger.warning(f"Node {self.node_index}: failed to publish {attr}.{series.name}: {e}")
+            return series
+
+    def shared_status(self):
+        if self.shared is None:
+            return None
+        return {"root": self.shared.root, "role": "loader" if self.shared.is_loader else "worker",
+                "generation": self.shared_generation, "pid": os.getpid(), "load_error": self.load_error}
+
+    def _malloc_trim(self):
+        try:
+            import ctypes
+            ctypes.CDLL('libc.so.6').malloc_trim(0)
+        except Exception:
+            pass
 
     @staticmethod
     def _normalize_code_expr(code_col):
@@ -255,22 +919,14 @@ class DataManager:
                 logger.warning(f"Node {self.node_index}: sector_list not loaded, falling back to concept sectors")
                 mapped = constituents.with_columns(pl.lit("概念板块").alias("type"))
 
-            # 构建 1-to-N 全量股票→板块映射（行业+概念+地域），供 K 线图板块标签使用
+            # 构建 1-to-N 全量股票↔板块双向索引（行业+概念+地域），供板块标签与成分股查询使用
             try:
-                all_map = mapped.unique(subset=["code", "sector_code"]).select([
-                    pl.col("code"),
-                    pl.col("sector_code"),
-                    pl.col("sector_name"),
-                    pl.col("type"),
-                ])
-                sectors_by_code: dict = {}
-                for row in all_map.iter_rows():
-                    sectors_by_code.setdefault(row[0], []).append((row[1], row[2], row[3]))
-                self.stock_sectors = sectors_by_code
-                logger.info(f"Node {self.node_index}: stock_sectors built: {len(self.stock_sectors)} stocks mapped")
+                self.sector_index = SectorIndex.build(mapped)
+                logger.info(f"Node {self.node_index}: sector_index built: {len(self.sector_index)} stocks, "
+                            f"{self.sector_index.n_sectors} sectors, {self.sector_index.memory_bytes() / 1024:.0f} KB")
             except Exception as e:
-                logger.error(f"Node {self.node_index}: Failed to build stock_sectors: {e}", exc_info=True)
-                self.stock_sectors = {}
+                logger.error(f"Node {self.node_index}: Failed to build sector_index: {e}", exc_info=True)
+                self.sector_index = SectorIndex()
 
             # 行业优先：1-to-1 主映射
             industry = mapped.filter(pl.col("type") == "行业板块")
@@ -304,6 +960,92 @@ class DataManager:
             logger.error(f"Node {self.node_index}: Failed to build sector mapping: {e}", exc_info=True)
             self.df_mapping = None
 
+    @staticmethod
+    def parse_shards(value, node_index: int, total_nodes: int) -> list:
+        """解析 NODE_SHARDS（逗号分隔分片号）；自身分片总是包含在内，越界项忽略"""
+        shards = {node_index}
+        for part in (value or "").split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if part.isdigit() and int(part) < total_nodes:
+                shards.add(int(part))
+            else:
+                logger.warning(f"Ignoring invalid NODE_SHARDS entry {part!r}")
+        return sorted(shards)
+
+    def _shard_filter(self, df: pl.DataFrame) -> pl.Series:
+        return (df["code"].hash() % self.total_nodes).is_in(self.shards)
+
+    def _build_shard_codes(self):
+        """按分片归集本节点股票代码，供请求级分片限定（副本节点只回答被路由到的分片）"""
+        if self.df_daily is None:
+            self.shard_codes = {}
+            return
+        codes = self.df_daily.select(pl.col("code").unique().sort())
+        codes = codes.with_columns((pl.col("code").hash() % self.total_nodes).alias("shard"))
+        self.shard_codes = {s: codes.filter(pl.col("shard") == s)["code"].to_list() for s in self.shards}
+        logger.info(f"Node {self.node_index}: serving shards {self.shards} "
+                    f"({', '.join(f'{s}: {len(c)}' for s, c in self.shard_codes.items())} codes)")
+
+    def _build_product_index(self):
+        try:
+            self.product_index = ProductIndex.build(self.df_daily)
+            logger.info(f"Node {self.node_index}: product_index built: {len(self.product_index)} products")
+        except Exception as e:
+            logger.warning(f"Node {self.node_index}: Failed to build product index: {e}")
+            self.product_index = ProductIndex()
+
+    ROW_INDEX_TABLES = ("df_daily", "df_weekly", "df_monthly",
+                        "df_sector_daily", "df_sector_weekly", "df_sector_monthly")
+
+    def _build_row_indexes(self):
+        for attr in self.ROW_INDEX_TABLES:
+            try:
+                self._build_row_index(attr)
+            except Exception as e:
+                logger.warning(f"Node {self.node_index}: Failed to build row index for {attr}: {e}")
+                self.row_index = {k: v for k, v in self.row_index.items() if k != attr}
+
+    def _build_row_index(self, attr: str):
+        """
+        构建单表的 code → (offset, length) 行区间索引。
+        要求同一 code 的行连续且按日期升序；不满足时先按 [code, date] 重排表（仅加载期一次）。
+        索引绑定到构建时的表对象：Hot-JIT 挂载列经 mount_columns（Generation.with_table）换表时随之转移，
+        其余任何换表（重载、重排、过滤）都使索引失效。
+        """
+        df = getattr(self, attr, None)
+        if df is None or df.is_empty():
+            self.row_index = {k: v for k, v in self.row_index.items() if k != attr}
+            return
+
+        def spans(frame):
+            return (frame.select(["code", "date"]).with_row_index("_row")
+                    .group_by("code")
+                    .agg(pl.col("_row").min().alias("start"),
+                         pl.col("_row").max().alias("end"),
+                         pl.len().alias("n"),
+                         pl.col("date").is_sorted().alias("sorted")))
+
+        idx = spans(df)
+        contiguous = idx.select(((pl.col("end") - pl.col("start") + 1 == pl.col("n")) & pl.col("sorted")).all()).item()
+        if not contiguous:
+            df = df.sort(["code", "date"])
+            setattr(self, attr, df)
+            idx = spans(df)
+
+        spans_by_code = dict(zip(idx["code"].to_list(), zip(idx["start"].to_list(), idx["n"].to_list())))
+        self.row_index = {**self.row_index, attr: (df, spans_by_code)}
+        logger.info(f"Node {self.node_index}: Row index built for {attr}: {len(idx)} codes")
+
+    def row_spans(self, attr: str):
+        """本请求所见代的行区间索引（见 Generation.row_spans）"""
+        return self.view().row_spans(attr)
+
+    def code_slice(self, attr: str, code: str):
+        """本请求所见代的单代码切片（见 Generation.code_slice）"""
+        return self.view().code_slice(attr, code)
+
     def _apply_forward_adjustment(self):
         """执行前复权处理"""
         if self.df_daily is None or "adjustFactor" not in self.df_daily.columns:
@@ -358,14 +1100,30 @@ class DataManager:
         ]
 
         base = self.df_daily.sort("date")
-        self.df_weekly = base.group_by_dynamic("date", every="1w", by="code").agg(aggs)
-        self.df_monthly = base.group_by_dynamic("date", every="1mo", by="code").agg(aggs)
+        self.df_weekly = base.group_by_dynamic("date", every="1w", group_by="code").agg(aggs)
+        self.df_monthly = base.group_by_dynamic("date", every="1mo", group_by="code").agg(aggs)
 
         # 板块重采样
         if self.df_sector_daily is not None:
             s_base = self.df_sector_daily.sort("date")
-            self.df_sector_weekly = s_base.group_by_dynamic("date", every="1w", by="code").agg(aggs)
-            self.df_sector_monthly = s_base.group_by_dynamic("date", every="1mo", by="code").agg(aggs)
+            self.df_sector_weekly = s_base.group_by_dynamic("date", every="1w", group_by="code").agg(aggs)
+            self.df_sector_monthly = s_base.group_by_dynamic("date", every="1mo", group_by="code").agg(aggs)
+
+
+def _dataset_property(attr: str):
+    def fget(self):
+        return getattr(self._current, attr)
+
+    def fset(self, value):
+        with self._gen_lock:
+            self._current = self._current.replace(**{attr: value})
+
+    return property(fget, fset)
+
+
+for _attr in Generation.FIELDS:
+    setattr(DataManager, _attr, _dataset_property(_attr))
 
 
 data_manager = DataManager()
+
@@ -0,0 +1,88 @@
+"""K 线降采样：长历史视图按目标点数返回，避免客户端下载/绘制无法分辨的 K 线。
+
+- ohlc：等分行区间分桶，open 取首、high 取最大、low 取最小、close 取尾，成交量/额与资金流求和，
+  其余字段取桶内最后值；完全在 Polars 中向量化计算
+- lttb：Largest-Triangle-Three-Buckets，选出保留视觉形状的原始行（用于均线等折线叠加）。
+  每个桶依赖上一桶的选中点，无法整体向量化；y 列一次性取出为列表后单遍扫描，总代价 O(n)
+"""
+
+import polars as pl
+
+DECIMATE_MODES = ("ohlc", "lttb")
+
+# 桶内求和的列（成交与资金流），其余非 OHLC 列取桶内最后值
+SUM_COLUMNS = {"volume", "amount", "net_amount", "main_net", "super_net", "large_net", "medium_net", "small_net"}
+
+
+def _bucket_ids(n: int, points: int) -> pl.Expr:
+    return (pl.int_range(0, n, dtype=pl.Int64) * points // n).alias("_bucket")
+
+
+def ohlc_buckets(df: pl.DataFrame, points: int) -> pl.DataFrame:
+    """按行数均分为 points 个桶并聚合为一根 K 线；date 取桶内首个交易日。"""
+    n = len(df)
+    if points <= 0 or n <= points:
+        return df
+
+    aggs = []
+    for col in df.columns:
+        if col == "date" or col == "open":
+            aggs.append(pl.col(col).first())
+        elif col == "high":
+            aggs.append(pl.col(col).max())
+        elif col == "low":
+            aggs.append(pl.col(col).min())
+        elif col in SUM_COLUMNS:
+            aggs.append(pl.col(col).sum())
+        else:
+            aggs.append(pl.col(col).last())
+
+    return (df.with_columns(_bucket_ids(n, points))
+              .group_by("_bucket", maintain_order=True)
+              .agg(aggs)
+              .drop("_bucket"))
+
+
+def lttb_indices(y: list, points: int) -> list:
+    """返回 LTTB 选中的行号（首尾必选）；x 取行号，交易日等距。"""
+    n = len(y)
+    if points >= n or points < 3:
+        return list(range(n))
+
+    every = (n - 2) / (points - 2)
+    selected = [0]
+    a = 0
+    for i in range(points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # 下一个桶的均值作为第三个顶点
+        nxt_start = end
+        nxt_end = min(int((i + 2) * every) + 1, n)
+        nxt = y[nxt_start:nxt_end] or [y[n - 1]]
+        avg_x = (nxt_start + nxt_end - 1) / 2.0 if nxt_end > nxt_start else float(n - 1)
+        avg_y = sum(nxt) / len(nxt)
+
+        ax, ay = float(a), y[a]
+        best, best_area = start, -1.0
+        for j in range(start, min(end, n - 1)):
+            area = abs((ax - avg_x) * (y[j] - ay) - (ax - j) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def lttb(df: pl.DataFrame, points: int, y: str = "close") -> pl.DataFrame:
+    """保留原始行（不合成新值），适合折线叠加；y 列缺失值向前填充后参与面积计算。"""
+    if points <= 0 or len(df) <= points or y not in df.columns:
+        return df
+    values = df.select(pl.col(y).cast(pl.Float64).forward_fill().fill_null(0.0)).to_series().to_list()
+    return df[lttb_indices(values, points)]
+
+
+def decimate(df: pl.DataFrame, points: int, mode: str = "ohlc", y: str = "close") -> pl.DataFrame:
+    if mode == "lttb":
+        return lttb(df, points, y)
+    return ohlc_buckets(df, points)
@@ -1,12 +1,142 @@
 import polars as pl
+import os
 import re
+import time
+import heapq
+import threading
+import itertools
 import logging
+from contextlib import contextmanager
 from .data_manager import data_manager
 from .security import blink_parser
 from .indicator_registry import WINDOW_NAMES, FIELDS
+from .cost_model import cost_model
+from .metrics import cache_hit, hot_jit_mounts, observe_stages
 
 logger = logging.getLogger(__name__)
 
+# 单次查询墙钟时限（秒），0 表示不限；请求可单独指定更短的时限
+DEFAULT_DEADLINE_S = float(os.getenv("SELECT_DEADLINE_S", "30"))
+
+TIMEFRAME_TABLES = {'D': 'df_daily', 'W': 'df_weekly', 'M': 'df_monthly'}
+
+
+class QueryTimeout(Exception):
+    """查询超过墙钟时限，后台 Polars 查询已被取消。"""
+
+
+def _drain_cancelled(query):
+    # 取消后的后台查询仍会回传结果；句柄提前被回收会令 Polars 工作线程 panic 并中止进程，
+    # 因此由守护线程持有句柄直至其结束
+    try:
+        query.fetch_blocking()
+    except Exception:
+        pass
+
+
+def collect_with_deadline(lf: pl.LazyFrame, timeout_s: float = None) -> pl.DataFrame:
+    """
+    在后台执行 Lazy 查询并轮询结果，超过 timeout_s 秒即取消查询并抛出 QueryTimeout。
+    注意：map_batches 的 Python 内核（注册表 uncancellable：SAR/AROON）持有 GIL 运行、无法中途取消。
+    代价模型按生产规模为它们定价，全市场日线扫描在执行前即超预算被拒；
+    裁剪后的小股票池或周/月线仍可运行，一旦开始只能等其结束，超时在其后生效。
+    """
+    timeout_s = DEFAULT_DEADLINE_S if timeout_s is None else timeout_s
+    if not timeout_s or timeout_s <= 0:
+        return lf.collect()
+    query = lf.collect(background=True)
+    deadline = time.monotonic() + timeout_s
+    delay = 0.001
+    while True:
+        result = query.fetch()
+        if result is not None:
+            return result
+        if time.monotonic() >= deadline:
+            query.cancel()
+            threading.Thread(target=_drain_cancelled, args=(query,), daemon=True).start()
+            raise QueryTimeout(f"Query exceeded deadline of {timeout_s:g}s and was cancelled")
+        time.sleep(delay)
+        delay = min(delay * 2, 0.02)
+
+
+def deadline_after(timeout_s: float = None):
+    """请求级截止时刻（monotonic）；None 表示不限。timeout_s 缺省取 DEFAULT_DEADLINE_S，0 表示不限。"""
+    timeout_s = DEFAULT_DEADLINE_S if timeout_s is None else timeout_s
+    if not timeout_s or timeout_s <= 0:
+        return None
+    return time.monotonic() + timeout_s
+
+
+def time_left(deadline) -> float:
+    """距截止时刻的剩余秒数，可直接传给 collect_with_deadline（0 表示不限）；已过期抛 QueryTimeout。"""
+    if deadline is None:
+        return 0
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise QueryTimeout("Query exceeded deadline before execution")
+    return left
+
+
+class SelectionProfile:
+    """
+    单次选股的分阶段计时（毫秒）与执行信息，直接在真实执行路径上采集。
+    join_plan 只计板块 Join 的 Lazy 计划组装耗时；Join 的实际执行与信号计算融合在 collect 阶段内。
+    """
+
+    def __init__(self, capture_plan: bool = False):
+        self.capture_plan = capture_plan
+        self.timings_ms = {}
+        self.info = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings_ms[name] = round(self.timings_ms.get(name, 0.0) + (time.perf_counter() - t0) * 1000, 3)
+
+    def to_dict(self) -> dict:
+        return {**self.info, "timings_ms": dict(self.timings_ms)}
+
+
+def prune_universe(lf, universe):
+    """按 code 集合过滤行；窗口均按 code 分组计算，先过滤不改变结果"""
+    return lf.filter(pl.col("code").is_in(pl.Series(sorted(universe), dtype=pl.String).implode()))
+
+
+def shard_universe(shards, gen=None):
+    """
+    请求限定的分片 → 股票池。None 表示不限：未指定分片，或指定分片覆盖本节点全部分片。
+    副本节点同时持有多个分片，协调端按分片路由时只应回答被路由的分片，避免合并时重复。
+    gen：本请求的数据代快照（缺省为 data_manager.view()）。
+    """
+    if shards is None or set(shards) >= set(data_manager.shards):
+        return None
+    shard_codes = (gen if gen is not None else data_manager.view()).shard_codes
+    codes = set()
+    for s in shards:
+        codes.update(shard_codes.get(s, ()))
+    return codes
+
+
+def _universe_rows(gen, attr, universe) -> int:
+    """股票池在 attr 表中的行数：有行区间索引时按区间长度累加，否则按 code 列计数"""
+    spans = gen.row_spans(attr)
+    if spans is not None:
+        return sum(spans[c][1] for c in universe if c in spans)
+    df = getattr(gen, attr)
+    return df.select(pl.col("code").is_in(pl.Series(sorted(universe), dtype=pl.String).implode()).sum()).item()
+
+
+def intersect_universe(a, b):
+    """两个股票池求交；None 表示不限"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a & b
+
 
 class SelectionEngine:
     def __init__(self):
@@ -16,71 +146,89 @@ class SelectionEngine:
             rf'\b({_funcs})\s*\(\s*({_fields})\s*,\s*(\d+)\s*\)',
             re.IGNORECASE)
 
-    def _prepare_hot_jit(self, formula: str):
+    def _prepare_hot_jit(self, formula: str, deadline=None, gen=None):
         """
         同步热挂载：全周期广播
         当发现新指标时，强制在 日/周/月 表中全部计算一遍
+        deadline：请求级截止时刻（deadline_after），试算与整列计算均受其约束，超时抛 QueryTimeout
+        gen：本请求的数据代快照（缺省为 data_manager.view()）。
+        返回 (挂载后的快照, 挂载列列表)，请求后续读取须使用返回的快照。
         """
+        gen = gen if gen is not None else data_manager.view()
         matches = self.metric_pattern.findall(formula)
+        mounted = []
         if not matches:
-            return
+            return gen, mounted
 
-        # 定义需要检查的表
-        targets = [('df_daily', data_manager.df_daily),
-                   ('df_weekly', data_manager.df_weekly),
-                   ('df_monthly', data_manager.df_monthly)]
+        # 共享模式：列按快照所属的共享代号发布，代号已变化时 publish_column 不发布
+        shared_gen = gen.shared_generation
 
-        for attr_name, df in targets:
+        for attr_name in data_manager.MOUNT_TABLES:
+            df = getattr(gen, attr_name)
             if df is None:
                 continue
 
-            new_exprs = []
+            new_cols = []
+            shared_names = set()
             for func, field, param in matches:
                 func_name, field_name, p_val = func.upper(), field.upper(), int(param)
                 col_name = f"{func_name}_{field_name}_{p_val}"
+                cache_hit("hot_jit", col_name in df.columns)
 
-                # 如果该表中没有这一列，则加入计算队列
-                if col_name not in df.columns:
+                # 如果该表中没有这一列，则加入计算队列（同一公式内重复出现只算一次）
+                if col_name not in df.columns and col_name not in [c.name for c in new_cols]:
+                    # 其他 worker 已计算并发布的列直接挂接
+                    shared_col = data_manager.shared_column(attr_name, shared_gen, col_name)
+                    if shared_col is not None and len(shared_col) == df.height:
+                        new_cols.append(shared_col)
+                        shared_names.add(col_name)
+                        continue
                     try:
                         if func_name in data_manager.INDICATOR_MAP:
                             base_expr = data_manager.INDICATOR_MAP[func_name](
                                 blink_parser.fields[field_name], p_val
                             )
-                            # 校验：先在当前表上试算一行，若全 null 则不挂载（避免快速路径返回全 null）
-                            test_val = df.select(base_expr.head(1)).item()
+                            # 校验：先在当前表上试算一行，若为 null 则不挂载（避免快速路径返回全 null）
+                            test_val = collect_with_deadline(df.lazy().select(base_expr.head(1)), time_left(deadline)).item()
                             if test_val is None:
                                 logger.warning(f"Hot-JIT skip {col_name} on {attr_name}: test eval returned None")
                                 continue
-                            expr = base_expr.alias(col_name)
-                            new_exprs.append(expr)
+                            new_cols.append(collect_with_deadline(df.lazy().select(base_expr.alias(col_name)),
+                                                                  time_left(deadline)).to_series())
+                    except QueryTimeout:
+                        raise
                     except Exception as e:
                         logger.warning(f"Hot-JIT compute {col_name} on {attr_name} failed: {e}")
                         continue
 
-            if new_exprs:
-                # 挂载列
-                updated_df = df.with_columns(new_exprs)
-                setattr(data_manager, attr_name, updated_df)
-                logger.info(f"Hot-JIT Broadcast: Mounted {len(new_exprs)} cols to {attr_name}")
+            if new_cols:
+                # 挂载列（共享模式下先发布，换成 memory-map 版本）；计算期间已切换到新代时不挂载
+                new_cols = [data_manager.publish_column(attr_name, shared_gen, c) for c in new_cols]
+                mounted_gen = data_manager.mount_columns(gen, attr_name, new_cols)
+                if mounted_gen is gen:
+                    continue
+                gen = mounted_gen
+                for c in new_cols:
+                    hot_jit_mounts.inc(table=attr_name, source="shared" if c.name in shared_names else "local")
+                mounted += [f"{attr_name}.{c.name}" for c in new_cols]
+                logger.info(f"Hot-JIT Broadcast: Mounted {len(new_cols)} cols to {attr_name}")
+        return gen, mounted
 
-    def execute_selector(self, formula: str, timeframe: str, background_tasks):
-        # 1. 执行全周期热挂载
-        self._prepare_hot_jit(formula)
-
-        # 2. 选择当前执行周期的数据表
-        df_attr = {'D': 'df_daily', 'W': 'df_weekly', 'M': 'df_monthly'}.get(timeframe, 'df_daily')
-        df = getattr(data_manager, df_attr)
+    def _build_lazy_frame(self, timeframe: str, gen=None):
+        """选择周期数据表并安全关联板块，返回 (df, lf)；数据未加载时 df 为 None。gen 同 _prepare_hot_jit。"""
+        gen = gen if gen is not None else data_manager.view()
+        df = getattr(gen, TIMEFRAME_TABLES.get(timeframe, 'df_daily'))
 
         s_df_attr = {'D': 'df_sector_daily', 'W': 'df_sector_weekly', 'M': 'df_sector_monthly'}.get(timeframe, 'df_sector_daily')
-        s_df = getattr(data_manager, s_df_attr)
+        s_df = getattr(gen, s_df_attr, None)
 
         if df is None:
-            return {"error": "Data not loaded."}
+            return None, None
         lf = df.lazy()
 
-        # 3. 关联板块 (Safe Join)
+        # 关联板块 (Safe Join)
         # 安全获取 df_mapping，如果不存在则返回 None，避免 AttributeError
-        df_mapping = getattr(data_manager, 'df_mapping', None)
+        df_mapping = getattr(gen, 'df_mapping', None)
         if df_mapping is not None and s_df is not None:
             try:
                 sector_exprs = [pl.col("date"), pl.col("code").alias("sector_code"), pl.col("close").alias("s_close")]
@@ -91,26 +239,300 @@ class SelectionEngine:
                       .join(s_lazy, on=["date", "sector_code"], how="left"))
             except Exception as e:
                 logger.warning(f"Sector join failed: {e}")
-                pass
+        return df, lf
 
+    def static_universe(self, formulas: list, timeframe: str, gen, shards=None):
+        """
+        公式集合的可裁剪股票池：每个可解析公式都有静态股票池时取并集，再与分片股票池求交；None 为不裁剪。
+        解析失败的公式不参与（执行时单独报错），与执行路径的裁剪口径一致。
+        """
+        universes = []
+        for formula in formulas:
+            try:
+                universes.append(blink_parser.parse(formula, timeframe, gen).universe)
+            except Exception:
+                continue
+        universe = set().union(*universes) if universes and all(u is not None for u in universes) else None
+        return intersect_universe(universe, shard_universe(shards, gen))
+
+    def check_cost(self, texts: list, timeframe: str, profile: SelectionProfile = None, gen=None, universe=None):
+        """
+        执行前估算公式总代价（按当前已挂载列扣减），超预算返回 {"error", "status": 422}，否则 None。
+        universe：执行时将裁剪到的股票池（见 static_universe），代价按池内行数计。
+        """
+        gen = gen if gen is not None else data_manager.view()
+        attr = TIMEFRAME_TABLES.get(timeframe, 'df_daily')
+        df = getattr(gen, attr)
+        if df is None:
+            return None
+        rows = df.height if universe is None else _universe_rows(gen, attr, universe)
+        try:
+            estimates = [cost_model.estimate(t, rows, df.columns) for t in texts]
+        except SyntaxError as e:
+            return {"error": str(e)}
+        total = sum(e["cost"] for e in estimates)
+        if profile is not None:
+            profile.info["estimated_cost"] = total
+            profile.info["estimated_rows"] = rows
+            profile.info["cost_budget"] = cost_model.budget
+            profile.info["cost_source"] = cost_model.source
+        if total > cost_model.budget:
+            calls = [b for e in estimates for b in e["breakdown"]]
+            worst = max(calls, key=lambda b: b["cost"])["call"] if calls else texts[0]
+            return {"error": (f"Formula too expensive: estimated cost {total:.3g} exceeds budget "
+                              f"{cost_model.budget:.3g} (most expensive call: {worst})"), "status": 422}
+        return None
+
+    def select_frame(self, formula: str, timeframe: str, order_by: str = None,
+                     limit: int = None, descending: bool = True, fields: list = None,
+                     profile: SelectionProfile = None, timeout_s: float = None, shards: list = None):
+        """
+        在最新交易日上求值信号，返回命中行 DataFrame（code[, _order][, 投影列]）或 {"error": ...}。
+        - order_by：任意 Parser 可解析的序列表达式，按其取值排序（空值剔除）
+        - limit：有界 Top-K，节点仅返回前 K 行，协调端 merge_topk 即可得到全局 Top-K
+        - fields：投影列表（字段或指标调用），附带 name/sector_code/sector_name，
+          与信号在同一 Lazy 查询中求值，列名为原始表达式文本
+        - profile：传入 SelectionProfile 时记录各阶段耗时、指标命中与优化后的 Polars 计划
+        - timeout_s：墙钟时限，超时取消查询并返回 {"error", "status": 504}
+        - shards：仅在这些分片的股票上求值（副本节点按协调端路由回答单个分片）
+        执行前先按代价模型估算，超预算返回 {"error", "status": 422}。
+        """
+        profile = profile if profile is not None else SelectionProfile()
         try:
-            # 4. 解析与计算 (Parser 内部直接引用统一列名)
-            expr = blink_parser.parse_expression(formula, timeframe)
+            return self._select_frame(formula, timeframe, order_by, limit, descending, fields, profile, timeout_s, shards)
+        finally:
+            observe_stages(profile.timings_ms)
 
-            lf = lf.with_columns(expr.alias("_signal"))
+    def _select_frame(self, formula, timeframe, order_by, limit, descending, fields, profile, timeout_s, shards):
+        fields = [f.strip() for f in (fields or []) if f and f.strip()]
+        fields = list(dict.fromkeys(fields))
+        texts = [t for t in [formula, order_by, *fields] if t]
+
+        # 整个请求只读同一代快照（重载切换不会混入新代的表或索引）
+        gen = data_manager.view()
+        universe = self.static_universe([formula], timeframe, gen, shards)
+        rejected = self.check_cost(texts, timeframe, profile, gen, universe)
+        if rejected:
+            return rejected
+
+        # 热挂载与查询共享同一墙钟时限
+        deadline = deadline_after(timeout_s)
+
+        # 1. 执行全周期热挂载（排序/投影表达式中的窗口指标同样挂载）
+        mounted = []
+        try:
+            with profile.stage("hot_jit"):
+                for text in texts:
+                    gen, hits = self._prepare_hot_jit(text, deadline, gen)
+                    mounted += hits
+        except QueryTimeout as e:
+            return {"error": str(e), "status": 504}
+        finally:
+            profile.info["hot_jit_mounted"] = mounted
+
+        # 2. 选择当前执行周期的数据表并关联板块
+        with profile.stage("join_plan"):
+            df, lf = self._build_lazy_frame(timeframe, gen)
+        if df is None:
+            return {"error": "Data not loaded."}
+
+        try:
+            # 3. 解析与计算 (Parser 内部直接引用统一列名)
+            with profile.stage("parse"):
+                parsed = blink_parser.parse(formula, timeframe, gen)
+                universe = intersect_universe(parsed.universe, shard_universe(shards, gen))
+                columns = [parsed.expr.alias("_signal")]
+                hits, live = list(parsed.mounted), list(parsed.live)
+                extra = ([(order_by, "_order")] if order_by else []) + [(t, f"_f{i}") for i, t in enumerate(fields)]
+                for text, alias in extra:
+                    parsed = blink_parser.parse(text, timeframe, gen)
+                    columns.append(parsed.expr.alias(alias))
+                    hits, live = hits + parsed.mounted, live + parsed.live
+            profile.info["indicators_mounted"] = sorted(set(hits))
+            profile.info["indicators_live"] = sorted(set(live))
+
+            # 成员谓词裁剪：先按静态股票池过滤行，再计算窗口
+            if universe is not None:
+                profile.info["universe_size"] = len(universe)
+                lf = prune_universe(lf, universe)
+            lf = lf.with_columns(columns)
 
             if df.is_empty():
-                return []
+                return pl.DataFrame({"code": []}, schema={"code": pl.String})
             last_date = df.select(pl.col("date").max()).item()
 
-            result_df = (lf.filter(pl.col("date") == last_date)
-                         .filter(pl.col("_signal").fill_null(False) == True)
-                         .select("code")
-                         .collect())
+            lf = (lf.filter(pl.col("date") == last_date)
+                  .filter(pl.col("_signal").fill_null(False) == True))
+
+            keep = ["code"]
+            if order_by:
+                keep.append(pl.col("_order").cast(pl.Float64).fill_nan(None))
+            if fields:
+                lf = self._join_metadata(lf, gen)
+                keep += ["name", "sector_code", "sector_name"]
+                keep += [pl.col(f"_f{i}").alias(text) for i, text in enumerate(fields)]
+            lf = lf.select(keep)
 
-            return result_df["code"].to_list()
+            if order_by:
+                # NaN/null 不参与排名；sort + head 由 Polars 优化为 Top-K，同值按 code 稳定排序
+                lf = lf.drop_nulls("_order").sort(["_order", "code"], descending=[descending, False])
+            elif limit:
+                lf = lf.sort("code")
+
+            if limit:
+                lf = lf.head(limit)
+
+            if profile.capture_plan:
+                profile.info["plan"] = lf.explain()
+
+            with profile.stage("collect"):
+                result = collect_with_deadline(lf, time_left(deadline))
+                # JSON 不接受 NaN：浮点投影列统一以 null 表示
+                return result.with_columns(pl.col(pl.Float32, pl.Float64).fill_nan(None))
+        except QueryTimeout as e:
+            return {"error": str(e), "status": 504}
         except Exception as e:
             return {"error": str(e)}
 
+    def explain(self, formula: str, timeframe: str, **kwargs):
+        """执行一次真实选股并返回 (结果, SelectionProfile)；profile 额外包含规范化公式、回看窗口与优化计划。"""
+        profile = SelectionProfile(capture_plan=True)
+        try:
+            profile.info["canonical_formula"] = blink_parser.canonicalize(formula)
+            profile.info["lookback_bars"] = blink_parser.lookback(formula)
+        except SyntaxError as e:
+            return {"error": str(e)}, profile
+        result = self.select_frame(formula, timeframe, profile=profile, **kwargs)
+        return result, profile
+
+    def _join_metadata(self, lf, gen):
+        """为命中行补齐股票名称与主板块（代码+名称）；仅作用于最新交易日的少量行。"""
+        schema = lf.collect_schema().names()
+        df_mapping = getattr(gen, 'df_mapping', None)
+        if "sector_code" not in schema:
+            if df_mapping is not None:
+                lf = lf.join(df_mapping.lazy(), on="code", how="left")
+            else:
+                lf = lf.with_columns(pl.lit(None, dtype=pl.String).alias("sector_code"))
+
+        names = getattr(gen, 'df_stock_names', None)
+        if names is not None:
+            lf = lf.join(names.lazy(), on="code", how="left")
+        else:
+            lf = lf.with_columns(pl.lit(None, dtype=pl.String).alias("name"))
+
+        s_list = getattr(gen, 'df_sector_list', None)
+        if s_list is not None and "code" in s_list.columns and "name" in s_list.columns:
+            s_names = s_list.lazy().select([pl.col("code").alias("sector_code"), pl.col("name").alias("sector_name")]).unique(subset=["sector_code"], keep="first")
+            lf = lf.join(s_names, on="sector_code", how="left")
+        else:
+            lf = lf.with_columns(pl.lit(None, dtype=pl.String).alias("sector_name"))
+        return lf
+
+    def execute_batch(self, formulas: list, timeframe: str, timeout_s: float = None, shards: list = None) -> list:
+        """
+        批量选股：N 个公式共享一次 Lazy 构建与板块 Join，全部信号列在同一个
+        with_columns 中求值（Polars 公共子表达式消除复用共享指标），一次 collect。
+        返回与 formulas 一一对应的 {"formula","count","results"} 或 {"formula","error"}。
+        整批共享代价预算与墙钟时限；shards 同 select_frame。
+        合并查询运行期出错（如某公式触发计算错误）时，在剩余时限内逐个公式重新求值，
+        使每个公式得到各自的结果或错误。
+        """
+        deadline = deadline_after(timeout_s)
+        gen = data_manager.view()
+        universe = self.static_universe(formulas, timeframe, gen, shards)
+        rejected = self.check_cost(formulas, timeframe, gen=gen, universe=universe)
+        if rejected:
+            return [{"formula": f, **rejected} for f in formulas]
+
+        try:
+            for formula in formulas:
+                gen, _ = self._prepare_hot_jit(formula, deadline, gen)
+        except QueryTimeout as e:
+            return [{"formula": f, "error": str(e), "status": 504} for f in formulas]
+
+        df, lf = self._build_lazy_frame(timeframe, gen)
+        if df is None:
+            return [{"formula": f, "error": "Data not loaded."} for f in formulas]
+
+        # 解析失败的公式单独报错，不影响其余公式
+        outputs = [{"formula": f} for f in formulas]
+        signals = []
+        universes = []
+        for i, formula in enumerate(formulas):
+            try:
+                parsed = blink_parser.parse(formula, timeframe, gen)
+                signals.append((i, parsed.expr.alias(f"_signal_{i}")))
+                universes.append(parsed.universe)
+            except Exception as e:
+                outputs[i]["error"] = str(e)
+
+        if not signals:
+            return outputs
+        # 仅当每个公式都有静态股票池时，才能按并集裁剪
+        universe = set().union(*universes) if all(u is not None for u in universes) else None
+        universe = intersect_universe(universe, shard_universe(shards, gen))
+        if universe is not None:
+            lf = prune_universe(lf, universe)
+        if df.is_empty():
+            for i, _ in signals:
+                outputs[i].update({"count": 0, "results": []})
+            return outputs
+
+        last_date = df.select(pl.col("date").max()).item()
+
+        def collect_signals(batch):
+            names = [f"_signal_{i}" for i, _ in batch]
+            hits = collect_with_deadline(
+                lf.with_columns([e for _, e in batch])
+                .filter(pl.col("date") == last_date)
+                .select(["code"] + [pl.col(n).fill_null(False) for n in names])
+                .filter(pl.any_horizontal(names)),
+                time_left(deadline))
+            for (i, _), name in zip(batch, names):
+                codes = hits.filter(pl.col(name))["code"].to_list()
+                outputs[i].update({"count": len(codes), "results": codes})
+
+        try:
+            collect_signals(signals)
+            return outputs
+        except QueryTimeout as e:
+            for i, _ in signals:
+                outputs[i].update({"error": str(e), "status": 504})
+            return outputs
+        except Exception as e:
+            if len(signals) == 1:
+                outputs[signals[0][0]].update({"error": str(e), "status": 400})
+                return outputs
+            logger.info(f"Batch collect failed ({e}); re-evaluating {len(signals)} formulas individually")
+
+        for sig in signals:
+            try:
+                collect_signals([sig])
+            except QueryTimeout as e:
+                outputs[sig[0]].update({"error": str(e), "status": 504})
+            except Exception as e:
+                outputs[sig[0]].update({"error": str(e), "status": 400})
+        return outputs
+
+    def execute_selector(self, formula: str, timeframe: str, background_tasks):
+        result = self.select_frame(formula, timeframe)
+        if isinstance(result, dict):
+            return result
+        return result["code"].to_list()
+
+
+def merge_topk(partials: list, limit: int, descending: bool = True) -> list:
+    """
+    K 路归并各节点的有序 Top-K 结果（每个 partial 为 {"results": [...], "values": [...]}）。
+    返回全局前 limit 个 (code, value)，与单机排序结果一致。
+    """
+    streams = [list(zip(p.get("values", []), p.get("results", []))) for p in partials if p]
+    if descending:
+        merged = heapq.merge(*streams, key=lambda vc: (-vc[0], vc[1]))
+    else:
+        merged = heapq.merge(*streams, key=lambda vc: (vc[0], vc[1]))
+    return [(code, value) for value, code in itertools.islice(merged, limit)]
+
 
 selection_engine = SelectionEngine()
\ No newline at end of file
@@ -5,9 +5,22 @@
 - pos_int = 正整数常量（1 ≤ n ≤ 500）
 - series  = field 或 一层窗口函数调用（如 MA(CLOSE,20)）
 - cond    = 布尔表达式（Compare > >= < <= 或 AND/OR 组合）
+- sector  = 板块代码或名称的字符串常量（如 "BK1036"），由 Parser 解析为成分股代码集合
+- product = 产品关键词字符串常量（如 "锂电池"），由 Parser 经倒排索引解析为 (代码, 暴露度) 两列
 
 "window": True 的条目签名恒为 [field, pos_int]，参与 Hot-JIT 挂载/统计；
 其余为慢路径实时计算。开发者新增指标只需在此字典加一项。
+
+"cost" 为算子内核的相对代价等级（简单滚动窗口 = 1），供 cost_model 估算公式工作量。
+
+可选键（用于回看窗口估计）：
+- lookback   = 内部固定窗口的回看 bar 数（如 BBI 固定 24 日），与 pos_int 参数叠加
+- cumulative = True 表示全历史累计型算子（如 OBV/SAR），回看窗口为全历史
+- universe   = True 表示成员谓词：结果只取决于 code，处于顶层 AND 中时可在计算窗口前裁剪股票池
+- exposure   = True 表示按 code 查表的取值（如产品暴露度），与非负常量比较（> / >=）时同样可裁剪股票池
+- uncancellable = True 表示 map_batches 的 Python 内核（持有 GIL、查询超时也无法中途取消）。
+  其 cost 按生产规模定价：全市场日线（约 8M 行）必超默认预算，只能在裁剪后的股票池或周/月线上运行；
+  cost_model 加载实测代价表时这类内核不低于注册表等级
 """
 
 import polars as pl
@@ -23,6 +36,17 @@ def cross_down(a, b):
     return (a < b) & (prev_a >= prev_b)
 
 
+def in_sector(members):
+    """板块成员谓词：members 为 Parser 解析出的成分股代码 Series"""
+    return pl.col("code").is_in(members.implode())
+
+
+def product_exposure(lookup):
+    """产品暴露度(%)：lookup 为 Parser 经倒排索引得到的 (codes, exposures)，未覆盖的股票为 0"""
+    codes, exposures = lookup
+    return pl.col("code").replace_strict(codes, exposures, default=0.0, return_dtype=pl.Float64)
+
+
 def count(cond, n):
     return cond.cast(pl.Int32).rolling_sum(window_size=n).over("code")
 
@@ -322,75 +346,81 @@ def _cr(n: int):
 
 INDICATORS = {
     # ---- window 型（签名 [field, pos_int]，Hot-JIT 挂载）----
-    "MA":  {"func": lambda c, n: c.rolling_mean(window_size=n).over("code"),            "window": True, "signature": ["field", "pos_int"]},
-    "EMA": {"func": lambda c, n: c.ewm_mean(span=n, adjust=False).over("code"),          "window": True, "signature": ["field", "pos_int"]},
-    "STD": {"func": lambda c, n: c.rolling_std(window_size=n).over("code"),             "window": True, "signature": ["field", "pos_int"]},
-    "ROC": {"func": lambda c, n: ((c / c.shift(n).over("code")) - 1) * 100, "window": True, "signature": ["field", "pos_int"]},
-    "REF": {"func": lambda c, n: c.shift(n).over("code"),                               "window": True, "signature": ["field", "pos_int"]},
-    "HHV": {"func": lambda c, n: c.rolling_max(window_size=n).over("code"),             "window": True, "signature": ["field", "pos_int"]},
-    "LLV": {"func": lambda c, n: c.rolling_min(window_size=n).over("code"),             "window": True, "signature": ["field", "pos_int"]},
-    "SUM": {"func": lambda c, n: c.rolling_sum(window_size=n).over("code"),             "window": True, "signature": ["field", "pos_int"]},
+    "MA":  {"func": lambda c, n: c.rolling_mean(window_size=n).over("code"),            "cost": 1, "window": True, "signature": ["field", "pos_int"]},
+    "EMA": {"func": lambda c, n: c.ewm_mean(span=n, adjust=False).over("code"),          "cost": 1, "window": True, "signature": ["field", "pos_int"]},
+    "STD": {"func": lambda c, n: c.rolling_std(window_size=n).over("code"),             "cost": 1, "window": True, "signature": ["field", "pos_int"]},
+    "ROC": {"func": lambda c, n: ((c / c.shift(n).over("code")) - 1) * 100, "cost": 1, "window": True, "signature": ["field", "pos_int"]},
+    "REF": {"func": lambda c, n: c.shift(n).over("code"),                               "cost": 1, "window": True, "signature": ["field", "pos_int"]},
+    "HHV": {"func": lambda c, n: c.rolling_max(window_size=n).over("code"),             "cost": 1, "window": True, "signature": ["field", "pos_int"]},
+    "LLV": {"func": lambda c, n: c.rolling_min(window_size=n).over("code"),             "cost": 1, "window": True, "signature": ["field", "pos_int"]},
+    "SUM": {"func": lambda c, n: c.rolling_sum(window_size=n).over("code"),             "cost": 1, "window": True, "signature": ["field", "pos_int"]},
     # ---- 非 window 型（慢路径实时计算）----
-    "CROSS_UP":   {"func": cross_up,   "window": False, "signature": ["series", "series"]},
-    "CROSS_DOWN": {"func": cross_down, "window": False, "signature": ["series", "series"]},
-    "MAX": {"func": lambda a, b: pl.max_horizontal(a, b), "window": False, "signature": ["series", "series"]},
-    "MIN": {"func": lambda a, b: pl.min_horizontal(a, b), "window": False, "signature": ["series", "series"]},
-    "ABS": {"func": lambda x: x.abs(), "window": False, "signature": ["series"]},
-    "COUNT":    {"func": count,    "window": False, "signature": ["cond", "pos_int"]},
-    "BARSLAST": {"func": barslast, "window": False, "signature": ["cond"]},
+    "CROSS_UP":   {"func": cross_up,   "cost": 1, "window": False, "signature": ["series", "series"]},
+    "CROSS_DOWN": {"func": cross_down, "cost": 1, "window": False, "signature": ["series", "series"]},
+    "MAX": {"func": lambda a, b: pl.max_horizontal(a, b), "cost": 1, "window": False, "signature": ["series", "series"]},
+    "MIN": {"func": lambda a, b: pl.min_horizontal(a, b), "cost": 1, "window": False, "signature": ["series", "series"]},
+    "ABS": {"func": lambda x: x.abs(), "cost": 1, "window": False, "signature": ["series"]},
+    "COUNT":    {"func": count,    "cost": 1, "window": False, "signature": ["cond", "pos_int"]},
+    "BARSLAST": {"func": barslast, "cost": 2, "window": False, "signature": ["cond"]},
+    "IN_SECTOR": {"func": in_sector, "cost": 1, "window": False, "signature": ["sector"], "universe": True},
+    "PRODUCT_EXPOSURE": {"func": product_exposure, "cost": 1, "window": False, "signature": ["product"], "exposure": True},
     # ---- 单值复合指标（非 window，慢路径实时计算）----
     "ATR": {"func": lambda n: pl.max_horizontal(
             pl.col("high") - pl.col("low"),
             (pl.col("high") - pl.col("close").shift(1)).abs(),
             (pl.col("low") - pl.col("close").shift(1)).abs(),
         ).rolling_mean(window_size=n).over("code"),
-        "window": False, "signature": ["pos_int"]},
+        "cost": 3, "window": False, "signature": ["pos_int"]},
     "RSI": {"func": lambda c, n: (lambda gain, loss: 100 * gain / (gain + loss))(
             c.diff().over("code").clip(lower_bound=0).rolling_mean(window_size=n).over("code"),
             (-c.diff().over("code")).clip(lower_bound=0).rolling_mean(window_size=n).over("code")),
-        "window": False, "signature": ["series", "pos_int"]},
+        "cost": 3, "window": False, "signature": ["series", "pos_int"]},
     "BOLL_UPPER": {"func": lambda c, n, k: c.rolling_mean(window_size=n).over("code")
             + k * c.rolling_std(window_size=n).over("code"),
-        "window": False, "signature": ["series", "pos_int", "pos_int"]},
+        "cost": 2, "window": False, "signature": ["series", "pos_int", "pos_int"]},
     "BOLL_LOWER": {"func": lambda c, n, k: c.rolling_mean(window_size=n).over("code")
             - k * c.rolling_std(window_size=n).over("code"),
-        "window": False, "signature": ["series", "pos_int", "pos_int"]},
+        "cost": 2, "window": False, "signature": ["series", "pos_int", "pos_int"]},
     "KDJ_K": {"func": lambda n, m: _kdj_rsv(n).rolling_mean(window_size=m).over("code"),
-        "window": False, "signature": ["pos_int", "pos_int"]},
+        "cost": 3, "window": False, "signature": ["pos_int", "pos_int"]},
     "KDJ_D": {"func": lambda n, m: _kdj_rsv(n).rolling_mean(window_size=m).over("code")
             .rolling_mean(window_size=m).over("code"),
-        "window": False, "signature": ["pos_int", "pos_int"]},
+        "cost": 4, "window": False, "signature": ["pos_int", "pos_int"]},
     # ---- MACD 三分量（固定用 CLOSE，慢路径实时计算）----
     "MACD_DIF": {"func": lambda fast, slow: _macd_dif(fast, slow),
-        "window": False, "signature": ["pos_int", "pos_int"]},
+        "cost": 2, "window": False, "signature": ["pos_int", "pos_int"]},
     "MACD_DEA": {"func": lambda fast, slow, signal: _macd_dea(fast, slow, signal),
-        "window": False, "signature": ["pos_int", "pos_int", "pos_int"]},
+        "cost": 3, "window": False, "signature": ["pos_int", "pos_int", "pos_int"]},
     "MACD_HIST": {"func": lambda fast, slow, signal: _macd_hist(fast, slow, signal),
-        "window": False, "signature": ["pos_int", "pos_int", "pos_int"]},
+        "cost": 4, "window": False, "signature": ["pos_int", "pos_int", "pos_int"]},
     # ---- 常规量化平台指标补齐（慢路径实时计算）----
-    "DMI_PDI": {"func": lambda n: _dmi_di("p", n), "window": False, "signature": ["pos_int"]},
-    "DMI_MDI": {"func": lambda n: _dmi_di("m", n), "window": False, "signature": ["pos_int"]},
-    "DMI_ADX": {"func": _dmi_adx, "window": False, "signature": ["pos_int"]},
-    "OBV": {"func": _obv, "window": False, "signature": []},
-    "CCI": {"func": _cci, "window": False, "signature": ["pos_int"]},
-    "WR": {"func": _wr, "window": False, "signature": ["pos_int"]},
-    "MFI": {"func": _mfi, "window": False, "signature": ["pos_int"]},
-    "SAR": {"func": _sar, "window": False, "signature": []},
-    "AROON_UP": {"func": _aroon_up, "window": False, "signature": ["pos_int"]},
-    "AROON_DOWN": {"func": _aroon_down, "window": False, "signature": ["pos_int"]},
-    "TRIX": {"func": _trix, "window": False, "signature": ["pos_int"]},
-    "BBI": {"func": _bbi, "window": False, "signature": []},
-    "VWAP": {"func": _vwap, "window": False, "signature": ["pos_int"]},
-    "BIAS": {"func": lambda n: _bias(pl.col("close"), n), "window": False, "signature": ["pos_int"]},
-    "KDJ_J": {"func": _kdj_j, "window": False, "signature": ["pos_int", "pos_int"]},
-    "BOLL_MID": {"func": _boll_mid, "window": False, "signature": ["series", "pos_int"]},
-    "PPO": {"func": _ppo, "window": False, "signature": ["pos_int", "pos_int"]},
-    "DEMA": {"func": _dema, "window": False, "signature": ["series", "pos_int"]},
-    "TEMA": {"func": _tema, "window": False, "signature": ["series", "pos_int"]},
-    "UO": {"func": _uo, "window": False, "signature": []},
-    "VR": {"func": _vr, "window": False, "signature": ["pos_int"]},
-    "PSY": {"func": _psy, "window": False, "signature": ["pos_int"]},
-    "CR": {"func": _cr, "window": False, "signature": ["pos_int"]},
+    "DMI_PDI": {"func": lambda n: _dmi_di("p", n), "cost": 6, "window": False, "signature": ["pos_int"]},
+    "DMI_MDI": {"func": lambda n: _dmi_di("m", n), "cost": 6, "window": False, "signature": ["pos_int"]},
+    "DMI_ADX": {"func": _dmi_adx, "cost": 12, "window": False, "signature": ["pos_int"]},
+    "OBV": {"func": _obv, "cost": 2, "window": False, "signature": [], "cumulative": True},
+    "CCI": {"func": _cci, "cost": 4, "window": False, "signature": ["pos_int"]},
+    "WR": {"func": _wr, "cost": 3, "window": False, "signature": ["pos_int"]},
+    "MFI": {"func": _mfi, "cost": 5, "window": False, "signature": ["pos_int"]},
+    # 逐行 Python 迭代：SAR 与窗口无关；AROON 每行扫描整窗，代价与 n 成正比（window_exponent = 1）
+    "SAR": {"func": _sar, "cost": 10000, "window": False, "signature": [], "cumulative": True,
+        "uncancellable": True},
+    "AROON_UP": {"func": _aroon_up, "cost": 2000, "window_exponent": 1.0, "window": False, "signature": ["pos_int"],
+        "uncancellable": True},
+    "AROON_DOWN": {"func": _aroon_down, "cost": 2000, "window_exponent": 1.0, "window": False, "signature": ["pos_int"],
+        "uncancellable": True},
+    "TRIX": {"func": _trix, "cost": 4, "window": False, "signature": ["pos_int"]},
+    "BBI": {"func": _bbi, "cost": 4, "window": False, "signature": [], "lookback": 24},
+    "VWAP": {"func": _vwap, "cost": 3, "window": False, "signature": ["pos_int"]},
+    "BIAS": {"func": lambda n: _bias(pl.col("close"), n), "cost": 2, "window": False, "signature": ["pos_int"]},
+    "KDJ_J": {"func": _kdj_j, "cost": 5, "window": False, "signature": ["pos_int", "pos_int"]},
+    "BOLL_MID": {"func": _boll_mid, "cost": 1, "window": False, "signature": ["series", "pos_int"]},
+    "PPO": {"func": _ppo, "cost": 3, "window": False, "signature": ["pos_int", "pos_int"]},
+    "DEMA": {"func": _dema, "cost": 3, "window": False, "signature": ["series", "pos_int"]},
+    "TEMA": {"func": _tema, "cost": 5, "window": False, "signature": ["series", "pos_int"]},
+    "UO": {"func": _uo, "cost": 8, "window": False, "signature": [], "lookback": 29},
+    "VR": {"func": _vr, "cost": 5, "window": False, "signature": ["pos_int"]},
+    "PSY": {"func": _psy, "cost": 2, "window": False, "signature": ["pos_int"]},
+    "CR": {"func": _cr, "cost": 5, "window": False, "signature": ["pos_int"]},
 }
 
 # 字段白名单：必须与 security.py 现有 fields 键集逐项一致（防 drift）
@@ -449,6 +479,8 @@ DESCRIPTIONS = {
     "VR": "N日量比（(上涨量+0.5平盘量)/(下跌量+0.5平盘量)*100）",
     "PSY": "N日心理线（上涨天数占比*100）",
     "CR": "N日能量指标（上涨中间价动量/下跌中间价动量*100）",
+    "IN_SECTOR": "属于指定板块（板块代码如\"BK1036\"或板块名称，行业/概念/地域均可）",
+    "PRODUCT_EXPOSURE": "产品收入占比(%)（最新季报产品构成，参数为产品关键词如\"锂电池\"，未涉及为0）",
 }
 
 EXAMPLE_QUERIES = [
@@ -465,6 +497,8 @@ EXAMPLE_QUERIES = [
     "MFI(14) < 20",
     "CLOSE > SAR()",
     "PCT_CHG >= LIMIT_UP_PCT",
+    'IN_SECTOR("BK1036") AND CLOSE > MA(CLOSE, 20)',
+    'PRODUCT_EXPOSURE("锂电池") > 30',
 ]
 
 TIMEFRAMES = ["D", "W", "M"]
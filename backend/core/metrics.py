@@ -0,0 +1,178 @@
+"""进程内指标（Prometheus 文本格式 0.0.4），不依赖 prometheus_client。
+
+- Counter / Histogram：请求路径上累加，带标签，线程安全
+- 采集时回调（collector）：常驻表/索引大小、Hot-JIT 挂载、加载阶段耗时等按需计算，不在请求路径上维护
+"""
+
+import math
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 延迟类直方图默认桶（秒）：覆盖 1ms 级缓存命中到十秒级全历史回测
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.help = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # key → [各桶计数（非累计）, sum, count]
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = next(i for i, b in enumerate(self.buckets) if value <= b)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._series.items())
+        lines = self.header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class GaugeFamily:
+    """采集时生成的 gauge：collect() 返回 [(标签 dict, 值)]"""
+
+    def __init__(self, name: str, documentation: str, collect):
+        self.name = name
+        self.help = documentation
+        self.collect = collect
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.collect():
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._metrics.get(name) or self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.get(name) or self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, collect) -> GaugeFamily:
+        return self._register(GaugeFamily(name, documentation, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines += metric.render()
+            except Exception as e:
+                # 单个采集回调失败不影响其余指标
+                lines.append(f"# {metric.name} collection failed: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# ---- 请求路径上累加的指标 ----
+http_latency = metrics.histogram(
+    "blinkquant_http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"))
+selection_stage = metrics.histogram(
+    "blinkquant_selection_stage_seconds", "Selection engine stage timings (hot_jit, join_plan, parse, collect)",
+    ("stage",))
+cache_requests = metrics.counter(
+    "blinkquant_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+hot_jit_mounts = metrics.counter(
+    "blinkquant_hot_jit_mounts_total", "Hot-JIT columns mounted (computed locally or attached from shared store)",
+    ("table", "source"))
+
+
+def cache_hit(cache: str, hit: bool):
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def observe_stages(timings_ms: dict):
+    for stage, ms in timings_ms.items():
+        selection_stage.observe(ms / 1000.0, stage=stage)
@@ -0,0 +1,87 @@
+"""产品暴露倒排索引：产品关键词 → (股票代码, 收入占比 %)。
+
+源数据为日线 product_ratios 列（`产品A:80.5|产品B:15.2`，按季报 ASOF 对齐）。
+加载时取每只股票最新一根 K 线的值，向量化拆分为 (product, code, exposure) 长表并按产品排序，
+查询时按产品名定位连续区间，主题筛选只需一次字典查找，无需逐行解析字符串。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+import polars as pl
+from .metrics import cache_hit
+
+# 关键词模糊匹配结果缓存的条目上限（LRU）：关键词来自用户输入，不设上限会随请求无界增长
+KEYWORD_CACHE_SIZE = int(os.getenv("PRODUCT_KEYWORD_CACHE_SIZE", "256"))
+
+# 单条 "名称:占比" 的解析：名称本身可含冒号，占比取最后一个冒号后的数值（可带 %）
+_ITEM_PATTERN = r"^\s*(?P<product>.+?)\s*:\s*(?P<exposure>-?\d+(?:\.\d+)?)\s*%?\s*$"
+
+
+class ProductIndex:
+    def __init__(self, table: pl.DataFrame = None):
+        if table is None:
+            table = pl.DataFrame(schema={"product": pl.String, "code": pl.String, "exposure": pl.Float64})
+        self.table = table
+        spans = (table.with_row_index("_row")
+                 .group_by("product", maintain_order=True)
+                 .agg(pl.col("_row").first().alias("start"), pl.len().alias("n")))
+        self.product_pos = dict(zip(spans["product"].to_list(),
+                                    zip(spans["start"].to_list(), spans["n"].to_list())))
+        # 关键词模糊匹配结果缓存（有界 LRU）：keyword → (codes, exposures)；
+        # 缓存挂在索引实例上，重建索引即得到空缓存。选股在线程池中并发执行，读写加锁
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def build(cls, df: pl.DataFrame) -> "ProductIndex":
+        """df 需含 code/date/product_ratios；每只股票取最新一条非空 product_ratios。"""
+        if df is None or "product_ratios" not in df.columns:
+            return cls()
+        latest = (df.select(["code", "date", "product_ratios"])
+                  .filter(pl.col("product_ratios").is_not_null() & (pl.col("product_ratios") != ""))
+                  .group_by("code")
+                  .agg(pl.col("product_ratios").sort_by("date").last()))
+        table = (latest
+                 .with_columns(pl.col("product_ratios").str.split("|"))
+                 .explode("product_ratios")
+                 .with_columns(pl.col("product_ratios").str.extract_groups(_ITEM_PATTERN))
+                 .unnest("product_ratios")
+                 .with_columns(pl.col("exposure").cast(pl.Float64, strict=False))
+                 .drop_nulls(["product", "exposure"])
+                 .group_by(["product", "code"])
+                 .agg(pl.col("exposure").sum())
+                 .sort(["product", "code"])
+                 .select(["product", "code", "exposure"]))
+        return cls(table)
+
+    def __len__(self):
+        return len(self.product_pos)
+
+    def lookup(self, keyword: str):
+        """
+        返回 (codes, exposures) 两个 Series；不存在返回 None。
+        优先精确匹配产品名；否则在产品名词表中做子串匹配，同一股票多个命中产品的占比相加。
+        """
+        span = self.product_pos.get(keyword)
+        if span is not None:
+            part = self.table.slice(span[0], span[1])
+            return part["code"], part["exposure"]
+        with self._cache_lock:
+            cached = self._cache.get(keyword)
+            if cached is not None:
+                self._cache.move_to_end(keyword)
+        cache_hit("product_keyword", cached is not None)
+        if cached is not None:
+            return cached
+        names = [p for p in self.product_pos if keyword in p]
+        if not names:
+            return None
+        part = (pl.concat([self.table.slice(*self.product_pos[p]) for p in names])
+                .group_by("code").agg(pl.col("exposure").sum()).sort("code"))
+        result = (part["code"], part["exposure"])
+        with self._cache_lock:
+            self._cache[keyword] = result
+            while len(self._cache) > KEYWORD_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
@@ -0,0 +1,137 @@
+"""按请求开启的采样剖析：仅在显式请求（且通过管理员认证）时启用，关闭时请求路径上没有任何额外开销。
+
+- 采样线程按固定间隔读取目标线程的 Python 栈（sys._current_frames），聚合为 flamegraph 折叠栈
+  （"root;...;leaf count"，可直接交给 flamegraph.pl / speedscope）
+- 同时以 cProfile 记录函数级累计耗时（Polars 在 Rust 侧执行，栈上表现为 collect 等调用本身的耗时）
+- 结果与 Polars 优化计划一起存入有界环形缓冲区，按 ID 取回；最旧的记录先被淘汰
+"""
+
+import os
+import sys
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "32"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+# cProfile 函数表保留条数
+PROFILE_TOP_FUNCTIONS = 40
+
+
+class ProfilerBusy(Exception):
+    """同一时刻只允许一个剖析会话（cProfile 与采样线程的开销不应叠加到多个请求上）"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id: int, interval_s: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self.samples = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+def _top_functions(prof: cProfile.Profile, limit: int = PROFILE_TOP_FUNCTIONS) -> list:
+    stats = pstats.Stats(prof).stats
+    rows = sorted(stats.items(), key=lambda kv: kv[1][3], reverse=True)[:limit]
+    return [{"function": f"{os.path.basename(file)}:{line}({func})", "calls": nc,
+             "tottime_ms": round(tt * 1000, 3), "cumtime_ms": round(ct * 1000, 3)}
+            for (file, line, func), (cc, nc, tt, ct, callers) in rows]
+
+
+class ProfileSession:
+    """单次剖析：ID 在开始时分配，调用方可在执行中附加 Polars 计划/分阶段耗时"""
+
+    def __init__(self, kind: str, params: dict):
+        self.id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.params = params
+        self.extra = {}
+        self.status = "ok"
+
+    def attach(self, **info):
+        self.extra.update({k: v for k, v in info.items() if v is not None})
+
+
+class ProfileStore:
+    def __init__(self, capacity: int = PROFILE_RING_SIZE):
+        self.capacity = max(1, capacity)
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+
+    def add(self, record: dict):
+        with self._lock:
+            self._records[record["id"]] = record
+            while len(self._records) > self.capacity:
+                self._records.popitem(last=False)
+
+    def get(self, profile_id: str):
+        with self._lock:
+            return self._records.get(profile_id)
+
+    def list(self) -> list:
+        """最新在前的摘要（不含折叠栈与函数表）"""
+        keys = ("id", "kind", "params", "status", "created_at", "duration_ms", "samples")
+        with self._lock:
+            records = list(self._records.values())
+        return [{k: r[k] for k in keys} for r in reversed(records)]
+
+    @contextmanager
+    def capture(self, kind: str, params: dict, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        """在当前线程上剖析 with 块；块内异常照常抛出，记录仍会保存（超时/报错的请求正是排查对象）"""
+        if not self._active.acquire(blocking=False):
+            raise ProfilerBusy("Another profile is already running on this node")
+        session = ProfileSession(kind, params)
+        sampler = StackSampler(threading.get_ident(), interval_ms / 1000)
+        prof = cProfile.Profile()
+        created_at = time.time()
+        t0 = time.perf_counter()
+        sampler.start()
+        prof.enable()
+        try:
+            yield session
+        except BaseException as e:
+            session.status = f"error: {getattr(e, 'detail', None) or repr(e)}"
+            raise
+        finally:
+            prof.disable()
+            duration_ms = round((time.perf_counter() - t0) * 1000, 3)
+            sampler.stop()
+            self._active.release()
+            self.add({
+                "id": session.id, "kind": kind, "params": params, "status": session.status,
+                "created_at": created_at, "duration_ms": duration_ms,
+                "sample_interval_ms": interval_ms, "samples": sampler.samples,
+                "collapsed": [f"{stack} {n}" for stack, n in sampler.stacks.most_common()],
+                "top_functions": _top_functions(prof), **session.extra,
+            })
+
+
+profile_store = ProfileStore()
@@ -0,0 +1,137 @@
+"""股票 ↔ 板块双向成员索引（CSR 压缩行存储）。
+
+- 板块元数据（代码/名称/类型）只存一份，成员关系中仅保存整数 ID
+- stock → sectors 与 sector → stocks 各一组 (indptr, indices) 定长数组，
+  第 i 个实体的成员为 indices[indptr[i]:indptr[i+1]]，两个方向均为 O(1) 定位
+- 完全由 Polars 向量化构建，不逐行 iter_rows
+"""
+
+from array import array
+import polars as pl
+from .metrics import cache_hit
+
+
+def _csr(pairs: pl.DataFrame, row_col: str, val_col: str):
+    """由 (row_id, val_id) 对构建 CSR；要求每个 row_id 至少出现一次（由调用方保证）"""
+    ordered = pairs.sort([row_col, val_col])
+    counts = ordered.group_by(row_col).agg(pl.len().alias("n")).sort(row_col)
+    indptr = array("I", [0])
+    indptr.extend(counts["n"].cum_sum().to_list())
+    indices = array("I", ordered[val_col].to_list())
+    return indptr, indices
+
+
+class SectorIndex:
+    def __init__(self, stock_codes=(), sector_codes=(), sector_names=(), sector_types=(),
+                 stock_indptr=None, stock_indices=None, sector_indptr=None, sector_indices=None):
+        self.stock_codes = list(stock_codes)
+        self.sector_codes = list(sector_codes)
+        self.sector_names = list(sector_names)
+        self.sector_types = list(sector_types)
+        self.stock_pos = {c: i for i, c in enumerate(self.stock_codes)}
+        self.sector_pos = {c: i for i, c in enumerate(self.sector_codes)}
+        # 名称 → 板块 ID（同名取代码最小者），供 DSL 以名称引用板块
+        self.name_pos = {}
+        for i, name in enumerate(self.sector_names):
+            if name is not None:
+                self.name_pos.setdefault(name, i)
+        # 每个板块的成分股代码 Series（DSL 成员谓词使用），首次引用时构建后常驻
+        self._member_series = {}
+        self.stock_indptr = stock_indptr if stock_indptr is not None else array("I", [0])
+        self.stock_indices = stock_indices if stock_indices is not None else array("I")
+        self.sector_indptr = sector_indptr if sector_indptr is not None else array("I", [0])
+        self.sector_indices = sector_indices if sector_indices is not None else array("I")
+
+    @classmethod
+    def build(cls, mapping: pl.DataFrame) -> "SectorIndex":
+        """
+        mapping: 列 code, sector_code, sector_name, type（可含重复行）。
+        板块名称/类型取该板块首个出现值。
+        """
+        mapping = (mapping.select(["code", "sector_code", "sector_name", "type"])
+                   .drop_nulls(["code", "sector_code"])
+                   .unique(subset=["code", "sector_code"]))
+        if mapping.is_empty():
+            return cls()
+
+        sectors = (mapping.group_by("sector_code")
+                   .agg(pl.col("sector_name").first(), pl.col("type").first())
+                   .sort("sector_code")
+                   .with_row_index("sector_id"))
+        stocks = mapping.select("code").unique().sort("code").with_row_index("stock_id")
+        pairs = (mapping.select(["code", "sector_code"])
+                 .join(stocks, on="code")
+                 .join(sectors.select(["sector_code", "sector_id"]), on="sector_code")
+                 .select(["stock_id", "sector_id"]))
+
+        stock_indptr, stock_indices = _csr(pairs, "stock_id", "sector_id")
+        sector_indptr, sector_indices = _csr(pairs, "sector_id", "stock_id")
+        return cls(stocks["code"].to_list(), sectors["sector_code"].to_list(),
+                   sectors["sector_name"].to_list(), sectors["type"].to_list(),
+                   stock_indptr, stock_indices, sector_indptr, sector_indices)
+
+    def __len__(self):
+        return len(self.stock_codes)
+
+    @property
+    def n_sectors(self) -> int:
+        return len(self.sector_codes)
+
+    def sector_info(self, sector_code: str):
+        """板块元数据 (code, name, type)；不存在返回 None"""
+        sid = self.sector_pos.get(sector_code)
+        if sid is None:
+            return None
+        return (self.sector_codes[sid], self.sector_names[sid], self.sector_types[sid])
+
+    def resolve(self, key: str):
+        """板块代码或名称 → 板块代码；不存在返回 None"""
+        sid = self.sector_pos.get(key)
+        if sid is None:
+            sid = self.name_pos.get(key)
+        return None if sid is None else self.sector_codes[sid]
+
+    def member_series(self, sector_code: str) -> pl.Series:
+        """板块成分股代码的 Polars Series（按板块缓存），用于 pl.col("code").is_in(...) 成员掩码"""
+        series = self._member_series.get(sector_code)
+        cache_hit("sector_members", series is not None)
+        if series is None:
+            series = pl.Series("code", self.constituents(sector_code), dtype=pl.String)
+            self._member_series[sector_code] = series
+        return series
+
+    def sectors_of(self, code: str) -> list:
+        """股票所属全部板块 [(sector_code, name, type)]，按板块代码排序"""
+        i = self.stock_pos.get(code)
+        if i is None:
+            return []
+        ids = self.stock_indices[self.stock_indptr[i]:self.stock_indptr[i + 1]]
+        return [(self.sector_codes[s], self.sector_names[s], self.sector_types[s]) for s in ids]
+
+    def constituents(self, sector_code: str) -> list:
+        """板块成分股代码列表（已排序）；板块不存在返回空列表"""
+        sid = self.sector_pos.get(sector_code)
+        if sid is None:
+            return []
+        ids = self.sector_indices[self.sector_indptr[sid]:self.sector_indptr[sid + 1]]
+        return [self.stock_codes[i] for i in ids]
+
+    def to_frame(self) -> pl.DataFrame:
+        """还原为 build() 可接受的长表 (code, sector_code, sector_name, type)，用于导出/跨进程共享"""
+        schema = {"code": pl.String, "sector_code": pl.String, "sector_name": pl.String, "type": pl.String}
+        if not self.stock_codes:
+            return pl.DataFrame(schema=schema)
+        counts = pl.Series(self.stock_indptr, dtype=pl.UInt32).diff(null_behavior="drop")
+        sectors = pl.DataFrame({"sector_id": range(len(self.sector_codes)), "sector_code": self.sector_codes,
+                                "sector_name": self.sector_names, "type": self.sector_types},
+                               schema_overrides={"sector_id": pl.UInt32, "sector_name": pl.String, "type": pl.String})
+        pairs = pl.DataFrame({
+            "code": pl.Series(self.stock_codes, dtype=pl.String).repeat_by(counts).explode(),
+            "sector_id": pl.Series(self.stock_indices, dtype=pl.UInt32),
+        })
+        return pairs.join(sectors, on="sector_id", how="left").select(list(schema))
+
+    def memory_bytes(self) -> int:
+        """CSR 数组占用字节数（不含代码字符串与字典）"""
+        return sum(a.itemsize * len(a) for a in (self.stock_indptr, self.stock_indices,
+                                                  self.sector_indptr, self.sector_indices))
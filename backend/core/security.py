@@ -1,7 +1,8 @@
 import ast
+import copy
 import re
 import polars as pl
-from typing import Any
+from typing import Any, NamedTuple, Optional
 from .data_manager import data_manager
 from .indicator_registry import INDICATORS, FIELDS, WINDOW_NAMES
 
@@ -76,6 +77,12 @@ def _strip_outer_parens(text: str) -> str:
     return t
 
 
+def normalize_formula(expr_str: str) -> str:
+    """兼容性替换（含大写逻辑词归一化，兼容 LLM 输出；\b 词边界容忍多空格/开头位置）"""
+    clean_expr = re.sub(r'\b(AND|OR|NOT)\b', lambda m: m.group(1).lower(), expr_str.strip())
+    return clean_expr.replace('&&', '&').replace('||', '|')
+
+
 def _require_positive_int(node: ast.AST) -> int:
     """参数必须是正整数常量，且 1 ≤ n ≤ 500。"""
     if not isinstance(node, ast.Constant) or isinstance(node.value, bool) or not isinstance(node.value, int):
@@ -86,6 +93,18 @@ def _require_positive_int(node: ast.AST) -> int:
         raise ValueError(f"Window argument must be at most {WINDOW_MAX}")
     return node.value
 
+class _FullHistory(Exception):
+    """回看估计内部信号：遇到全历史累计型算子。"""
+
+
+class ParseResult(NamedTuple):
+    """单次解析结果：Polars 表达式、静态股票池（None 为全市场）、命中的已挂载列与实时计算的调用"""
+    expr: Any
+    universe: Optional[set]
+    mounted: list
+    live: list
+
+
 class BlinkParser:
     def __init__(self):
         # 基础算子映射
@@ -118,22 +137,115 @@ class BlinkParser:
             'TURN': pl.col('turn'),
             'LIMIT_UP_PCT': _limit_up_pct_expr(),
         }
-        # 当前解析上下文
-        self.current_df = None
-        self.current_source = None
+        # 当前解析上下文（parse 在每次解析的副本上设置，单例本身不保存解析结果）
+        self._reset(None, None)
 
-    def parse_expression(self, expr_str: str, timeframe: str = 'D') -> pl.Expr:
-        """解析入口：根据 timeframe 设置当前数据上下文"""
-        if timeframe == 'W': self.current_df = data_manager.df_weekly
-        elif timeframe == 'M': self.current_df = data_manager.df_monthly
-        else: self.current_df = data_manager.df_daily
-        
-        # 兼容性替换（含大写逻辑词归一化，兼容 LLM 输出；\b 词边界容忍多空格/开头位置）
-        clean_expr = re.sub(r'\b(AND|OR|NOT)\b', lambda m: m.group(1).lower(), expr_str.strip())
-        clean_expr = clean_expr.replace('&&', '&').replace('||', '|')
-        self.current_source = clean_expr
+    def _reset(self, df, source, gen=None):
+        self.current_df = df
+        self.current_source = source
+        # 本次解析所读的数据代快照（板块/产品索引）；None 时取 data_manager.view()
+        self.current_gen = gen
+        # 指标命中情况（explain/profile 使用）：已挂载列 vs 实时计算
+        self._mounted = []
+        self._live = []
+        # 成员/暴露度谓词调用节点 → 成分股集合 / (代码, 暴露度)，用于推导静态股票池
+        self._call_members = {}
+        self._call_values = {}
+
+    def parse(self, expr_str: str, timeframe: str = 'D', gen=None) -> ParseResult:
+        """
+        解析入口：根据 timeframe 设置数据上下文，在单例的浅副本上求值，
+        并发解析互不干扰；股票池与指标命中随结果返回。
+        gen：请求的数据代快照，表与板块/产品索引均从中读取（缺省为 data_manager.view()）。
+        """
+        gen = gen if gen is not None else data_manager.view()
+        if timeframe == 'W': df = gen.df_weekly
+        elif timeframe == 'M': df = gen.df_monthly
+        else: df = gen.df_daily
+
+        clean_expr = normalize_formula(expr_str)
+        ctx = copy.copy(self)
+        ctx._reset(df, clean_expr, gen)
         tree = ast.parse(clean_expr, mode='eval')
-        return self._visit(tree.body)
+        expr = ctx._visit(tree.body)
+        return ParseResult(expr, ctx._universe(tree.body), ctx._mounted, ctx._live)
+
+    def parse_expression(self, expr_str: str, timeframe: str = 'D') -> pl.Expr:
+        """只取表达式的解析入口"""
+        return self.parse(expr_str, timeframe).expr
+
+    def _universe(self, node: Any):
+        """
+        由成员谓词静态推导股票池：AND 取各已知分支的交集，OR 仅在所有分支均已知时取并集。
+        谓词只依赖 code，调用方可据此在计算窗口前裁剪行（按 code 分组的窗口结果不变）。
+        """
+        if isinstance(node, ast.Call):
+            return self._call_members.get(id(node))
+        if isinstance(node, ast.Compare):
+            return self._compare_universe(node)
+        if isinstance(node, ast.BoolOp) or (isinstance(node, ast.BinOp) and type(node.op) in (ast.BitAnd, ast.BitOr)):
+            is_and = type(node.op) in (ast.And, ast.BitAnd)
+            children = node.values if isinstance(node, ast.BoolOp) else [node.left, node.right]
+            sets = [self._universe(c) for c in children]
+            known = [u for u in sets if u is not None]
+            if is_and:
+                return set.intersection(*known) if known else None
+            return set.union(*known) if len(known) == len(sets) else None
+        return None
+
+    def canonicalize(self, expr_str: str) -> str:
+        """规范化公式文本：名称大写、统一空白与逻辑词（AND/OR/NOT），同义公式得到同一文本。"""
+        tree = ast.parse(normalize_formula(expr_str), mode='eval')
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                node.id = node.id.upper()
+        text = ast.unparse(tree)
+        return re.sub(r'\b(and|or|not)\b', lambda m: m.group(1).upper(), text)
+
+    def lookback(self, expr_str: str):
+        """估计公式所需回看 bar 数：沿调用嵌套链累加窗口参数，取各分支最大值；全历史累计型算子返回 None。"""
+        tree = ast.parse(normalize_formula(expr_str), mode='eval')
+        try:
+            return self._lookback(tree.body)
+        except _FullHistory:
+            return None
+
+    def _lookback(self, node: Any) -> int:
+        children = list(ast.iter_child_nodes(node))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            entry = INDICATORS.get(node.func.id.upper(), {})
+            if entry.get("cumulative"):
+                raise _FullHistory()
+            own = sum(a.value for a in node.args
+                      if isinstance(a, ast.Constant) and isinstance(a.value, int) and not isinstance(a.value, bool))
+            own += entry.get("lookback", 0)
+            if node.func.id.upper() in ("CROSS_UP", "CROSS_DOWN"):
+                own += 1
+            return own + max((self._lookback(a) for a in node.args), default=0)
+        return max((self._lookback(c) for c in children), default=0)
+
+    def _compare_universe(self, node: ast.Compare):
+        """
+        查表取值（exposure）与常量比较：X > c / X >= c（或 c < X / c <= X）。
+        未覆盖股票取值为 0，故仅当 0 不满足条件时，股票池才能收缩为满足条件的已覆盖股票。
+        """
+        if len(node.ops) != 1:
+            return None
+        left, op, right = node.left, type(node.ops[0]), node.comparators[0]
+        flipped = {ast.Lt: ast.Gt, ast.LtE: ast.GtE}
+        if isinstance(left, ast.Constant) and op in flipped:
+            left, right, op = right, left, flipped[op]
+        values = self._call_values.get(id(left))
+        if values is None or op not in (ast.Gt, ast.GtE):
+            return None
+        if not isinstance(right, ast.Constant) or isinstance(right.value, bool) or not isinstance(right.value, (int, float)):
+            return None
+        threshold = right.value
+        if (op is ast.Gt and threshold < 0) or (op is ast.GtE and threshold <= 0):
+            return None
+        codes, exposures = values
+        mask = exposures > threshold if op is ast.Gt else exposures >= threshold
+        return set(codes.filter(mask).to_list())
 
     def _visit(self, node: Any) -> Any:
         if isinstance(node, ast.Constant): return node.value
@@ -185,8 +297,15 @@ class BlinkParser:
                 field_name, n = args
                 pure_key = f"{func}_{field_name}_{n}"
                 if self.current_df is not None and pure_key in self.current_df.columns:
+                    self._mounted.append(pure_key)
                     return pl.col(pure_key)
+                self._live.append(pure_key)
                 return entry["func"](self.fields[field_name], n)
+            self._live.append(func)
+            if entry.get("universe"):
+                self._call_members[id(node)] = set(args[0].to_list())
+            if entry.get("exposure"):
+                self._call_values[id(node)] = args[0]
             return entry["func"](*args)
 
         raise ValueError(f"Syntax not allowed: {type(node)}")
@@ -201,8 +320,31 @@ class BlinkParser:
             return self._require_series(node, func)
         if kind == "cond":
             return self._require_cond(node, func)
+        if kind == "sector":
+            return self._require_sector(node, func)
+        if kind == "product":
+            return self._require_product(node, func)
         raise ValueError(f"Unknown signature kind {kind}")
 
+    def _require_sector(self, node: Any, func: str) -> Any:
+        """sector = 板块代码或名称的字符串常量；返回该板块成分股代码 Series。"""
+        if not isinstance(node, ast.Constant) or not isinstance(node.value, str):
+            raise ValueError(f"Function {func} arg must be a sector code or name string")
+        index = (self.current_gen or data_manager.view()).sector_index
+        sector_code = index.resolve(node.value.strip())
+        if sector_code is None:
+            raise ValueError(f"Unknown sector {node.value}")
+        return index.member_series(sector_code)
+
+    def _require_product(self, node: Any, func: str) -> Any:
+        """product = 产品关键词字符串常量；返回倒排索引中的 (codes, exposures)。"""
+        if not isinstance(node, ast.Constant) or not isinstance(node.value, str) or not node.value.strip():
+            raise ValueError(f"Function {func} arg must be a product keyword string")
+        found = (self.current_gen or data_manager.view()).product_index.lookup(node.value.strip())
+        if found is None:
+            raise ValueError(f"Unknown product {node.value}")
+        return found
+
     def _require_series(self, node: Any, func: str) -> Any:
         """series = 白名单字段 或 签名不含 cond 形态的算子调用（含窗口/非窗口） 或 +-*/ 算术表达式。"""
         if isinstance(node, ast.Name):
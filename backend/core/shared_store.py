@@ -0,0 +1,201 @@
+"""多 Worker 共享数据集：加载者把处理后的表导出为未压缩 Arrow IPC 文件（建议放在 /dev/shm），
+各 Uvicorn worker 以 memory-map 零拷贝挂接，多个进程共用同一份物理页。
+
+目录布局（SHARED_DATA_DIR）：
+  manifest.json                          当前代清单（写临时文件后 os.replace 原子发布）
+  gen-{n}/{attr}.arrow                   各表与索引底表
+  gen-{n}/mounts/{attr}/{column}.arrow   Hot-JIT 挂载列：任一 worker 计算后发布，其余 worker 直接挂接
+  loader.lock                            加载者选举（flock）：持有者负责从 HF 加载/重载并导出
+  reload.request                         非加载者收到重载请求时写入，由加载者执行
+  load_error.json                        加载者加载/导出失败时写入（随即释放加载者锁），成功导出后删除
+
+Linux 上删除已被 mmap 的文件不影响现有映射，旧代目录可在发布新代后直接清理。
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import fcntl
+import logging
+import polars as pl
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+LOCK_FILE = "loader.lock"
+RELOAD_REQUEST = "reload.request"
+LOAD_ERROR = "load_error.json"
+# 列名/表名用作文件名，只接受安全字符
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+def read_arrow(path: str) -> pl.DataFrame:
+    """memory-map 读取未压缩 IPC 文件；pyarrow 映射 + from_arrow(rechunk=False) 不复制数据缓冲区"""
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    return pl.from_arrow(table, rechunk=False)
+
+
+def write_arrow(df: pl.DataFrame, path: str):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    df.write_ipc(tmp, compression="uncompressed")
+    os.replace(tmp, path)
+
+
+class SharedStore:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock_fd = None
+
+    @classmethod
+    def from_env(cls):
+        root = os.getenv("SHARED_DATA_DIR", "").strip()
+        return cls(root) if root else None
+
+    @property
+    def is_loader(self) -> bool:
+        return self._lock_fd is not None
+
+    def try_lead(self) -> bool:
+        """非阻塞争抢加载者锁；进程存活期间持有，退出时由内核释放"""
+        if self._lock_fd is not None:
+            return True
+        fd = os.open(os.path.join(self.root, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def release(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def manifest(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _gen_dir(self, generation: int) -> str:
+        return os.path.join(self.root, f"gen-{generation}")
+
+    def export(self, tables: dict, meta: dict = None) -> dict:
+        """
+        tables: {名称: DataFrame}（None 跳过）。写入新一代目录后原子发布清单，并清理更早的代
+        （保留上一代供尚未切换的 worker 继续映射）。返回新清单。
+        """
+        current = self.manifest()
+        generation = (current["generation"] if current else 0) + 1
+        gen_dir = self._gen_dir(generation)
+        shutil.rmtree(gen_dir, ignore_errors=True)
+        os.makedirs(os.path.join(gen_dir, "mounts"))
+        written = {}
+        for name, df in tables.items():
+            if df is None:
+                continue
+            write_arrow(df, os.path.join(gen_dir, f"{name}.arrow"))
+            written[name] = f"{name}.arrow"
+        manifest = {**(meta or {}), "generation": generation, "tables": written, "created_at": time.time()}
+        tmp = os.path.join(self.root, f"{MANIFEST}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(self.root, MANIFEST))
+        self.clear_load_error()
+        for entry in os.listdir(self.root):
+            if entry.startswith("gen-") and entry not in (f"gen-{generation}", f"gen-{generation - 1}"):
+                shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+        return manifest
+
+    def attach(self, manifest: dict) -> dict:
+        """按清单 memory-map 挂接全部表 → {名称: DataFrame}"""
+        gen_dir = self._gen_dir(manifest["generation"])
+        return {name: read_arrow(os.path.join(gen_dir, fname)) for name, fname in manifest["tables"].items()}
+
+    # ---- Hot-JIT 挂载列 ----
+
+    def _mount_path(self, generation: int, attr: str, column: str) -> str:
+        return os.path.join(self._gen_dir(generation), "mounts", attr, f"{column}.arrow")
+
+    def mounted_column(self, generation: int, attr: str, column: str):
+        """已发布的挂载列（memory-map）；不存在返回 None"""
+        if not (_SAFE_NAME.match(attr) and _SAFE_NAME.match(column)):
+            return None
+        path = self._mount_path(generation, attr, column)
+        if not os.path.exists(path):
+            return None
+        return read_arrow(path).to_series()
+
+    def publish_mount(self, generation: int, attr: str, series: pl.Series) -> pl.Series:
+        """发布挂载列并返回其 memory-map 版本（本 worker 随即释放堆上副本）；已被其他 worker 发布时直接复用"""
+        if not (_SAFE_NAME.match(attr) and _SAFE_NAME.match(series.name)):
+            return series
+        path = self._mount_path(generation, attr, series.name)
+        if not os.path.exists(path):
+            if not os.path.isdir(self._gen_dir(generation)):
+                return series
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_arrow(series.to_frame(), path)
+        return read_arrow(path).to_series()
+
+    def list_mounts(self, generation: int) -> dict:
+        """{attr: [column, ...]}"""
+        base = os.path.join(self._gen_dir(generation), "mounts")
+        mounts = {}
+        if os.path.isdir(base):
+            for attr in sorted(os.listdir(base)):
+                cols = [f[:-len(".arrow")] for f in sorted(os.listdir(os.path.join(base, attr))) if f.endswith(".arrow")]
+                if cols:
+                    mounts[attr] = cols
+        return mounts
+
+    # ---- 加载失败传播 ----
+
+    def publish_load_error(self, error: str):
+        """记录加载者的失败原因，供等待清单的 worker 上报并在退避后接手重试"""
+        tmp = os.path.join(self.root, f"{LOAD_ERROR}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"error": error, "failed_at": time.time(), "pid": os.getpid()}, f)
+        os.replace(tmp, os.path.join(self.root, LOAD_ERROR))
+
+    def load_error(self):
+        try:
+            with open(os.path.join(self.root, LOAD_ERROR)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def clear_load_error(self):
+        try:
+            os.remove(os.path.join(self.root, LOAD_ERROR))
+        except FileNotFoundError:
+            pass
+
+    # ---- 重载请求转交 ----
+
+    def request_reload(self, force: bool = False):
+        tmp = os.path.join(self.root, f"{RELOAD_REQUEST}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"force": force, "requested_at": time.time(), "pid": os.getpid()}, f)
+        os.replace(tmp, os.path.join(self.root, RELOAD_REQUEST))
+
+    def pop_reload_request(self):
+        path = os.path.join(self.root, RELOAD_REQUEST)
+        try:
+            with open(path) as f:
+                request = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return None
+        return request
@@ -0,0 +1,207 @@
+"""节点间热启动快照：重启节点从 build_id 相同的健康对等节点拉取已处理好的表，跳过 HF 下载与前复权/重采样。
+
+- 服务端：manifest 列出各表的分区；个股表按分片 + 代码区间分区（利用行区间索引零拷贝切片），
+  板块 K 线按代码区间分区，小表整表一个分区。每个分区以 LZ4 Arrow IPC stream 返回，附 SHA-256 校验头
+- 客户端：为本节点每个分片挑选持有该分片的对等节点，逐分区拉取并校验，任一分片无人持有、
+  校验失败或对端数据代变化则放弃（调用方回退到 HF 全量加载）
+- 各节点 Hot-JIT 挂载列不同，合并时只保留所有分区共有的列
+"""
+
+import io
+import hashlib
+import logging
+import httpx
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+# 个股表：按分片导出；板块表：全节点一致
+SHARDED_TABLES = ("df_daily", "df_weekly", "df_monthly")
+INDEXED_TABLES = ("df_sector_daily", "df_sector_weekly", "df_sector_monthly")
+SMALL_TABLES = ("df_stock_names", "df_mapping", "df_sector_list", "sector_index")
+SNAPSHOT_TABLES = SHARDED_TABLES + INDEXED_TABLES + SMALL_TABLES
+ALL_SHARDS = "all"
+
+CHECKSUM_HEADER = "X-Snapshot-SHA256"
+PART_RETRIES = 2
+
+
+class SnapshotVersionChanged(Exception):
+    """对端在传输过程中切换了数据代"""
+
+
+def _n_parts(n_codes: int, codes_per_part: int) -> int:
+    return max(1, -(-n_codes // codes_per_part))
+
+
+def _partition_codes(gen, table: str, shard) -> list:
+    if table in SHARDED_TABLES:
+        return list(gen.shard_codes.get(int(shard), []))
+    spans = gen.row_spans(table)
+    if spans is not None:
+        return sorted(spans)
+    df = getattr(gen, table, None)
+    return [] if df is None else df["code"].unique().sort().to_list()
+
+
+def build_manifest(dm, codes_per_part: int) -> dict:
+    """本节点快照清单；表与索引取自本请求钉住的数据代（dm.view()），与分区请求读同一代"""
+    gen = dm.view()
+    tables = {}
+    for table in SHARDED_TABLES:
+        if getattr(gen, table, None) is not None:
+            tables[table] = {"parts": {str(s): _n_parts(len(gen.shard_codes.get(s, [])), codes_per_part)
+                                       for s in dm.shards}}
+    for table in INDEXED_TABLES:
+        if getattr(gen, table, None) is not None:
+            tables[table] = {"parts": {ALL_SHARDS: _n_parts(len(_partition_codes(gen, table, ALL_SHARDS)), codes_per_part)}}
+    for table in SMALL_TABLES:
+        if table == "sector_index" or getattr(gen, table, None) is not None:
+            tables[table] = {"parts": {ALL_SHARDS: 1}}
+    return {"build_id": dm.build_id, "revision": gen.dataset_revision, "version": gen.data_version,
+            "shards": dm.shards, "total_shards": dm.total_nodes, "codes_per_part": codes_per_part,
+            "tables": tables}
+
+
+def _rows_for_codes(gen, table: str, codes: list) -> pl.DataFrame:
+    """按代码取行：命中行区间索引时拼接零拷贝切片，否则整表过滤"""
+    df = getattr(gen, table)
+    index = gen.row_spans(table)
+    if index is not None:
+        spans = [index[c] for c in codes if c in index]
+        if not spans:
+            return df.clear()
+        return pl.concat([df.slice(offset, length) for offset, length in spans], rechunk=False)
+    return df.filter(pl.col("code").is_in(pl.Series(codes, dtype=pl.String).implode()))
+
+
+def snapshot_part(dm, table: str, shard: str, part: int, codes_per_part: int) -> pl.DataFrame:
+    """取单个分区（读本请求钉住的数据代）；表/分片/分区号无效抛 KeyError"""
+    if table not in SNAPSHOT_TABLES:
+        raise KeyError(f"Unknown snapshot table {table}")
+    gen = dm.view()
+    if table == "sector_index":
+        return gen.sector_index.to_frame()
+    df = getattr(gen, table, None)
+    if df is None:
+        raise KeyError(f"Table {table} not loaded")
+    if table in SMALL_TABLES:
+        return df
+    if table in SHARDED_TABLES and (not str(shard).isdigit() or int(shard) not in dm.shards):
+        raise KeyError(f"Shard {shard} not served by this node")
+    codes = _partition_codes(gen, table, shard)
+    if not 0 <= part < _n_parts(len(codes), codes_per_part):
+        raise KeyError(f"Part {part} out of range")
+    return _rows_for_codes(gen, table, codes[part * codes_per_part:(part + 1) * codes_per_part])
+
+
+def encode_part(df: pl.DataFrame) -> tuple:
+    """→ (LZ4 Arrow IPC stream 字节, sha256 十六进制)"""
+    buf = io.BytesIO()
+    df.write_ipc_stream(buf, compression="lz4")
+    body = buf.getvalue()
+    return body, hashlib.sha256(body).hexdigest()
+
+
+def decode_part(body: bytes, checksum: str) -> pl.DataFrame:
+    if hashlib.sha256(body).hexdigest() != checksum:
+        raise ValueError("Snapshot part checksum mismatch")
+    return pl.read_ipc_stream(io.BytesIO(body))
+
+
+def _concat_common(frames: list) -> pl.DataFrame:
+    """只保留所有分区共有的列（各节点 Hot-JIT 挂载列不同），按首个分区的列顺序拼接"""
+    common = set(frames[0].columns).intersection(*(f.columns for f in frames[1:]))
+    cols = [c for c in frames[0].columns if c in common]
+    return pl.concat([f.select(cols) for f in frames], how="vertical_relaxed")
+
+
+class SnapshotClient:
+    def __init__(self, peers: list, build_id: str, token: str = None, timeout_s: float = 120.0):
+        self.peers = [p.rstrip("/") for p in peers]
+        self.build_id = build_id
+        self.headers = {"X-Admin-Token": token} if token else {}
+        self.timeout_s = timeout_s
+        self.stats = {"parts": 0, "bytes": 0, "retries": 0}
+
+    async def _manifests(self, client) -> dict:
+        """健康且 build_id 一致的对等节点 → 其快照清单"""
+        found = {}
+        for peer in self.peers:
+            try:
+                health = (await client.get(f"{peer}/api/v1/health")).json()
+                if health.get("status") != "healthy" or health.get("build_id") != self.build_id:
+                    continue
+                res = await client.get(f"{peer}/api/v1/admin/snapshot")
+                res.raise_for_status()
+                manifest = res.json()
+                if manifest.get("build_id") == self.build_id:
+                    found[peer] = manifest
+            except Exception as e:
+                logger.info(f"Snapshot: peer {peer} unavailable: {e!r}")
+        return found
+
+    @staticmethod
+    def plan(manifests: dict, shards: list):
+        """分片 → 对等节点（按配置顺序首个持有者）；板块/小表取首个对等节点。任一分片无人持有返回 None"""
+        if not manifests:
+            return None
+        plan = {ALL_SHARDS: next(iter(manifests))}
+        for shard in shards:
+            owner = next((p for p, m in manifests.items() if shard in m.get("shards", [])), None)
+            if owner is None:
+                return None
+            plan[str(shard)] = owner
+        return plan
+
+    async def _fetch_part(self, client, peer: str, manifest: dict, table: str, shard: str, part: int) -> pl.DataFrame:
+        params = {"table": table, "shard": shard, "part": part, "version": manifest["version"]}
+        last_exc = None
+        for attempt in range(PART_RETRIES + 1):
+            if attempt:
+                self.stats["retries"] += 1
+            try:
+                res = await client.get(f"{peer}/api/v1/admin/snapshot/part", params=params)
+                if res.status_code == 409:
+                    raise SnapshotVersionChanged(res.text)
+                res.raise_for_status()
+                frame = decode_part(res.content, res.headers.get(CHECKSUM_HEADER, ""))
+                self.stats["parts"] += 1
+                self.stats["bytes"] += len(res.content)
+                return frame
+            except SnapshotVersionChanged:
+                raise
+            except Exception as e:
+                last_exc = e
+        raise last_exc
+
+    async def pull(self, shards: list):
+        """
+        拉取本节点所需全部表 → ({表名: DataFrame}, 主对等节点清单)；
+        无可用对等节点、分片无人持有或传输失败返回 None。
+        """
+        async with httpx.AsyncClient(headers=self.headers, timeout=self.timeout_s) as client:
+            manifests = await self._manifests(client)
+            plan = self.plan(manifests, shards)
+            if plan is None:
+                logger.info(f"Snapshot: no peer set covers shards {shards} at build {self.build_id}")
+                return None
+            tables = {}
+            try:
+                for table in SNAPSHOT_TABLES:
+                    keys = [str(s) for s in shards] if table in SHARDED_TABLES else [ALL_SHARDS]
+                    frames = []
+                    for key in keys:
+                        peer = plan[key]
+                        n_parts = manifests[peer]["tables"].get(table, {}).get("parts", {}).get(key)
+                        if n_parts is None:
+                            break
+                        for part in range(n_parts):
+                            frames.append(await self._fetch_part(client, peer, manifests[peer], table, key, part))
+                    else:
+                        if frames:
+                            tables[table] = _concat_common(frames)
+            except Exception as e:
+                logger.warning(f"Snapshot: transfer failed: {e!r}")
+                return None
+        return tables, manifests[plan[ALL_SHARDS]]
@@ -0,0 +1,179 @@
+"""指标热度上报：进程内聚合计数，定期以单条多行 UPSERT 批量落库。
+
+- 配置 POSTGRES_URL 时写入 Postgres（连接池复用连接）
+- 未配置时写入本地 SQLite 替身（USAGE_SQLITE_PATH），便于本地测试与离线运行
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+from .engine import selection_engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL_S = 30.0
+# 内存中最多累计的不同指标 Key 数；超出部分计入 dropped，避免异常流量撑爆内存
+DEFAULT_MAX_KEYS = 10000
+
+
+class PostgresUsageBackend:
+    """Postgres 后端：线程安全连接池 + execute_values 多行 UPSERT"""
+
+    UPSERT_SQL = """
+        INSERT INTO metrics_stats (metric_key, usage_count, last_used)
+        VALUES %s
+        ON CONFLICT (metric_key)
+        DO UPDATE SET usage_count = metrics_stats.usage_count + EXCLUDED.usage_count,
+                      last_used = GREATEST(metrics_stats.last_used, EXCLUDED.last_used);
+    """
+
+    def __init__(self, url: str, maxconn: int = 2):
+        from psycopg2.pool import ThreadedConnectionPool
+        self.pool = ThreadedConnectionPool(1, maxconn, url)
+
+    def write(self, rows: list):
+        from psycopg2.extras import execute_values
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                execute_values(cur, self.UPSERT_SQL, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+
+    def close(self):
+        self.pool.closeall()
+
+
+class SqliteUsageBackend:
+    """SQLite 替身后端：与 metrics_stats 同构的本地表，UPSERT 语义一致"""
+
+    UPSERT_SQL = """
+        INSERT INTO metrics_stats (metric_key, usage_count, last_used)
+        VALUES (?, ?, ?)
+        ON CONFLICT (metric_key)
+        DO UPDATE SET usage_count = metrics_stats.usage_count + excluded.usage_count,
+                      last_used = MAX(metrics_stats.last_used, excluded.last_used);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS metrics_stats (
+                    metric_key TEXT PRIMARY KEY,
+                    usage_count INTEGER NOT NULL DEFAULT 0,
+                    last_used TEXT
+                )
+            """)
+            self._conn.commit()
+
+    def write(self, rows: list):
+        with self._lock:
+            self._conn.executemany(self.UPSERT_SQL, [(k, n, ts.isoformat()) for k, n, ts in rows])
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class UsageAggregator:
+    def __init__(self, backend=None, max_keys: int = DEFAULT_MAX_KEYS):
+        self._backend = backend
+        self.max_keys = max_keys
+        self._counts = {}
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.flushed_rows = 0
+
+    @property
+    def backend(self):
+        """首次落库时再创建后端，避免导入期建立数据库连接"""
+        if self._backend is None:
+            url = os.getenv("POSTGRES_URL")
+            if url:
+                self._backend = PostgresUsageBackend(url)
+            else:
+                self._backend = SqliteUsageBackend(os.getenv("USAGE_SQLITE_PATH", "data_cache/metrics_usage.sqlite3"))
+        return self._backend
+
+    def record(self, formula: str):
+        """
+        统计公式中的窗口指标
+        策略：全周期统一 Key (如 MA_CLOSE_20)，不带后缀
+        """
+        matches = selection_engine.metric_pattern.findall(formula)
+        if not matches:
+            return
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for func, field, param in matches:
+                key = f"{func.upper()}_{field.upper()}_{param}"
+                if key not in self._counts and len(self._counts) >= self.max_keys:
+                    self.dropped += 1
+                    continue
+                self._counts[key] = self._counts.get(key, 0) + 1
+                self._last_used[key] = now
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._counts)
+
+    def flush(self) -> int:
+        """取走当前计数并一次性批量写入；失败时计数合并回内存，等待下次重试。返回写入行数。"""
+        with self._lock:
+            counts, last_used = self._counts, self._last_used
+            self._counts, self._last_used = {}, {}
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.warning(f"Usage aggregator dropped {dropped} metric hits (max_keys={self.max_keys})")
+        if not counts:
+            return 0
+
+        rows = [(k, n, last_used[k]) for k, n in sorted(counts.items())]
+        try:
+            self.backend.write(rows)
+        except Exception as e:
+            logger.error(f"Usage flush failed ({len(rows)} keys), will retry: {e}")
+            with self._lock:
+                for k, n, ts in rows:
+                    if k in self._counts or len(self._counts) < self.max_keys:
+                        self._counts[k] = self._counts.get(k, 0) + n
+                        self._last_used[k] = max(self._last_used.get(k, ts), ts)
+            return 0
+        self.flushed_rows += len(rows)
+        return len(rows)
+
+    async def run_periodic(self, interval_s: float = None):
+        """后台定时落库（lifespan 中启动）"""
+        interval_s = interval_s or float(os.getenv("USAGE_FLUSH_INTERVAL_S", DEFAULT_FLUSH_INTERVAL_S))
+        while True:
+            await asyncio.sleep(interval_s)
+            t0 = time.perf_counter()
+            n = await asyncio.to_thread(self.flush)
+            if n:
+                logger.info(f"Usage flushed {n} keys in {(time.perf_counter() - t0) * 1000:.1f}ms")
+
+    def close(self):
+        """停机：最后一次落库并释放连接"""
+        self.flush()
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+
+
+usage_aggregator = UsageAggregator()
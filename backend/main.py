@@ -1,8 +1,11 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware  # 新增导入
 from contextlib import asynccontextmanager
 from api.routes import router as api_router
+from api.admin import router as admin_router
 from core.data_manager import data_manager
+from core.usage import usage_aggregator
+from core.metrics import http_latency
 import os
 import time
 import logging
@@ -19,11 +22,16 @@ async def lifespan(app: FastAPI):
 
     # --- 核心修改：异步触发加载，不阻塞 lifespan ---
     # 创建后台任务，不使用 await
-    asyncio.create_task(data_manager.async_load_data())
+    # 配置 SHARED_DATA_DIR 时多个 worker 共享一份 memory-map 数据集（见 DataManager.start）
+    asyncio.create_task(data_manager.start())
+    # 指标热度定期批量落库
+    usage_task = asyncio.create_task(usage_aggregator.run_periodic())
 
     yield
     # --- 停止逻辑 (可选) ---
     logger.info("Shutting down node...")
+    usage_task.cancel()
+    await asyncio.to_thread(usage_aggregator.close)
 
 app = FastAPI(title="BlinkQuant Node", lifespan=lifespan)
 
@@ -36,7 +44,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def pin_generation(request: Request, call_next):
+    # 登记请求所属数据代，双缓冲重载据此排空旧代后再释放
+    with data_manager.pin():
+        return await call_next(request)
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    # 按路由模板（而非原始路径）聚合，避免标签基数随查询参数膨胀
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_latency.observe(time.perf_counter() - t0, method=request.method,
+                             route=getattr(route, "path", "unmatched"), status=str(status))
+
 app.include_router(api_router)
+app.include_router(admin_router)
 
 @app.get("/")
 def index():
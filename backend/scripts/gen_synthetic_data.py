@@ -0,0 +1,406 @@
+"""合成 A 股数据集：按 stockA 产物布局写出 Parquet，供离线开发、基准测试与性能回归使用（无需 HF 访问）。
+
+产物（与 docs/Parquet文件规格说明书.md 一致，ZSTD 压缩，按 code、date 升序）：
+  stock_list.parquet                      code（带 sh./sz./bj. 前缀）, code_name, tradeStatus
+  sector_list.parquet                     code(BKxxxx), name, type（行业板块/概念板块/地域板块）
+  stock_kline_{YYYY}.parquet              个股日线宽表（未复权价格 + 累乘后复权因子 adjustFactor）
+  stock_money_flow_{YYYY}.parquet         资金分档净流入（北交所与早年份缺失，左连接后为空值）
+  sector_kline_{YYYY}.parquet             板块日线
+  sector_constituents_{YYYY}.parquet      最新一年的板块成分（stock_code 为 6 位纯数字）
+
+模拟的结构：
+- 代码段与板块涨跌幅限制：沪主板 60xxxx / 科创板 688xxx / 深主板 000-003xxx / 创业板 30xxxx / 北交所 43/83/87/92xxxx
+- 上市/退市日期（股票池逐年扩大）、ST 区间（5% 限制）、停牌窗口（整段缺行）、上市初期估值空值
+- 每年一次除权除息：未复权价格跳空，adjustFactor 累乘（前复权后价格连续）
+- 收益 = 市场因子 + 所属行业因子 + 个股噪声；行业板块指数与成分股共用行业因子
+
+随机数来自 Polars 表达式哈希，同一 seed 与同一 Polars 版本下结果完全一致。
+默认规模（5000 只 × 20 年，约 2400 万行日线）需要数 GB 内存与数分钟；测试/基准可用 --codes/--years 缩小。
+
+用法：
+  python scripts/gen_synthetic_data.py --out /tmp/stocka --codes 5000 --years 20
+  DATA_DIR=/tmp/stocka uvicorn main:app        # DataManager 从本地目录加载
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+from datetime import date, timedelta
+import polars as pl
+
+# 板块 → (代码段列表, 股票池占比, 开板日期, 涨跌幅限制)
+BOARDS = {
+    "sh_main": ([(600000, 606000)], 0.31, date(1990, 12, 19), 0.10),
+    "sh_star": ([(688000, 689000)], 0.11, date(2019, 7, 22), 0.20),
+    "sz_main": ([(1, 4000)], 0.28, date(1991, 4, 3), 0.10),
+    "sz_chinext": ([(300000, 302000)], 0.25, date(2009, 10, 30), 0.20),
+    "bj": ([(430000, 440000), (830000, 840000), (870000, 874000), (920000, 921000)], 0.05, date(2021, 11, 15), 0.30),
+}
+ST_LIMIT = 0.05
+PINNED_SECTOR = 1036
+# 固定休市区间（近似春节/劳动节/国庆等长假）
+HOLIDAYS = [((1, 1), (1, 3)), ((2, 10), (2, 16)), ((4, 4), (4, 5)), ((5, 1), (5, 5)), ((10, 1), (10, 7))]
+
+INDUSTRIES = [
+    "半导体", "白酒", "银行", "证券", "保险", "医疗器械", "化学制药", "中药", "生物制品", "光伏设备",
+    "电池", "电网设备", "风电设备", "汽车整车", "汽车零部件", "消费电子", "通信设备", "软件开发", "计算机设备", "互联网服务",
+    "房地产开发", "工程建设", "水泥建材", "钢铁行业", "有色金属", "煤炭行业", "石油行业", "化学原料", "化肥行业", "农牧饲渔",
+    "食品饮料", "家电行业", "纺织服装", "商业百货", "旅游酒店", "航运港口", "物流行业", "航空机场", "电力行业", "燃气",
+    "环保行业", "专用设备", "通用设备", "工程机械", "航天航空", "船舶制造", "文化传媒", "游戏", "教育", "贵金属",
+]
+CONCEPTS = [
+    "人工智能", "算力", "数据中心", "锂电池", "储能", "固态电池", "光伏概念", "氢能源", "新能源车", "充电桩",
+    "芯片", "存储芯片", "国产软件", "信创", "云计算", "物联网", "5G", "机器人", "减速器", "低空经济",
+    "创新药", "CRO", "医美", "预制菜", "白马股", "央企改革", "一带一路", "军工", "大飞机", "卫星导航",
+    "数字货币", "跨境支付", "元宇宙", "虚拟现实", "短剧游戏", "稀土永磁", "小金属", "PCB", "光刻机", "华为概念",
+]
+REGIONS = [
+    "北京", "上海", "天津", "重庆", "广东", "浙江", "江苏", "山东", "福建", "安徽", "湖北", "湖南", "河南", "河北",
+    "四川", "陕西", "辽宁", "吉林", "黑龙江", "江西", "广西", "云南", "贵州", "山西", "内蒙古", "新疆", "甘肃",
+    "宁夏", "青海", "海南", "西藏",
+]
+PRODUCTS = ["锂电池", "储能系统", "光伏组件", "逆变器", "服务器", "液冷服务器", "芯片设计", "晶圆代工", "白酒",
+            "医疗器械", "创新药", "汽车零部件", "整车", "电力", "天然气", "钢材", "水泥", "软件服务", "游戏", "其他"]
+FORECAST_GOOD = ["预增", "略增", "扭亏"]
+FORECAST_BAD = ["预减", "略减", "首亏", "增亏"]
+FORECAST_TYPES = FORECAST_GOOD + FORECAST_BAD + ["续亏"]
+_NAME_CHARS = "华中国东方海天新金长安信达通鑫科技能源电子药业宏远兴盛泰和光明嘉创智联恒瑞隆德"
+_NAME_SUFFIX = ["股份", "科技", "集团", "电子", "医药", "能源", "控股", "实业", "材料", "智能"]
+
+
+def trading_days(year: int) -> list:
+    """工作日去掉固定长假；足以复现真实日历的年交易日数（约 242-246 天）与周/月边界"""
+    off = set()
+    for (m1, d1), (m2, d2) in HOLIDAYS:
+        d = date(year, m1, d1)
+        while d <= date(year, m2, d2):
+            off.add(d)
+            d += timedelta(days=1)
+    d, days = date(year, 1, 1), []
+    while d.year == year:
+        if d.weekday() < 5 and d not in off:
+            days.append(d)
+        d += timedelta(days=1)
+    return days
+
+
+def _uniform(key: pl.Expr, seed: int) -> pl.Expr:
+    return (key.hash(seed) % (1 << 53)).cast(pl.Float64) / float(1 << 53)
+
+
+def _normal(key: pl.Expr, seed: int) -> pl.Expr:
+    """Box-Muller：两路独立哈希均匀数 → 标准正态"""
+    u1 = _uniform(key, 2 * seed + 1).clip(1e-12, 1.0)
+    u2 = _uniform(key, 2 * seed + 2)
+    return (-2.0 * u1.log()).sqrt() * (2.0 * math.pi * u2).cos()
+
+
+class _Universe:
+    """股票池与板块结构（每只股票一行，规模小，用 Python random 生成）"""
+
+    def __init__(self, n_codes: int, start_year: int, end_year: int, n_concepts: int, rng: random.Random):
+        self.start, self.end = date(start_year, 1, 1), date(end_year, 12, 31)
+        self.sectors = self._sectors(n_concepts, rng)
+        self.stocks = self._stocks(n_codes, rng)
+        self.events = self._events(rng)
+
+    def _sectors(self, n_concepts: int, rng):
+        concepts = [CONCEPTS[i % len(CONCEPTS)] + ("" if i < len(CONCEPTS) else str(i // len(CONCEPTS) + 1))
+                    for i in range(n_concepts)]
+        names = ([(n, "行业板块") for n in INDUSTRIES] + [(n, "概念板块") for n in concepts]
+                 + [(n, "地域板块") for n in REGIONS])
+        # 半导体固定为 BK1036（EXAMPLE_QUERIES 中的 IN_SECTOR 示例），其余随机分配
+        numbers = [PINNED_SECTOR] + rng.sample([n for n in range(400, 1600) if n != PINNED_SECTOR], len(names) - 1)
+        rows = []
+        for i, ((name, kind), num) in enumerate(zip(names, numbers)):
+            # 概念板块陆续设立，板块 K 线从设立日开始
+            listed = self.start if kind != "概念板块" or rng.random() < 0.4 else \
+                self.start + timedelta(days=rng.randrange((self.end - self.start).days - 200))
+            rows.append({"sector_id": i, "code": f"BK{num:04d}", "name": name, "type": kind,
+                         "list_ord": listed.toordinal(), "base": rng.uniform(800, 3000),
+                         "beta": rng.uniform(0.6, 1.4)})
+        return pl.DataFrame(rows)
+
+    def _stocks(self, n_codes: int, rng):
+        sectors = self.sectors.to_dicts()
+        industries = [s for s in sectors if s["type"] == "行业板块"]
+        concepts = [s for s in sectors if s["type"] == "概念板块"]
+        regions = [s for s in sectors if s["type"] == "地域板块"]
+        # 概念热度近似 Zipf：少数热门概念成分股很多
+        concept_w = [1.0 / (i + 1) ** 0.8 for i in range(len(concepts))]
+        boards = list(BOARDS)
+        weights = [BOARDS[b][1] for b in boards]
+        used, rows = set(), []
+        span_days = (self.end - self.start).days
+        while len(rows) < n_codes:
+            board = rng.choices(boards, weights)[0]
+            ranges, _, opened, limit = BOARDS[board]
+            lo, hi = rng.choice(ranges)
+            num = rng.randrange(lo, hi)
+            if num in used:
+                continue
+            used.add(num)
+            digits = f"{num:06d}"
+            prefix = "sh" if board.startswith("sh") else "sz" if board.startswith("sz") else "bj"
+            # 40% 在区间开始前已上市，其余在区间内陆续上市（不早于所属板块开板）
+            listed = self.start - timedelta(days=365) if rng.random() < 0.4 else \
+                self.start + timedelta(days=rng.randrange(span_days))
+            listed = max(listed, opened)
+            if listed > self.end - timedelta(days=20):
+                listed = self.end - timedelta(days=rng.randrange(20, 400))
+                listed = max(listed, opened)
+            delisted = None
+            if rng.random() < 0.02 and (self.end - listed).days > 400:
+                delisted = listed + timedelta(days=rng.randrange(300, (self.end - listed).days))
+            st_start = st_end = None
+            if rng.random() < 0.05:
+                st_start = listed + timedelta(days=rng.randrange(max(1, (self.end - listed).days)))
+                st_end = st_start + timedelta(days=rng.randrange(120, 730))
+            products = None
+            if rng.random() < 0.35:
+                picks = rng.sample(PRODUCTS, rng.randint(1, 4))
+                cuts = sorted(rng.uniform(0, 100) for _ in range(len(picks) - 1))
+                shares = [b - a for a, b in zip([0.0] + cuts, cuts + [100.0])]
+                products = "|".join(f"{p}:{s:.1f}" for p, s in zip(picks, shares))
+            float_shares = math.exp(rng.gauss(math.log(4e8), 1.0))
+            rows.append({
+                "code_id": len(rows), "code": f"{prefix}.{digits}", "digits": digits, "board": board,
+                "code_name": "".join(rng.sample(_NAME_CHARS, 2)) + rng.choice(_NAME_SUFFIX),
+                "list_ord": listed.toordinal(), "delist_ord": delisted.toordinal() if delisted else None,
+                "st_start": st_start.toordinal() if st_start else None, "st_end": st_end.toordinal() if st_end else None,
+                "limit": limit, "base": math.exp(rng.gauss(math.log(12.0), 0.7)),
+                "mu": rng.gauss(0.0002, 0.0004), "vol": rng.uniform(0.015, 0.035), "beta": rng.uniform(0.5, 1.5),
+                "turn": math.exp(rng.gauss(math.log(2.0), 0.6)), "float_shares": float_shares,
+                "total_shares": float_shares * rng.uniform(1.0, 1.6), "eps": rng.gauss(0.5, 0.6),
+                "bps": math.exp(rng.gauss(math.log(5.0), 0.5)), "products": products,
+                "industry_id": rng.choice(industries)["sector_id"], "region_id": rng.choice(regions)["sector_id"],
+                "concept_ids": sorted({c["sector_id"] for c in rng.choices(concepts, concept_w, k=rng.randint(1, 6))}),
+            })
+        return pl.DataFrame(rows)
+
+    def _events(self, rng):
+        """每只股票每年：除权除息（交易日序号、因子乘数）、停牌窗口、业绩预告"""
+        rows = []
+        for stock in self.stocks.select(["code_id", "list_ord"]).iter_rows():
+            for year in range(self.start.year, self.end.year + 1):
+                mult = 1.0 / (1.0 - rng.uniform(0.005, 0.03)) if rng.random() < 0.7 else 1.0
+                if rng.random() < 0.05:
+                    mult *= rng.choice([1.3, 1.5, 2.0])  # 送转股
+                suspend = rng.random() < 0.12
+                forecast = rng.random() < 0.3
+                rows.append({
+                    "code_id": stock[0], "year": year,
+                    "ex_day": rng.randrange(100, 160), "mult": mult,
+                    "susp_start": rng.randrange(0, 230) if suspend else None,
+                    "susp_len": rng.choice([1, 1, 2, 3, 5, 10, 20, 40]) if suspend else 0,
+                    "fc_day": rng.randrange(5, 80) if forecast else None,
+                    "fc_type": rng.choice(FORECAST_TYPES) if forecast else None,
+                    "fc_yoy": rng.gauss(20.0, 60.0) if forecast else None,
+                    "eps_growth": math.exp(rng.gauss(0.05, 0.25)),
+                })
+        return pl.DataFrame(rows)
+
+
+def _year_frames(uni: _Universe, year: int, carry: pl.DataFrame, flow_start: int, seed: int):
+    """生成单年个股日线与资金流；carry：各股票截至上年末的 (log 后复权价, 复权因子, eps 乘数)"""
+    days = trading_days(year)
+    cal = pl.DataFrame({"date": days}).with_columns(
+        (pl.col("date").dt.epoch("d") + 719163).alias("ord"),  # 公历序数 = toordinal()
+        pl.int_range(pl.len()).alias("day_no"))
+    events = uni.events.filter(pl.col("year") == year).drop("year")
+    s = uni.stocks.drop(["digits", "code_name", "concept_ids"])
+
+    grid = (s.join(cal, how="cross")
+            .filter((pl.col("ord") >= pl.col("list_ord"))
+                    & (pl.col("delist_ord").is_null() | (pl.col("ord") < pl.col("delist_ord"))))
+            .join(events, on="code_id", how="left")
+            .join(carry, on="code_id", how="left")
+            .sort(["code_id", "ord"]))
+    if grid.is_empty():
+        return None, None, carry
+
+    key = pl.col("code_id").cast(pl.Int64) * 1_000_000 + pl.col("ord")
+    day = pl.col("ord").cast(pl.Int64)
+    ind_key = pl.col("industry_id").cast(pl.Int64) * 1_000_000 + pl.col("ord")
+    is_st = (pl.col("st_start").is_not_null() & (pl.col("ord") >= pl.col("st_start"))
+             & (pl.col("ord") <= pl.col("st_end")))
+    limit = pl.when(is_st).then(ST_LIMIT).otherwise(pl.col("limit"))
+    ret = (pl.col("mu") + pl.col("beta") * 0.012 * _normal(day, seed + 1) + 0.008 * _normal(ind_key, seed + 2)
+           + pl.col("vol") * _normal(key, seed + 3))
+
+    df = grid.with_columns(is_st.alias("_st"), ret.clip(-limit, limit).alias("_r"))
+    df = df.with_columns(
+        (pl.col("_log").fill_null(pl.col("base").log()) + pl.col("_r").log1p().cum_sum().over("code_id")).alias("_log"),
+        (pl.col("_adj").fill_null(1.0)
+         * pl.when(pl.col("day_no") >= pl.col("ex_day")).then(pl.col("mult")).otherwise(1.0)).alias("_adj"),
+        (pl.col("_eps").fill_null(1.0) * pl.col("eps_growth")).alias("_eps"),
+    )
+    new_carry = df.group_by("code_id").agg(pl.col("_log").last(), pl.col("_adj").last(), pl.col("_eps").last())
+    carry = pl.concat([carry.join(new_carry, on="code_id", how="anti"), new_carry])
+
+    # 停牌窗口内整段无行（复牌跳空）
+    df = df.filter(pl.col("susp_start").is_null() | (pl.col("day_no") < pl.col("susp_start"))
+                   | (pl.col("day_no") >= pl.col("susp_start") + pl.col("susp_len")))
+
+    close = (pl.col("_log").exp() / pl.col("_adj"))
+    df = df.with_columns(close.alias("close"))
+    noise = 0.5 * pl.col("vol")
+    df = df.with_columns(
+        (pl.col("close") * (-pl.col("_r") * _uniform(key, seed + 4)).exp()
+         * (1 + 0.003 * _normal(key, seed + 5))).alias("open"))
+    df = df.with_columns(
+        (pl.max_horizontal("open", "close") * (1 + noise * _normal(key, seed + 6).abs())).alias("high"),
+        (pl.min_horizontal("open", "close") * (1 - noise * _normal(key, seed + 7).abs())).alias("low"),
+        (pl.col("turn") * (0.4 * _normal(key, seed + 8) + 25 * pl.col("_r").abs()).exp()).clip(0.01, 60.0).alias("turn"),
+    )
+    df = df.with_columns((pl.col("turn") * pl.col("float_shares") / 10000).alias("volume"))
+    df = df.with_columns((pl.col("volume") * 100 * (pl.col("open") + pl.col("close")) / 2).alias("amount"))
+
+    fresh = (pl.col("ord") - pl.col("list_ord")) < 90
+    eps = pl.col("eps") * pl.col("_eps")
+    fc_on = pl.col("fc_day").is_not_null() & (pl.col("day_no") >= pl.col("fc_day"))
+    fc_type = pl.when(fc_on).then(pl.col("fc_type")).otherwise(pl.lit("无"))
+    kline = df.select(
+        pl.col("date").dt.strftime("%Y-%m-%d"),
+        pl.col("code"),
+        pl.col("open").cast(pl.Float32), pl.col("high").cast(pl.Float32),
+        pl.col("low").cast(pl.Float32), pl.col("close").cast(pl.Float32),
+        pl.col("volume").round(0), pl.col("amount").round(2),
+        pl.col("turn").cast(pl.Float32),
+        ((pl.col("_r").exp() - 1) * 100).cast(pl.Float32).alias("pctChg"),
+        pl.when(fresh).then(None).when(eps > 0).then(pl.col("close") / eps).otherwise(0.0)
+          .cast(pl.Float32).alias("peTTM"),
+        pl.when(fresh).then(None).otherwise(pl.col("close") / pl.col("bps")).cast(pl.Float32).alias("pbMRQ"),
+        pl.col("_adj").cast(pl.Float32).alias("adjustFactor"),
+        pl.col("_st").cast(pl.Int8).alias("isST"),
+        pl.col("total_shares").round(0), pl.col("float_shares").round(0),
+        (pl.col("close") * pl.col("total_shares")).alias("total_mv"),
+        (pl.col("close") * pl.col("float_shares")).alias("float_mv"),
+        pl.when(pl.lit(year) >= flow_start).then(pl.col("products")).otherwise(None).alias("product_ratios"),
+        fc_type.alias("forecast_type"),
+        pl.when(fc_on).then(pl.col("fc_yoy")).otherwise(None).alias("forecast_yoy"),
+        fc_type.is_in(FORECAST_GOOD).cast(pl.Int32).alias("is_forecast_good"),
+        fc_type.is_in(FORECAST_BAD).cast(pl.Int32).alias("is_forecast_bad"),
+    ).sort(["code", "date"])
+
+    flow = None
+    if year >= flow_start:
+        amt = pl.col("amount") / 1e4  # 万元
+        f = df.filter((pl.col("board") != "bj") & (_uniform(key, seed + 9) > 0.01)).with_columns(
+            (0.03 * amt * _normal(key, seed + 10)).alias("super_net"),
+            (0.04 * amt * _normal(key, seed + 11)).alias("large_net"),
+            (0.03 * amt * _normal(key, seed + 12)).alias("medium_net"))
+        f = f.with_columns((pl.col("super_net") + pl.col("large_net")).alias("main_net"))
+        f = f.with_columns((-0.8 * (pl.col("main_net") + pl.col("medium_net"))
+                            + 0.01 * amt * _normal(key, seed + 13)).alias("small_net"))
+        flow = f.select(
+            pl.col("date").dt.strftime("%Y-%m-%d"), pl.col("code"),
+            (pl.col("main_net") + pl.col("medium_net") + pl.col("small_net")).cast(pl.Float32).alias("net_amount"),
+            *[pl.col(c).cast(pl.Float32) for c in ("main_net", "super_net", "large_net", "medium_net", "small_net")]
+        ).sort(["code", "date"])
+    return kline, flow, carry
+
+
+def _sector_year(uni: _Universe, year: int, carry: pl.DataFrame, seed: int):
+    cal = pl.DataFrame({"date": trading_days(year)}).with_columns(
+        (pl.col("date").dt.epoch("d") + 719163).alias("ord"))
+    grid = (uni.sectors.join(cal, how="cross").filter(pl.col("ord") >= pl.col("list_ord"))
+            .join(carry, on="sector_id", how="left").sort(["sector_id", "ord"]))
+    key = pl.col("sector_id").cast(pl.Int64) * 1_000_000 + pl.col("ord") + 7_000_000_000
+    day = pl.col("ord").cast(pl.Int64)
+    # 行业板块与成分股共用行业因子；概念/地域板块只带市场因子
+    ind = pl.when(pl.col("type") == "行业板块").then(
+        0.008 * _normal(pl.col("sector_id").cast(pl.Int64) * 1_000_000 + pl.col("ord"), seed + 2)).otherwise(0.0)
+    r = (pl.col("beta") * 0.012 * _normal(day, seed + 1) + ind + 0.006 * _normal(key, seed + 20)).clip(-0.1, 0.1)
+    df = grid.with_columns(r.alias("_r"))
+    df = df.with_columns((pl.col("_log").fill_null(pl.col("base").log())
+                          + pl.col("_r").log1p().cum_sum().over("sector_id")).alias("_log"))
+    carry = pl.concat([carry.join(df.group_by("sector_id").agg(pl.col("_log").last()), on="sector_id", how="anti"),
+                       df.group_by("sector_id").agg(pl.col("_log").last())])
+    df = df.with_columns(pl.col("_log").exp().alias("close"))
+    df = df.with_columns((pl.col("close") / pl.col("_r").exp()).alias("_prev"),
+                         (pl.col("close") * (1 - pl.col("_r") * _uniform(key, seed + 21))).alias("open"))
+    df = df.with_columns(
+        (pl.max_horizontal("open", "close") * (1 + 0.006 * _normal(key, seed + 22).abs())).alias("high"),
+        (pl.min_horizontal("open", "close") * (1 - 0.006 * _normal(key, seed + 23).abs())).alias("low"),
+        (1e8 * (0.5 * _normal(key, seed + 24)).exp()).round(0).alias("volume"))
+    out = df.select(
+        pl.col("date").dt.strftime("%Y-%m-%d"), pl.col("code"), pl.col("name"), pl.col("type"),
+        *[pl.col(c).cast(pl.Float32) for c in ("open", "high", "low", "close")],
+        pl.col("volume"), (pl.col("volume") * pl.col("close") / 100).round(2).alias("amount"),
+        ((pl.col("high") - pl.col("low")) / pl.col("_prev") * 100).round(2).cast(pl.String).alias("amplitude"))
+    return out.sort(["code", "date"]), carry
+
+
+def _write(df: pl.DataFrame, out_dir: str, name: str, summary: dict):
+    path = os.path.join(out_dir, f"{name}.parquet")
+    df.write_parquet(path, compression="zstd")
+    summary["files"][name] = {"rows": df.height, "bytes": os.path.getsize(path)}
+
+
+def generate(out_dir: str, n_codes: int = 5000, years: int = 20, end_year: int = 2025, n_concepts: int = 300,
+             seed: int = 42, flow_years: int = 10, log=None) -> dict:
+    """
+    写出完整数据集并返回摘要 {"files": {名称: {rows, bytes}}, "codes", "years", "seconds"}。
+    flow_years：资金流/产品敞口只覆盖最近若干年（与真实数据源起始年份一致，早年份为空值）。
+    """
+    t0 = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    start_year = end_year - years + 1
+    uni = _Universe(n_codes, start_year, end_year, n_concepts, rng)
+    summary = {"files": {}, "codes": n_codes, "years": [start_year, end_year], "seed": seed}
+
+    _write(uni.stocks.select("code", "code_name", pl.lit("1").alias("tradeStatus")).sort("code"),
+           out_dir, "stock_list", summary)
+    _write(uni.sectors.select("code", "name", "type").sort(["type", "code"]), out_dir, "sector_list", summary)
+
+    flow_start = end_year - flow_years + 1
+    carry = pl.DataFrame(schema={"code_id": pl.Int64, "_log": pl.Float64, "_adj": pl.Float64, "_eps": pl.Float64})
+    s_carry = pl.DataFrame(schema={"sector_id": pl.Int64, "_log": pl.Float64})
+    for year in range(start_year, end_year + 1):
+        kline, flow, carry = _year_frames(uni, year, carry, flow_start, seed)
+        if kline is not None:
+            _write(kline, out_dir, f"stock_kline_{year}", summary)
+        if flow is not None:
+            _write(flow, out_dir, f"stock_money_flow_{year}", summary)
+        sector, s_carry = _sector_year(uni, year, s_carry, seed)
+        _write(sector, out_dir, f"sector_kline_{year}", summary)
+        if log:
+            log(f"{year}: {kline.height if kline is not None else 0} stock rows, {sector.height} sector rows")
+
+    # 最新成分股快照：每只股票 1 个行业 + 1 个地域 + 1~6 个概念
+    members = (uni.stocks.select("digits", pl.concat_list("industry_id", "region_id", "concept_ids").alias("sector_id"))
+               .explode("sector_id")
+               .join(uni.sectors.select("sector_id", "code", "name"), on="sector_id")
+               .select(pl.col("code").alias("sector_code"), pl.col("digits").alias("stock_code"),
+                       pl.col("name").alias("sector_name"), pl.lit(f"{end_year}-12-31").alias("date"))
+               .sort(["sector_code", "stock_code"]))
+    _write(members, out_dir, f"sector_constituents_{end_year}", summary)
+    summary["seconds"] = round(time.perf_counter() - t0, 2)
+    return summary
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate a synthetic stockA-layout dataset")
+    ap.add_argument("--out", required=True, help="output directory (use as DATA_DIR)")
+    ap.add_argument("--codes", type=int, default=5000)
+    ap.add_argument("--years", type=int, default=20)
+    ap.add_argument("--end-year", type=int, default=2025)
+    ap.add_argument("--concepts", type=int, default=300)
+    ap.add_argument("--flow-years", type=int, default=10)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args(argv)
+    summary = generate(args.out, args.codes, args.years, args.end_year, args.concepts, args.seed, args.flow_years,
+                       log=lambda m: print(m, file=sys.stderr))
+    total = sum(f["bytes"] for f in summary["files"].values())
+    rows = sum(f["rows"] for n, f in summary["files"].items() if n.startswith("stock_kline_"))
+    print(f"Wrote {len(summary['files'])} files ({total / 1024 ** 2:.1f} MiB, {rows} stock kline rows) "
+          f"to {args.out} in {summary['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math
+import unittest
+from datetime import date, timedelta
+import polars as pl
+from core.data_manager import data_manager
+from core.backtest import backtest_engine, merge_backtest_partials
+
+
+def make_daily(codes_closes):
+    rows = {"date": [], "code": [], "close": []}
+    for code, closes in codes_closes.items():
+        for i, c in enumerate(closes):
+            rows["date"].append(date(2024, 1, 1) + timedelta(days=i))
+            rows["code"].append(code)
+            rows["close"].append(c)
+    return pl.DataFrame(rows)
+
+
+class TestBacktest(unittest.TestCase):
+    def setUp(self):
+        self._saved = (data_manager.df_daily, data_manager.df_mapping)
+        data_manager.df_mapping = None
+        self.data = {
+            "sh.600000": [10.0, 11.0, 12.0, 11.0, 13.0, 14.0],
+            "sz.000001": [20.0, 19.0, 21.0, 22.0, 20.0, 25.0],
+        }
+
+    def tearDown(self):
+        data_manager.df_daily, data_manager.df_mapping = self._saved
+
+    def test_forward_returns_aggregated(self):
+        data_manager.df_daily = make_daily({"sh.600000": self.data["sh.600000"]})
+        res = backtest_engine.run("CLOSE > 10.5", "D", horizons=[1])
+        # 信号日 close=11,12,11,13,14；1 日远期收益 12/11,11/12,13/11,14/13，最后一天无未来值
+        self.assertEqual(res["signals"], 5)
+        h1 = res["horizons"]["1"]
+        self.assertEqual(h1["count"], 4)
+        self.assertEqual(h1["wins"], 3)
+        self.assertAlmostEqual(h1["win_rate"], 0.75)
+        expected = [(12 / 11 - 1) * 100, (11 / 12 - 1) * 100, (13 / 11 - 1) * 100, (14 / 13 - 1) * 100]
+        self.assertAlmostEqual(h1["mean"], sum(expected) / 4, places=3)
+        self.assertEqual(sum(h1["histogram"]), 4)
+
+    def test_forward_return_does_not_leak_across_codes(self):
+        data_manager.df_daily = make_daily(self.data)
+        res = backtest_engine.run("CLOSE > 0", "D", horizons=[1])
+        # 每只股票最后一天没有远期收益
+        self.assertEqual(res["signals"], 12)
+        self.assertEqual(res["horizons"]["1"]["count"], 10)
+
+    def test_partials_merge_exactly(self):
+        full_df = make_daily(self.data)
+        data_manager.df_daily = full_df
+        full = backtest_engine.run("CLOSE > 10.5", "D", horizons=[1, 2])
+
+        partials = []
+        for code in self.data:
+            data_manager.df_daily = full_df.filter(pl.col("code") == code)
+            partials.append(backtest_engine.run("CLOSE > 10.5", "D", horizons=[1, 2]))
+        merged = merge_backtest_partials(partials)
+
+        self.assertEqual(merged["signals"], full["signals"])
+        for h in ("1", "2"):
+            self.assertEqual(merged["horizons"][h]["count"], full["horizons"][h]["count"])
+            self.assertEqual(merged["horizons"][h]["wins"], full["horizons"][h]["wins"])
+            self.assertEqual(merged["horizons"][h]["histogram"], full["horizons"][h]["histogram"])
+            self.assertAlmostEqual(merged["horizons"][h]["mean"], full["horizons"][h]["mean"], places=6)
+
+    def test_merged_median_flagged_approximate(self):
+        full_df = make_daily(self.data)
+        partials = []
+        for code in self.data:
+            data_manager.df_daily = full_df.filter(pl.col("code") == code)
+            partials.append(backtest_engine.run("CLOSE > 0", "D", horizons=[1]))
+        merged = merge_backtest_partials(partials)
+        self.assertFalse(merged["horizons"]["1"]["median_exact"])
+        single = merge_backtest_partials(partials[:1])
+        self.assertTrue(single["horizons"]["1"]["median_exact"])
+        self.assertEqual(single["horizons"]["1"]["median"], partials[0]["horizons"]["1"]["median"])
+
+    def test_non_finite_forward_returns_excluded(self):
+        # close=0 的信号日远期收益为 inf，不得进入 sum/直方图
+        data_manager.df_daily = make_daily({"sh.600000": [10.0, 0.0, 12.0, 13.0]})
+        res = backtest_engine.run("CLOSE >= 0", "D", horizons=[1])
+        h1 = res["horizons"]["1"]
+        self.assertEqual(h1["count"], 2)
+        self.assertEqual(sum(h1["histogram"]), 2)
+        self.assertTrue(math.isfinite(h1["sum"]) and math.isfinite(h1["sum_sq"]))
+        self.assertAlmostEqual(h1["mean"], (-100.0 + (13 / 12 - 1) * 100) / 2, places=6)
+
+    def test_invalid_horizon_rejected(self):
+        data_manager.df_daily = make_daily(self.data)
+        self.assertIn("error", backtest_engine.run("CLOSE > 0", "D", horizons=[0]))
+
+    def test_parse_error_reported(self):
+        data_manager.df_daily = make_daily(self.data)
+        self.assertIn("error", backtest_engine.run("NOPE(CLOSE, 2) > 0", "D"))
+
+
+if __name__ == "__main__":
+    unittest.main()
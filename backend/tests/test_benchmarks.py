@@ -0,0 +1,132 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import tempfile
+import unittest
+from datetime import date
+import polars as pl
+from benchmarks.common import percentiles, flatten, metric_unit, compare, RssTimeline
+from benchmarks.kernels import make_frame, run_grid, loglog_fit, fit_cost_table
+from benchmarks.e2e import HotJitReset, missing_columns
+from core.cost_model import CostModel
+from core.data_manager import data_manager
+from core.indicator_registry import INDICATORS
+
+
+def result(select_p50, load_s, hits=10):
+    return {"results": {"load": {"stages_s": {"adjust": load_s}},
+                        "select": {"D": {"CLOSE > 0": {"hits": hits, "cold_ms": 5.0,
+                                                       "warm": {"n": 5, "p50": select_p50}}}}}}
+
+
+class TestBenchmarkCommon(unittest.TestCase):
+    def test_percentiles(self):
+        stats = percentiles([float(i) for i in range(1, 101)])
+        self.assertEqual((stats["n"], stats["min"], stats["max"]), (100, 1.0, 100.0))
+        self.assertAlmostEqual(stats["p50"], 51.0)
+        self.assertAlmostEqual(stats["p95"], 95.0)
+        self.assertEqual(percentiles([]), {"n": 0})
+
+    def test_flatten_and_units(self):
+        flat = flatten(result(2.0, 1.0)["results"])
+        self.assertEqual(flat["select.D.CLOSE > 0.warm.p50"], 2.0)
+        self.assertEqual(metric_unit("select.D.CLOSE > 0.warm.p50"), "ms")
+        self.assertEqual(metric_unit("load.stages_s.adjust"), "s")
+        self.assertEqual(metric_unit("load.peak_rss_bytes.read"), "bytes")
+        self.assertIsNone(metric_unit("select.D.CLOSE > 0.hits"))
+        self.assertIsNone(metric_unit("select.D.CLOSE > 0.warm.n"))
+
+    def test_compare_threshold_and_floor(self):
+        report = compare(result(20.0, 1.0, hits=99), result(10.0, 2.0))
+        self.assertEqual([r["metric"] for r in report["regressions"]], ["select.D.CLOSE > 0.warm.p50"])
+        self.assertEqual([r["metric"] for r in report["improvements"]], ["load.stages_s.adjust"])
+        # 相对变化大但绝对差低于噪声下限不计
+        quiet = compare(result(0.4, 1.0), result(0.2, 1.0))
+        self.assertEqual((quiet["regressions"], quiet["improvements"]), ([], []))
+        self.assertEqual(quiet["compared"], 3)
+
+    def test_stage_peaks(self):
+        timeline = RssTimeline(interval_s=0.01)
+        timeline.samples = [(0.0, 100), (0.5, 300), (1.0, 200), (1.6, 900), (2.0, 150)]
+        self.assertEqual(timeline.stage_peaks([("a", 0.6), ("b", 0.5), ("c", 1.0)]),
+                         {"a": 300, "b": 200, "c": 900})
+
+
+class TestKernelBenchmark(unittest.TestCase):
+    def test_every_kernel_runs_from_signature(self):
+        records = run_grid(list(INDICATORS), [(12, 40)], [5], repeat=1, time_cap_s=60, seed=1)
+        self.assertEqual({r["kernel"] for r in records}, set(INDICATORS))
+        for r in records:
+            self.assertEqual(r["rows"], 480, r["kernel"])
+            self.assertGreater(r["out_bytes"], 0, r["kernel"])
+
+    def test_frame_sorted_by_code_and_date(self):
+        df = make_frame(3, 10)
+        self.assertEqual(df.height, 30)
+        self.assertTrue(df.equals(df.sort(["code", "date"])))
+        self.assertTrue((df["high"] >= df["low"]).all())
+
+    def test_loglog_fit(self):
+        a, b = loglog_fit([(x, 3.0 * x ** 0.5) for x in (5, 20, 60)])
+        self.assertAlmostEqual(a, 3.0)
+        self.assertAlmostEqual(b, 0.5)
+        self.assertEqual(loglog_fit([(1, 2.0)]), (2.0, 0.0))
+
+    def test_cost_table_units_and_engine_round_trip(self):
+        def rec(kernel, window, ms, rows=1000):
+            return {"kernel": kernel, "window": window, "rows": rows, "median_ms": ms, "rows_per_s": 1}
+        # MA 与窗口无关；AROON_UP 与窗口成正比；SAR 无窗口、单行耗时是 MA 的 50 倍
+        records = ([rec("MA", w, 2.0) for w in (5, 20, 60)] + [rec("AROON_UP", w, 0.1 * w) for w in (5, 20, 60)]
+                   + [rec("SAR", 1, 100.0), {"kernel": "SAR", "window": 1, "rows": 10 ** 6, "skipped": "cap"}])
+        table = fit_cost_table(records, reference_window=20)
+        self.assertAlmostEqual(table["MA"]["cost"], 20.0)
+        self.assertAlmostEqual(table["MA"]["window_exponent"], 0.0)
+        self.assertAlmostEqual(table["AROON_UP"]["window_exponent"], 1.0)
+        self.assertAlmostEqual(table["SAR"]["cost"], 1000.0)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"kernels": table}, f)
+        self.addCleanup(os.unlink, f.name)
+        model = CostModel()
+        self.assertTrue(model.load_table(f.name))
+        # 参考点上 MA(CLOSE, 20) 与注册表等级代价一致
+        self.assertAlmostEqual(model.estimate("MA(CLOSE, 20) > 0", 10)["cost"], 10 + 20 * 10)
+        # AROON_UP 无法被时限取消：实测代价低于注册表等级时以注册表等级为下限
+        self.assertAlmostEqual(model.estimate("AROON_UP(60) > 0", 10)["cost"],
+                               10 + INDICATORS["AROON_UP"]["cost"] * 60 * 10, places=3)
+
+
+
+class TestE2EHelpers(unittest.TestCase):
+    def setUp(self):
+        self._saved = (data_manager.df_daily, data_manager.df_weekly, data_manager.df_mapping, data_manager.row_index)
+        data_manager.df_mapping = None
+        data_manager.row_index = {}
+        frame = pl.DataFrame({"date": [date(2024, 1, 1), date(2024, 1, 8)] * 2,
+                              "code": ["sh.600000", "sh.600000", "sz.000001", "sz.000001"],
+                              "close": [10.0, 11.0, 20.0, 21.0]})
+        data_manager.df_daily = frame.with_columns(pl.lit(12.0).alias("peTTM"))
+        data_manager.df_weekly = frame
+
+    def tearDown(self):
+        (data_manager.df_daily, data_manager.df_weekly,
+         data_manager.df_mapping, data_manager.row_index) = self._saved
+
+    def test_queries_limited_to_timeframes_with_columns(self):
+        self.assertEqual(missing_columns("PE_TTM < 20", "D"), [])
+        self.assertEqual(missing_columns("PE_TTM < 20", "W"), ["peTTM"])
+        self.assertEqual(missing_columns("CLOSE > EMA(CLOSE, 2)", "W"), [])
+
+    def test_reset_reports_mounted_columns(self):
+        reset = HotJitReset(data_manager)
+        df = data_manager.df_daily
+        data_manager.mount_columns(data_manager.view(), "df_daily", [(df["close"] * 2).alias("X2")])
+        self.assertEqual(reset.mounted(), ["df_daily.X2"])
+        reset()
+        self.assertEqual(reset.mounted(), [])
+        self.assertNotIn("X2", data_manager.df_daily.columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import socket
+import asyncio
+import threading
+import unittest
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from core.coordinator import Coordinator, NodeClientError, merge_select, merge_batch
+
+
+class StandInNode:
+    """本地替身节点：独立线程内运行的 uvicorn；handler(name, body, call_no) -> (delay_s, status, payload)"""
+
+    def __init__(self, handler, health=None):
+        self.calls = 0
+        self.bodies = []
+        app = FastAPI()
+
+        @app.get("/api/v1/health")
+        async def health_check():
+            return health or {"status": "initializing"}
+
+        @app.post("/api/v1/{name}")
+        async def endpoint(name: str, request: Request):
+            body = await request.json()
+            self.calls += 1
+            self.bodies.append(body)
+            delay, status, payload = handler(name, body, self.calls)
+            if delay:
+                await asyncio.sleep(delay)
+            return JSONResponse(payload, status_code=status)
+
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off",
+                                                    timeout_graceful_shutdown=1))
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+def select_handler(results, values=None, delay=0.0, status=200, slow_first=0.0):
+    def handler(name, body, call_no):
+        payload = {"results": results, "count": len(results)}
+        if values is not None:
+            payload["values"] = values
+        if name == "select-batch":
+            payload = {"batch": [{"formula": f, "results": results, "count": len(results)} for f in body["formulas"]]}
+        return (slow_first if call_no == 1 and slow_first else delay), status, payload
+    return handler
+
+
+def closed_port_url():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f"http://127.0.0.1:{port}"
+
+
+class TestMerges(unittest.TestCase):
+    def test_topk_merge_with_fields(self):
+        partials = [
+            {"results": ["a", "c"], "values": [9.0, 5.0], "columns": {"code": ["a", "c"], "name": ["A", "C"]}},
+            {"results": ["b", "d"], "values": [7.0, 1.0], "columns": {"code": ["b", "d"], "name": ["B", "D"]}},
+        ]
+        merged = merge_select({"order_by": "TURN", "limit": 3, "fields": ["TURN"]}, partials)
+        self.assertEqual(merged["results"], ["a", "b", "c"])
+        self.assertEqual(merged["values"], [9.0, 7.0, 5.0])
+        self.assertEqual(merged["columns"]["name"], ["A", "B", "C"])
+
+    def test_limit_without_order(self):
+        merged = merge_select({"limit": 2}, [{"results": ["b", "d"]}, {"results": ["a", "c"]}])
+        self.assertEqual(merged["results"], ["a", "b"])
+
+    def test_batch_union_and_errors(self):
+        merged = merge_batch([
+            {"batch": [{"formula": "X", "results": ["b"]}, {"formula": "Y", "error": "bad"}]},
+            {"batch": [{"formula": "X", "results": ["a"]}, {"formula": "Y", "error": "bad"}]},
+        ])
+        self.assertEqual(merged["batch"][0]["results"], ["a", "b"])
+        self.assertEqual(merged["batch"][1]["error"], "bad")
+
+    def test_batch_keeps_healthy_shards_on_partial_error(self):
+        merged = merge_batch([
+            {"batch": [{"formula": "X", "results": ["b"]}]},
+            {"batch": [{"formula": "X", "error": "Query exceeded deadline", "status": 504}]},
+            {"batch": [{"formula": "X", "results": ["a"]}]},
+        ], shards=[0, 1, 2])
+        item = merged["batch"][0]
+        self.assertEqual((item["count"], item["results"]), (2, ["a", "b"]))
+        self.assertTrue(item["partial"])
+        self.assertEqual(item["errors"], [{"shard": 1, "error": "Query exceeded deadline"}])
+        self.assertNotIn("error", item)
+
+
+class NodeCase(unittest.TestCase):
+    """管理替身节点生命周期并提供协调端调用辅助"""
+    def setUp(self):
+        self.nodes = []
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.stop()
+
+    def node(self, handler, health=None):
+        n = StandInNode(handler, health)
+        self.nodes.append(n)
+        return n
+
+    def run_coord(self, urls, call, payload, repeat=1, **kwargs):
+        async def go():
+            coord = Coordinator(urls, **kwargs)
+            try:
+                for _ in range(repeat - 1):
+                    await getattr(coord, call)(payload)
+                return await getattr(coord, call)(payload), coord
+            finally:
+                await coord.aclose()
+        return asyncio.run(go())
+
+
+class TestScatterGather(NodeCase):
+    def test_fan_out_and_merge(self):
+        urls = [self.node(select_handler(["sh.600000"])).url, self.node(select_handler(["sz.000001", "sz.000002"])).url]
+        merged, _ = self.run_coord(urls, "select", {"formula": "CLOSE > 0"})
+        self.assertEqual(merged["results"], ["sh.600000", "sz.000001", "sz.000002"])
+        self.assertFalse(merged["partial"])
+        self.assertEqual(merged["shards"]["ok"], [0, 1])
+
+    def test_topk_across_nodes(self):
+        urls = [self.node(select_handler(["a", "c"], [9.0, 5.0])).url, self.node(select_handler(["b"], [7.0])).url]
+        merged, _ = self.run_coord(urls, "select", {"formula": "CLOSE > 0", "order_by": "TURN", "limit": 2})
+        self.assertEqual(merged["results"], ["a", "b"])
+
+    def test_failed_and_dead_nodes_reported_missing(self):
+        urls = [self.node(select_handler(["a"])).url,
+                self.node(select_handler([], status=503)).url,
+                closed_port_url()]
+        merged, coord = self.run_coord(urls, "select", {"formula": "CLOSE > 0"}, hedge_after_s=0.05, timeout_s=2)
+        self.assertTrue(merged["partial"])
+        self.assertEqual(merged["results"], ["a"])
+        self.assertEqual([m["shard"] for m in merged["shards"]["missing"]], [1, 2])
+
+    def test_slow_node_times_out(self):
+        urls = [self.node(select_handler(["a"])).url, self.node(select_handler(["b"], delay=1.0)).url]
+        t0 = time.perf_counter()
+        merged, coord = self.run_coord(urls, "select", {"formula": "CLOSE > 0"}, timeout_s=0.3, hedge_after_s=0.1)
+        self.assertLess(time.perf_counter() - t0, 0.9)
+        self.assertEqual(merged["results"], ["a"])
+        self.assertEqual(merged["shards"]["missing"][0]["shard"], 1)
+        self.assertEqual(coord.stats["node_timeouts"], 1)
+
+    def test_hedged_request_wins(self):
+        slow = self.node(select_handler(["b"], slow_first=1.0))
+        urls = [self.node(select_handler(["a"])).url, slow.url]
+        t0 = time.perf_counter()
+        merged, coord = self.run_coord(urls, "select", {"formula": "CLOSE > 0"}, timeout_s=3, hedge_after_s=0.1)
+        self.assertLess(time.perf_counter() - t0, 0.9)
+        self.assertEqual(merged["results"], ["a", "b"])
+        self.assertEqual(coord.stats["hedge_wins"], 1)
+        self.assertEqual(slow.calls, 2)
+
+    def test_client_error_passed_through(self):
+        urls = [self.node(select_handler([], status=400)).url]
+        with self.assertRaises(NodeClientError) as ctx:
+            self.run_coord(urls, "select", {"formula": "NOPE"})
+        self.assertEqual(ctx.exception.status_code, 400)
+
+    def test_batch_fan_out(self):
+        urls = [self.node(select_handler(["a"])).url, self.node(select_handler(["b"])).url]
+        merged, _ = self.run_coord(urls, "select_batch", {"formulas": ["X", "Y"]})
+        self.assertEqual([b["results"] for b in merged["batch"]], [["a", "b"], ["a", "b"]])
+
+
+class TestReplicaRouting(NodeCase):
+    def test_reads_spread_across_replicas(self):
+        a, b = self.node(select_handler(["x"])), self.node(select_handler(["x"]))
+        merged, coord = self.run_coord([a.url, b.url], "select", {"formula": "CLOSE > 0"}, repeat=4,
+                                       routes={0: [a.url, b.url]})
+        self.assertEqual(merged["results"], ["x"])
+        self.assertEqual((a.calls, b.calls), (2, 2))
+        self.assertEqual(a.bodies[0]["shards"], [0])
+
+    def test_failover_to_surviving_replica(self):
+        dead = closed_port_url()
+        alive = self.node(select_handler(["x"]))
+        merged, coord = self.run_coord([dead, alive.url], "select", {"formula": "CLOSE > 0"},
+                                       routes={0: [dead, alive.url]}, hedge_after_s=5)
+        self.assertFalse(merged["partial"])
+        self.assertEqual(merged["results"], ["x"])
+        self.assertEqual(coord.stats["failovers"], 1)
+        self.assertEqual(coord.stats["failover_wins"], 1)
+
+    def test_misdirected_shard_tries_next_replica(self):
+        stale = self.node(select_handler([], status=421))
+        alive = self.node(select_handler(["x"]))
+        merged, _ = self.run_coord([stale.url, alive.url], "select", {"formula": "CLOSE > 0"},
+                                   routes={0: [stale.url, alive.url]})
+        self.assertEqual(merged["results"], ["x"])
+
+    def test_routes_discovered_from_health(self):
+        a = self.node(select_handler(["a"]), {"status": "healthy", "build_id": "b1", "shards": [0, 1], "total_shards": 3})
+        b = self.node(select_handler(["b"]), {"status": "healthy", "build_id": "b1", "shards": [1, 2], "total_shards": 3})
+        loading = self.node(select_handler([]), {"status": "initializing", "shards": [2], "total_shards": 3})
+        dead = closed_port_url()
+
+        async def go():
+            coord = Coordinator([a.url, b.url, loading.url, dead])
+            try:
+                await coord.refresh_routes()
+                return coord
+            finally:
+                await coord.aclose()
+        coord = asyncio.run(go())
+        self.assertEqual(coord.routes, {0: [a.url], 1: [a.url, b.url], 2: [b.url]})
+        self.assertEqual(coord.node_health[dead]["status"], "unreachable")
+        self.assertEqual(coord.node_health[a.url]["build_id"], "b1")
+
+
+if __name__ == "__main__":
+    unittest.main()
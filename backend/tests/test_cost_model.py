@@ -0,0 +1,127 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import tempfile
+import unittest
+from datetime import date
+import polars as pl
+from core.cost_model import cost_model, CostModel, DEFAULT_COST_BUDGET
+from core.data_manager import data_manager
+from core.engine import selection_engine, collect_with_deadline, QueryTimeout
+from core.indicator_registry import INDICATORS
+
+
+class TestCostModel(unittest.TestCase):
+    def test_all_indicators_have_cost_class(self):
+        for name, entry in INDICATORS.items():
+            self.assertGreater(entry["cost"], 0, f"{name} missing cost")
+
+    def test_cost_scales_with_window_and_rows(self):
+        small = cost_model.estimate("CLOSE > MA(CLOSE, 10)", 1000)["cost"]
+        wide = cost_model.estimate("CLOSE > MA(CLOSE, 100)", 1000)["cost"]
+        more_rows = cost_model.estimate("CLOSE > MA(CLOSE, 10)", 10000)["cost"]
+        self.assertLess(small, wide)
+        self.assertAlmostEqual(more_rows, small * 10)
+
+    def test_nested_calls_are_summed(self):
+        est = cost_model.estimate("COUNT(CLOSE > TEMA(CLOSE, 500), 10) > 3 AND CLOSE > SAR()", 100)
+        self.assertEqual([b["call"] for b in est["breakdown"]],
+                         ["COUNT(CLOSE > TEMA(CLOSE, 500), 10)", "SAR()", "TEMA(CLOSE, 500)"])
+
+    def test_uncancellable_kernels_rejected_on_full_market(self):
+        # SAR/AROON 的 Python 内核无法被时限取消：全市场日线（约 8M 行）必须在执行前超预算
+        rows = 8_000_000
+        for formula in ("CLOSE > SAR()", "AROON_UP(5) > 50", "AROON_DOWN(5) > 50"):
+            self.assertGreater(cost_model.estimate(formula, rows)["cost"], DEFAULT_COST_BUDGET, formula)
+        # AROON 每行扫描整窗：代价随 n 线性增长
+        short = cost_model.estimate("AROON_UP(5) > 50", 1000)["breakdown"][0]["cost"]
+        long = cost_model.estimate("AROON_UP(250) > 50", 1000)["breakdown"][0]["cost"]
+        self.assertAlmostEqual(long, short * 50)
+
+    def test_mounted_window_column_is_free(self):
+        est = cost_model.estimate("CLOSE > MA(CLOSE, 20)", 1000, mounted_columns=["MA_CLOSE_20"])
+        self.assertEqual(est["breakdown"], [])
+        self.assertEqual(est["cost"], 1000)
+
+    def test_measured_cost_table(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"kernels": {"MA": {"cost": 20.0, "window_exponent": 0.0},
+                                   "SAR": {"cost": 500.0}, "NOT_A_KERNEL": {"cost": 1.0}}}, f)
+        self.addCleanup(os.unlink, f.name)
+        model = CostModel()
+        self.assertTrue(model.load_table(f.name))
+        self.assertEqual(model.source, f.name)
+        # 实测 MA 与窗口无关；表中缺失的内核沿用注册表等级
+        self.assertEqual(model.estimate("MA(CLOSE, 250) > 0", 100)["cost"], 100 + 20 * 100)
+        # 无法被时限取消的 SAR 不低于注册表等级
+        self.assertEqual(model.estimate("SAR() > 0", 100)["cost"], 100 + INDICATORS["SAR"]["cost"] * 100)
+        self.assertEqual(model.estimate("HHV(CLOSE, 10) > 0", 100)["cost"], 100 + 10 * 100)
+        self.assertNotIn("NOT_A_KERNEL", model.kernel_costs)
+
+    def test_unreadable_cost_table_keeps_registry(self):
+        model = CostModel()
+        self.assertFalse(model.load_table("/nonexistent/kernel_costs.json"))
+        self.assertEqual(model.source, "registry")
+        self.assertEqual(model.kernel_costs["SAR"], INDICATORS["SAR"]["cost"])
+
+
+class TestBudgetAndDeadline(unittest.TestCase):
+    def setUp(self):
+        self._saved = (data_manager.df_daily, data_manager.df_mapping, cost_model.budget,
+                       data_manager.shards, data_manager.shard_codes)
+        data_manager.df_mapping = None
+        data_manager.df_daily = pl.DataFrame({
+            "date": [date(2024, 1, 1), date(2024, 1, 2)],
+            "code": ["sh.600000"] * 2,
+            "close": [10.0, 11.0],
+        })
+
+    def tearDown(self):
+        (data_manager.df_daily, data_manager.df_mapping, cost_model.budget,
+         data_manager.shards, data_manager.shard_codes) = self._saved
+
+    def test_over_budget_rejected_before_execution(self):
+        cost_model.budget = 100
+        res = selection_engine.select_frame("CLOSE > MA(CLOSE, 500)", "D")
+        self.assertEqual(res["status"], 422)
+        self.assertIn("MA(CLOSE, 500)", res["error"])
+        self.assertNotIn("MA_CLOSE_500", data_manager.df_daily.columns)
+
+    def test_within_budget_executes(self):
+        res = selection_engine.select_frame("CLOSE > 10.5", "D")
+        self.assertEqual(res["code"].to_list(), ["sh.600000"])
+
+    def test_cost_counts_pruned_universe_rows(self):
+        data_manager.df_daily = pl.DataFrame({
+            "date": [date(2024, 1, 1), date(2024, 1, 2)] * 2,
+            "code": ["sh.600000", "sh.600000", "sz.000001", "sz.000001"],
+            "close": [10.0, 11.0, 10.0, 9.0],
+        })
+        data_manager.shards = [0, 1]
+        data_manager.shard_codes = {0: ["sh.600000"], 1: ["sz.000001"]}
+        # 全表 4 行：4 + 10 × 4 = 44 超预算；限定分片 0 只剩 2 行：2 + 10 × 2 = 22
+        cost_model.budget = 30
+        self.assertEqual(selection_engine.select_frame("MA(CLOSE, 10) > 0", "D")["status"], 422)
+        _, profile = selection_engine.explain("CLOSE > 10.5", "D", shards=[0])
+        self.assertEqual(profile.info["estimated_rows"], 2)
+        res = selection_engine.select_frame("CLOSE > MA(CLOSE, 10)", "D", shards=[0])
+        self.assertNotIsInstance(res, dict)
+
+    def test_deadline_cancels_query(self):
+        n = 4_000_000
+        lf = (pl.LazyFrame({"a": pl.int_range(n, eager=True)})
+              .select(pl.col("a").hash().rolling_mean(200).over(pl.col("a") % 997).sort()))
+        t0 = time.monotonic()
+        with self.assertRaises(QueryTimeout):
+            collect_with_deadline(lf, 0.001)
+        self.assertLess(time.monotonic() - t0, 0.5)
+
+    def test_deadline_returns_result_in_time(self):
+        lf = pl.DataFrame({"a": [1, 2, 3]}).lazy().select(pl.col("a") * 2)
+        self.assertEqual(collect_with_deadline(lf, 5)["a"].to_list(), [2, 4, 6])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math
+import unittest
+from datetime import date, timedelta
+import polars as pl
+from core.decimate import ohlc_buckets, lttb, lttb_indices
+
+
+def make_bars(n):
+    closes = [10 + math.sin(i / 5.0) * 3 for i in range(n)]
+    return pl.DataFrame({
+        "date": [date(2020, 1, 1) + timedelta(days=i) for i in range(n)],
+        "code": ["sh.600000"] * n,
+        "open": [c - 0.1 for c in closes],
+        "high": [c + 0.5 for c in closes],
+        "low": [c - 0.5 for c in closes],
+        "close": closes,
+        "volume": [1.0] * n,
+        "turn": [float(i) for i in range(n)],
+    })
+
+
+class TestOhlcBuckets(unittest.TestCase):
+    def test_buckets_preserve_extremes_and_totals(self):
+        df = make_bars(1000)
+        out = ohlc_buckets(df, 100)
+        self.assertEqual(len(out), 100)
+        self.assertEqual(out.columns, df.columns)
+        self.assertAlmostEqual(out["high"].max(), df["high"].max())
+        self.assertAlmostEqual(out["low"].min(), df["low"].min())
+        self.assertEqual(out["volume"].sum(), 1000.0)
+        # 首桶 open 取首行，末桶 close/turn 取末行
+        self.assertEqual(out["open"][0], df["open"][0])
+        self.assertEqual(out["close"][-1], df["close"][-1])
+        self.assertEqual(out["turn"][-1], 999.0)
+        self.assertEqual(out["date"][0], df["date"][0])
+
+    def test_short_series_untouched(self):
+        df = make_bars(50)
+        self.assertTrue(ohlc_buckets(df, 100).equals(df))
+
+
+class TestLttb(unittest.TestCase):
+    def test_keeps_endpoints_and_count(self):
+        df = make_bars(1000)
+        out = lttb(df, 80)
+        self.assertEqual(len(out), 80)
+        self.assertEqual(out["date"][0], df["date"][0])
+        self.assertEqual(out["date"][-1], df["date"][-1])
+        self.assertTrue(out["date"].is_sorted())
+
+    def test_picks_spike(self):
+        y = [0.0] * 100
+        y[37] = 50.0
+        self.assertIn(37, lttb_indices(y, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
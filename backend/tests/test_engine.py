@@ -1,9 +1,12 @@
 import os, sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import time
 import unittest
+from datetime import date
+import polars as pl
 from core.data_manager import data_manager
-from core.engine import selection_engine
+from core.engine import selection_engine, merge_topk
 from core.indicator_registry import WINDOW_NAMES
 
 class TestDerivation(unittest.TestCase):
@@ -50,5 +53,261 @@ class TestEnginePattern(unittest.TestCase):
         count = selection_engine.metric_pattern.findall("COUNT(CLOSE > MA(CLOSE, 20), 10) >= 7")
         self.assertEqual(count, [("MA", "CLOSE", "20")])
 
+class EngineDataCase(unittest.TestCase):
+    """在 data_manager 上挂一张小日线表，结束后还原。"""
+    def setUp(self):
+        self._saved = (data_manager.df_daily, data_manager.df_mapping)
+        data_manager.df_mapping = None
+        codes = ["sh.600000", "sh.600001", "sz.000001", "sz.000002"]
+        closes = {"sh.600000": [10.0, 12.0], "sh.600001": [10.0, 9.0],
+                  "sz.000001": [10.0, 15.0], "sz.000002": [10.0, 11.0]}
+        turns = {"sh.600000": 3.0, "sh.600001": 8.0, "sz.000001": 1.0, "sz.000002": 5.0}
+        rows = {"date": [], "code": [], "close": [], "turn": []}
+        for code in codes:
+            for i, c in enumerate(closes[code]):
+                rows["date"].append(date(2024, 1, 1 + i))
+                rows["code"].append(code)
+                rows["close"].append(c)
+                rows["turn"].append(turns[code])
+        data_manager.df_daily = pl.DataFrame(rows)
+
+    def tearDown(self):
+        data_manager.df_daily, data_manager.df_mapping = self._saved
+
+
+class TestTopK(EngineDataCase):
+    def test_unordered_selector_unchanged(self):
+        got = selection_engine.execute_selector("CLOSE > 10", "D", None)
+        self.assertEqual(sorted(got), ["sh.600000", "sz.000001", "sz.000002"])
+
+    def test_order_by_field_descending(self):
+        frame = selection_engine.select_frame("CLOSE > 0", "D", order_by="TURN", limit=2)
+        self.assertEqual(frame["code"].to_list(), ["sh.600001", "sz.000002"])
+        self.assertEqual(frame["_order"].to_list(), [8.0, 5.0])
+
+    def test_order_by_expression_ascending(self):
+        frame = selection_engine.select_frame("CLOSE > 0", "D", order_by="ROC(CLOSE, 1)",
+                                              limit=3, descending=False)
+        self.assertEqual(frame["code"].to_list(), ["sh.600001", "sz.000002", "sh.600000"])
+
+    def test_limit_without_order_is_deterministic(self):
+        frame = selection_engine.select_frame("CLOSE > 0", "D", limit=2)
+        self.assertEqual(frame["code"].to_list(), ["sh.600000", "sh.600001"])
+
+    def test_order_by_parse_error(self):
+        self.assertIn("error", selection_engine.select_frame("CLOSE > 0", "D", order_by="NOPE(1)"))
+
+    def test_merge_topk_matches_global_sort(self):
+        full = selection_engine.select_frame("CLOSE > 0", "D", order_by="TURN", limit=4)
+        expected = list(zip(full["code"].to_list(), full["_order"].to_list()))[:3]
+        partials = [
+            {"results": ["sh.600001", "sz.000001"], "values": [8.0, 1.0]},
+            {"results": ["sz.000002", "sh.600000"], "values": [5.0, 3.0]},
+        ]
+        self.assertEqual(merge_topk(partials, 3), expected)
+
+    def test_merge_topk_ascending(self):
+        partials = [{"results": ["a", "b"], "values": [1.0, 4.0]},
+                    {"results": ["c"], "values": [2.0]}]
+        self.assertEqual(merge_topk(partials, 2, descending=False), [("a", 1.0), ("c", 2.0)])
+
+
+class TestProjection(EngineDataCase):
+    def setUp(self):
+        super().setUp()
+        self._saved_meta = (data_manager.df_stock_names, data_manager.df_sector_list)
+        data_manager.df_stock_names = pl.DataFrame({"code": ["sh.600000", "sz.000001"], "name": ["浦发银行", "平安银行"]})
+        data_manager.df_sector_list = pl.DataFrame({"code": ["BK0475"], "name": ["银行"], "type": ["行业板块"]})
+        data_manager.df_mapping = pl.DataFrame({"code": ["sh.600000", "sz.000001"], "sector_code": ["BK0475", "BK0475"]})
+
+    def tearDown(self):
+        data_manager.df_stock_names, data_manager.df_sector_list = self._saved_meta
+        super().tearDown()
+
+    def test_projection_columns_and_metadata(self):
+        frame = selection_engine.select_frame("CLOSE > 11", "D", fields=["TURN", "MA(CLOSE, 2)"])
+        frame = frame.sort("code")
+        self.assertEqual(frame.columns, ["code", "name", "sector_code", "sector_name", "TURN", "MA(CLOSE, 2)"])
+        self.assertEqual(frame["name"].to_list(), ["浦发银行", "平安银行"])
+        self.assertEqual(frame["sector_name"].to_list(), ["银行", "银行"])
+        self.assertEqual(frame["MA(CLOSE, 2)"].to_list(), [11.0, 12.5])
+
+    def test_projection_missing_metadata_is_null(self):
+        frame = selection_engine.select_frame("CLOSE < 10", "D", fields=["TURN"])
+        self.assertEqual(frame["code"].to_list(), ["sh.600001"])
+        self.assertEqual(frame["name"].to_list(), [None])
+        self.assertEqual(frame["sector_code"].to_list(), [None])
+
+    def test_projection_with_order_by(self):
+        frame = selection_engine.select_frame("CLOSE > 0", "D", order_by="TURN", limit=1, fields=["CLOSE"])
+        self.assertEqual(frame["code"].to_list(), ["sh.600001"])
+        self.assertEqual(frame["CLOSE"].to_list(), [9.0])
+
+    def test_projection_parse_error(self):
+        self.assertIn("error", selection_engine.select_frame("CLOSE > 0", "D", fields=["KDJ(CLOSE, 9)"]))
+
+
+class TestBatch(EngineDataCase):
+    def test_batch_matches_sequential(self):
+        formulas = ["CLOSE > 10", "CLOSE > MA(CLOSE, 2)", "TURN > 4 AND CLOSE > MA(CLOSE, 2)"]
+        outputs = selection_engine.execute_batch(formulas, "D")
+        for formula, out in zip(formulas, outputs):
+            expected = sorted(selection_engine.execute_selector(formula, "D", None))
+            self.assertEqual(out["formula"], formula)
+            self.assertEqual(sorted(out["results"]), expected)
+            self.assertEqual(out["count"], len(expected))
+
+    def test_batch_isolates_parse_errors(self):
+        outputs = selection_engine.execute_batch(["NOPE(1) > 0", "CLOSE < 10"], "D")
+        self.assertIn("error", outputs[0])
+        self.assertEqual(outputs[1]["results"], ["sh.600001"])
+
+    def test_batch_isolates_runtime_errors(self):
+        # VOL 能解析，但表中无 volume 列，合并查询执行失败后逐个公式回退
+        outputs = selection_engine.execute_batch(["VOL > 0", "CLOSE < 10"], "D")
+        self.assertIn("error", outputs[0])
+        self.assertEqual(outputs[0]["status"], 400)
+        self.assertNotIn("error", outputs[1])
+        self.assertEqual(outputs[1]["results"], ["sh.600001"])
+
+
+class TestPinnedGeneration(EngineDataCase):
+    def test_selection_reads_pinned_generation(self):
+        # 请求钉住一代后，新代换上不影响本请求读到的表
+        with data_manager.pin() as gen:
+            data_manager.df_daily = data_manager.df_daily.with_columns(pl.lit(0.0).alias("close"))
+            self.assertIsNot(data_manager.df_daily, gen.df_daily)
+            got = sorted(selection_engine.execute_selector("CLOSE > 10", "D", None))
+        self.assertEqual(got, ["sh.600000", "sz.000001", "sz.000002"])
+        self.assertEqual(selection_engine.execute_selector("CLOSE > 10", "D", None), [])
+
+    def test_hot_jit_mount_visible_to_mounting_request(self):
+        with data_manager.pin() as gen:
+            mounted_gen, mounted = selection_engine._prepare_hot_jit("EMA(CLOSE, 2) > 0")
+        self.assertEqual(mounted, ["df_daily.EMA_CLOSE_2"])
+        self.assertNotIn("EMA_CLOSE_2", gen.df_daily.columns)
+        self.assertIn("EMA_CLOSE_2", mounted_gen.df_daily.columns)
+        self.assertIs(data_manager.view(), mounted_gen)
+
+
+class TestExplain(EngineDataCase):
+    def test_hot_jit_mounts_window_columns(self):
+        _, mounted = selection_engine._prepare_hot_jit("CLOSE > EMA(CLOSE, 2) AND EMA(CLOSE, 2) > 0")
+        self.assertEqual(mounted, ["df_daily.EMA_CLOSE_2"])
+        self.assertIn("EMA_CLOSE_2", data_manager.df_daily.columns)
+
+    def test_hot_jit_respects_deadline(self):
+        from core.engine import QueryTimeout
+        with self.assertRaises(QueryTimeout):
+            selection_engine._prepare_hot_jit("EMA(CLOSE, 3) > 0", deadline=time.monotonic() - 1)
+        self.assertNotIn("EMA_CLOSE_3", data_manager.df_daily.columns)
+        res = selection_engine.select_frame("EMA(CLOSE, 3) > 0", "D", timeout_s=1e-9)
+        self.assertEqual(res["status"], 504)
+
+    def test_hot_jit_skips_window_with_null_head(self):
+        # 首行为 null 的滚动窗口（MA 窗口 > 1）不挂载，保持实时计算
+        self.assertEqual(selection_engine._prepare_hot_jit("CLOSE > MA(CLOSE, 2)")[1], [])
+        self.assertNotIn("MA_CLOSE_2", data_manager.df_daily.columns)
+
+    def test_explain_reports_mounted_and_live(self):
+        frame, prof = selection_engine.explain("close > ema(close, 2)  and  ABS(STD(CLOSE, 5)) >= 0", "D")
+        info = prof.to_dict()
+        self.assertEqual(frame["code"].to_list(), [])
+        self.assertEqual(info["canonical_formula"], "CLOSE > EMA(CLOSE, 2) AND ABS(STD(CLOSE, 5)) >= 0")
+        self.assertEqual(info["lookback_bars"], 5)
+        self.assertEqual(info["hot_jit_mounted"], ["df_daily.EMA_CLOSE_2"])
+        self.assertEqual(info["indicators_mounted"], ["EMA_CLOSE_2"])
+        self.assertEqual(info["indicators_live"], ["ABS", "STD_CLOSE_5"])
+        self.assertIn("FILTER", info["plan"].upper())
+        for stage in ("hot_jit", "join_plan", "parse", "collect"):
+            self.assertIn(stage, info["timings_ms"])
+
+    def test_lookback_full_history(self):
+        _, prof = selection_engine.explain("CLOSE > SAR()", "D")
+        self.assertIsNone(prof.info["lookback_bars"])
+
+
+class TestSectorPredicate(EngineDataCase):
+    def setUp(self):
+        super().setUp()
+        from core.sector_index import SectorIndex
+        self._saved_index = data_manager.sector_index
+        data_manager.sector_index = SectorIndex.build(pl.DataFrame({
+            "code": ["sh.600000", "sh.600001", "sz.000001"],
+            "sector_code": ["BK0001", "BK0001", "BK0002"],
+            "sector_name": ["上海银行股", "上海银行股", "深圳股"],
+            "type": ["概念板块", "概念板块", "概念板块"],
+        }))
+
+    def tearDown(self):
+        data_manager.sector_index = self._saved_index
+        super().tearDown()
+
+    def select(self, formula):
+        return sorted(selection_engine.execute_selector(formula, "D", None))
+
+    def test_membership_and_condition(self):
+        self.assertEqual(self.select('IN_SECTOR("BK0001") AND CLOSE > 9.5'), ["sh.600000"])
+        self.assertEqual(self.select('IN_SECTOR("深圳股")'), ["sz.000001"])
+
+    def test_pruned_windows_match_unpruned(self):
+        full = set(self.select("CLOSE > MA(CLOSE, 2)"))
+        pruned = self.select('IN_SECTOR("BK0001") AND CLOSE > MA(CLOSE, 2)')
+        self.assertEqual(pruned, sorted(full & {"sh.600000", "sh.600001"}))
+
+    def test_universe_derivation(self):
+        from core.security import blink_parser
+        self.assertEqual(blink_parser.parse('IN_SECTOR("BK0001") OR IN_SECTOR("BK0002")').universe,
+                         {"sh.600000", "sh.600001", "sz.000001"})
+        self.assertIsNone(blink_parser.parse('IN_SECTOR("BK0001") OR CLOSE > 14').universe)
+        self.assertEqual(self.select('IN_SECTOR("BK0001") OR CLOSE > 14'), ["sh.600000", "sh.600001", "sz.000001"])
+
+    def test_explain_reports_universe(self):
+        _, prof = selection_engine.explain('IN_SECTOR("BK0002") AND CLOSE > 0', "D")
+        self.assertEqual(prof.info["universe_size"], 1)
+
+    def test_batch_prunes_by_union(self):
+        outputs = selection_engine.execute_batch(['IN_SECTOR("BK0001")', 'IN_SECTOR("BK0002")'], "D")
+        self.assertEqual([sorted(o["results"]) for o in outputs], [["sh.600000", "sh.600001"], ["sz.000001"]])
+
+    def test_unknown_sector_rejected(self):
+        res = selection_engine.select_frame('IN_SECTOR("BK9999")', "D")
+        self.assertIn("Unknown sector", res["error"])
+        self.assertIn("error", selection_engine.select_frame("IN_SECTOR(CLOSE)", "D"))
+
+
+class TestProductExposure(EngineDataCase):
+    def setUp(self):
+        super().setUp()
+        from core.product_index import ProductIndex
+        self._saved_index = data_manager.product_index
+        data_manager.product_index = ProductIndex.build(pl.DataFrame({
+            "date": [date(2024, 1, 2)] * 3,
+            "code": ["sh.600000", "sz.000001", "sz.000002"],
+            "product_ratios": ["锂电池:80|储能:20", "锂电池:20|光伏:80", "光伏:100"],
+        }))
+
+    def tearDown(self):
+        data_manager.product_index = self._saved_index
+        super().tearDown()
+
+    def test_threshold_screen(self):
+        self.assertEqual(sorted(selection_engine.execute_selector('PRODUCT_EXPOSURE("锂电池") > 30', "D", None)),
+                         ["sh.600000"])
+        self.assertEqual(sorted(selection_engine.execute_selector('PRODUCT_EXPOSURE("锂电池") < 30', "D", None)),
+                         ["sh.600001", "sz.000001", "sz.000002"])
+
+    def test_universe_pruning(self):
+        from core.security import blink_parser
+        self.assertEqual(blink_parser.parse('PRODUCT_EXPOSURE("光伏") >= 80 AND CLOSE > 0').universe,
+                         {"sz.000001", "sz.000002"})
+        self.assertEqual(blink_parser.parse('10 < PRODUCT_EXPOSURE("锂电池")').universe, {"sh.600000", "sz.000001"})
+        # 0 满足条件时未覆盖的股票也可能命中，不能裁剪
+        self.assertIsNone(blink_parser.parse('PRODUCT_EXPOSURE("锂电池") >= 0').universe)
+
+    def test_unknown_product_rejected(self):
+        self.assertIn("Unknown product", selection_engine.select_frame('PRODUCT_EXPOSURE("芯片") > 1', "D")["error"])
+
+
 if __name__ == "__main__":
     unittest.main()
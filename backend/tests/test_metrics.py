@@ -0,0 +1,58 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from tests.test_routes import RouteDataCase
+from core.metrics import MetricsRegistry, cache_requests, hot_jit_mounts
+
+
+class TestRegistry(unittest.TestCase):
+    def test_counter_and_histogram_exposition(self):
+        reg = MetricsRegistry()
+        c = reg.counter("t_total", "test counter", ("kind",))
+        h = reg.histogram("t_seconds", "test histogram", ("route",), buckets=(0.1, 1.0))
+        c.inc(kind="a")
+        c.inc(2, kind="a")
+        h.observe(0.05, route="/x")
+        h.observe(0.5, route="/x")
+        h.observe(5.0, route="/x")
+        text = reg.render()
+        self.assertIn("# TYPE t_total counter", text)
+        self.assertIn('t_total{kind="a"} 3', text)
+        # 桶计数为累计值，+Inf 等于总数
+        self.assertIn('t_seconds_bucket{route="/x",le="0.1"} 1', text)
+        self.assertIn('t_seconds_bucket{route="/x",le="1"} 2', text)
+        self.assertIn('t_seconds_bucket{route="/x",le="+Inf"} 3', text)
+        self.assertIn('t_seconds_count{route="/x"} 3', text)
+
+    def test_gauge_failure_is_isolated(self):
+        reg = MetricsRegistry()
+        reg.gauge("broken", "fails", lambda: 1 / 0)
+        reg.gauge("ok", "works", lambda: [({"k": 'a"b'}, 1.5)])
+        text = reg.render()
+        self.assertIn("# broken collection failed", text)
+        self.assertIn('ok{k="a\\"b"} 1.5', text)
+
+
+class TestMetricsRoute(RouteDataCase):
+    def test_scrape_reports_hot_jit_and_memory(self):
+        before = cache_requests.value(cache="hot_jit", result="miss")
+        mounts = hot_jit_mounts.value(table="df_daily", source="local")
+        res = self.client.post("/api/v1/select", json={"formula": "EMA(CLOSE, 2) > 0"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(cache_requests.value(cache="hot_jit", result="miss"), before + 1)
+        self.assertEqual(hot_jit_mounts.value(table="df_daily", source="local"), mounts + 1)
+
+        res = self.client.get("/api/v1/metrics")
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        text = res.text
+        self.assertIn('blinkquant_hot_jit_columns{table="df_daily"} 1', text)
+        self.assertIn('blinkquant_table_rows{table="df_daily"} 4', text)
+        self.assertIn('blinkquant_resident_bytes{object="df_daily"}', text)
+        self.assertIn('blinkquant_selection_stage_seconds_count{stage="hot_jit"}', text)
+        self.assertIn("process_resident_memory_bytes ", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from unittest import mock
+from datetime import date
+import polars as pl
+from core import product_index as product_module
+from core.product_index import ProductIndex
+
+
+DAILY = pl.DataFrame({
+    "date": [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 2), date(2024, 1, 1), date(2024, 1, 2)],
+    "code": ["sh.600000", "sh.600000", "sz.000001", "sz.000002", "sz.000002"],
+    "product_ratios": ["锂电池:10|其他:90", "锂电池:80.5|锂电池材料:5.0|储能:14.5", None, "储能锂电池:40%", ""],
+})
+
+
+class TestProductIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = ProductIndex.build(DAILY)
+
+    def test_latest_bar_only(self):
+        codes, exposures = self.index.lookup("锂电池")
+        self.assertEqual(codes.to_list(), ["sh.600000"])
+        self.assertEqual(exposures.to_list(), [80.5])
+        self.assertIsNone(self.index.lookup("其他"))
+
+    def test_empty_latest_falls_back_to_last_non_empty(self):
+        codes, exposures = self.index.lookup("储能锂电池")
+        self.assertEqual(codes.to_list(), ["sz.000002"])
+        self.assertEqual(exposures.to_list(), [40.0])
+
+    def test_substring_match_sums_products(self):
+        codes, exposures = self.index.lookup("锂电")
+        self.assertEqual(dict(zip(codes.to_list(), exposures.to_list())), {"sh.600000": 85.5, "sz.000002": 40.0})
+
+    def test_keyword_cache_bounded_lru(self):
+        with mock.patch.object(product_module, "KEYWORD_CACHE_SIZE", 2):
+            self.index.lookup("锂电")
+            self.index.lookup("储能锂")
+            self.index.lookup("锂电")
+            self.index.lookup("电池")
+        self.assertEqual(list(self.index._cache), ["锂电", "电池"])
+        self.assertIsNone(self.index.lookup("不存在的关键词"))
+        self.assertNotIn("不存在的关键词", self.index._cache)
+        # 重建索引得到空缓存
+        self.assertEqual(len(ProductIndex.build(DAILY)._cache), 0)
+
+    def test_missing_column(self):
+        self.assertEqual(len(ProductIndex.build(DAILY.drop("product_ratios"))), 0)
+        self.assertIsNone(ProductIndex().lookup("锂电池"))
+
+
+if __name__ == "__main__":
+    unittest.main()
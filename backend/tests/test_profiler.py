@@ -0,0 +1,101 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import unittest
+from unittest import mock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core.profiler import ProfileStore, ProfilerBusy
+from api.routes import router
+from api.admin import router as admin_router
+from tests.test_routes import RouteDataCase
+
+ADMIN = {"X-Admin-Token": "s3cret"}
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfileStore(unittest.TestCase):
+    def test_collapsed_stacks_and_functions(self):
+        store = ProfileStore(4)
+        with store.capture("test", {"n": 1}, interval_ms=1) as session:
+            busy_wait(0.1)
+        record = store.get(session.id)
+        self.assertGreater(record["samples"], 0)
+        self.assertTrue(any("busy_wait" in line for line in record["collapsed"]))
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in record["collapsed"]))
+        self.assertTrue(any("busy_wait" in f["function"] for f in record["top_functions"]))
+
+    def test_ring_buffer_evicts_oldest(self):
+        store = ProfileStore(2)
+        ids = []
+        for i in range(3):
+            with store.capture("test", {"i": i}) as session:
+                pass
+            ids.append(session.id)
+        self.assertIsNone(store.get(ids[0]))
+        self.assertEqual([p["id"] for p in store.list()], [ids[2], ids[1]])
+
+    def test_failure_recorded_and_single_session(self):
+        store = ProfileStore(2)
+        with self.assertRaises(ValueError):
+            with store.capture("test", {}) as session:
+                with self.assertRaises(ProfilerBusy):
+                    with store.capture("nested", {}):
+                        pass
+                raise ValueError("boom")
+        self.assertTrue(store.get(session.id)["status"].startswith("error: ValueError"))
+
+
+class TestProfiledRoutes(RouteDataCase):
+    def setUp(self):
+        super().setUp()
+        app = FastAPI()
+        app.include_router(router)
+        app.include_router(admin_router)
+        self.client = TestClient(app)
+        env = mock.patch.dict(os.environ, {"ADMIN_TOKEN": "s3cret"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def test_requires_admin_token(self):
+        res = self.client.post("/api/v1/select?sample_profile=1", json={"formula": "CLOSE > 0"})
+        self.assertEqual(res.status_code, 403)
+        # 未开启时不需要认证
+        self.assertEqual(self.client.post("/api/v1/select", json={"formula": "CLOSE > 0"}).status_code, 200)
+
+    def test_select_profile_round_trip(self):
+        res = self.client.post("/api/v1/select?sample_profile=1", json={"formula": "MA(CLOSE, 2) > 0"}, headers=ADMIN)
+        self.assertEqual(res.status_code, 200)
+        profile_id = res.headers["X-Profile-Id"]
+        self.assertEqual(res.json()["profile_id"], profile_id)
+        self.assertNotIn("profile", res.json())
+
+        record = self.client.get(f"/api/v1/admin/profiles/{profile_id}", headers=ADMIN).json()
+        self.assertEqual(record["kind"], "select")
+        self.assertIn("plan", record["selection"])
+        self.assertIn("collect", record["selection"]["timings_ms"])
+        collapsed = self.client.get(f"/api/v1/admin/profiles/{profile_id}?format=collapsed", headers=ADMIN)
+        self.assertTrue(collapsed.headers["content-type"].startswith("text/plain"))
+        listed = self.client.get("/api/v1/admin/profiles", headers=ADMIN).json()["profiles"]
+        self.assertEqual(listed[0]["id"], profile_id)
+
+    def test_kline_header_flag_and_failed_request(self):
+        res = self.client.get("/api/v1/kline?code=sh.600000", headers={**ADMIN, "X-Profile-Run": "1"})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("X-Profile-Id", res.headers)
+
+        res = self.client.get("/api/v1/kline?code=sh.999999", headers={**ADMIN, "X-Profile-Run": "1"})
+        self.assertEqual(res.status_code, 404)
+        record = self.client.get(f"/api/v1/admin/profiles/{res.headers['X-Profile-Id']}", headers=ADMIN).json()
+        self.assertEqual(record["status"], "error: Stock not found")
+        self.assertEqual(self.client.get("/api/v1/admin/profiles/nope", headers=ADMIN).status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -19,9 +19,9 @@ class TestRegistry(unittest.TestCase):
             "ABS", "AROON_DOWN", "AROON_UP", "ATR", "BARSLAST", "BBI",
             "BIAS", "BOLL_LOWER", "BOLL_MID", "BOLL_UPPER", "CCI",
             "COUNT", "CR", "CROSS_DOWN", "CROSS_UP", "DEMA", "DMI_ADX",
-            "DMI_MDI", "DMI_PDI", "EMA", "HHV", "KDJ_D", "KDJ_J",
+            "DMI_MDI", "DMI_PDI", "EMA", "HHV", "IN_SECTOR", "KDJ_D", "KDJ_J",
             "KDJ_K", "LLV", "MA", "MACD_DEA", "MACD_DIF", "MACD_HIST",
-            "MAX", "MFI", "MIN", "OBV", "PPO", "PSY", "REF", "ROC",
+            "MAX", "MFI", "MIN", "OBV", "PPO", "PRODUCT_EXPOSURE", "PSY", "REF", "ROC",
             "RSI", "SAR", "STD", "SUM", "TEMA", "TRIX", "UO", "VR",
             "VWAP", "WR",
         ])
@@ -95,6 +95,7 @@ class TestRegistry(unittest.TestCase):
             "PPO": ["pos_int", "pos_int"], "DEMA": ["series", "pos_int"],
             "TEMA": ["series", "pos_int"], "UO": [], "VR": ["pos_int"],
             "PSY": ["pos_int"], "CR": ["pos_int"],
+            "IN_SECTOR": ["sector"], "PRODUCT_EXPOSURE": ["product"],
         }
         got = {name: entry["signature"] for name, entry in INDICATORS.items()}
         self.assertEqual(got, expect)
@@ -0,0 +1,140 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import unittest
+from unittest import mock
+import polars as pl
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core import data_manager as dm_module
+from core.data_manager import DataManager, data_manager
+from api.admin import router as admin_router
+
+
+def fake_loader(ok=True, delay=0.0):
+    """替代网络加载：新代写入一张可辨识的小日线表"""
+    async def load(self, revision=None, memory_guard=None):
+        await asyncio.sleep(delay)
+        if not ok:
+            self.load_error = "boom"
+            return False
+        self.df_daily = pl.DataFrame({"code": ["sh.600000"], "close": [float(len(revision))]})
+        self.dataset_revision = revision
+        return True
+    return load
+
+
+def revision(value):
+    async def fetch(self):
+        return value
+    return fetch
+
+
+class TestGenerationSwap(unittest.TestCase):
+    def setUp(self):
+        self.dm = DataManager()
+        self.dm.df_daily = pl.DataFrame({"code": ["old"], "close": [1.0]})
+        self.dm.dataset_revision = "rev1"
+
+    def reload(self, rev="rev22", loader=None, **kwargs):
+        with mock.patch.object(DataManager, "fetch_revision", revision(rev)), \
+             mock.patch.object(DataManager, "async_load_data", loader or fake_loader()):
+            return asyncio.run(self.dm.reload(**kwargs))
+
+    def test_swap_replaces_generation(self):
+        old = self.dm.df_daily
+        report = self.reload()
+        self.assertEqual(report["status"], "swapped")
+        self.assertIsNot(self.dm.df_daily, old)
+        self.assertEqual(self.dm.df_daily["close"].to_list(), [5.0])
+        self.assertEqual((self.dm.generation, self.dm.data_version, self.dm.dataset_revision), (1, 1, "rev22"))
+        self.assertTrue(report["drained"])
+        self.assertGreater(report["peak_rss_gb"], 0)
+        self.assertFalse(self.dm.reloading)
+
+    def test_unchanged_revision_skipped(self):
+        report = self.reload(rev="rev1")
+        self.assertEqual(report["status"], "unchanged")
+        self.assertEqual(self.dm.generation, 0)
+        self.assertEqual(self.reload(rev="rev1", force=True)["status"], "swapped")
+
+    def test_failed_load_keeps_old_generation(self):
+        old = self.dm.df_daily
+        report = self.reload(loader=fake_loader(ok=False))
+        self.assertEqual((report["status"], report["error"]), ("failed", "boom"))
+        self.assertIs(self.dm.df_daily, old)
+
+    def test_memory_bound(self):
+        self.assertEqual(self.reload(max_rss_gb=0.001)["status"], "refused")
+        with self.assertRaises(MemoryError):
+            self.dm._memory_guard(1)("stock_kline_2024.parquet")
+
+    def test_default_memory_bound_from_memory_limit(self):
+        # 未配置 RELOAD_MAX_RSS_GB 时上限取内存上限的一定比例，重载报告带上该上限
+        with mock.patch("psutil.virtual_memory", return_value=mock.Mock(total=8 * dm_module.GB)), \
+                mock.patch("builtins.open", side_effect=OSError):
+            self.assertEqual(dm_module._memory_limit_bytes(), 8 * dm_module.GB)
+        with mock.patch.object(dm_module, "RELOAD_MAX_RSS_GB", 6.8):
+            self.assertEqual(self.reload()["limit_gb"], 6.8)
+
+    def test_drains_inflight_requests_of_old_generation(self):
+        async def go():
+            pin = self.dm.pin()
+            gen = pin.__enter__()
+            task = asyncio.create_task(self.dm.reload())
+            while self.dm.last_reload is None or self.dm.last_reload["status"] == "loading":
+                await asyncio.sleep(0.01)
+            # 新请求落在新代，旧代仍有 1 个在途
+            self.assertEqual(self.dm.last_reload["status"], "draining")
+            self.assertEqual((gen.number, self.dm.generation, self.dm.inflight(gen.number)), (0, 1, 1))
+            self.assertEqual(self.dm.inflight_total(), 1)
+            # 已钉住的请求继续读旧代快照，不会读到新旧两代混合的表
+            self.assertIs(self.dm.view(), gen)
+            self.assertEqual(self.dm.view().df_daily["code"].to_list(), ["old"])
+            self.assertEqual(self.dm._current.df_daily["code"].to_list(), ["sh.600000"])
+            pin.__exit__(None, None, None)
+            return await task
+        with mock.patch.object(DataManager, "fetch_revision", revision("rev3")), \
+             mock.patch.object(DataManager, "async_load_data", fake_loader()):
+            report = asyncio.run(go())
+        self.assertTrue(report["drained"])
+        self.assertEqual(self.dm.inflight(0), 0)
+        self.assertIs(self.dm.view(), self.dm._current)
+
+    def test_generation_snapshot_is_immutable(self):
+        gen = self.dm.view()
+        with self.assertRaises(AttributeError):
+            gen.df_daily = None
+        self.dm.df_daily = pl.DataFrame({"code": ["new"], "close": [2.0]})
+        self.assertEqual(gen.df_daily["code"].to_list(), ["old"])
+        self.assertEqual(self.dm.view().df_daily["code"].to_list(), ["new"])
+
+    def test_concurrent_reload_rejected(self):
+        self.dm.reloading = True
+        self.assertEqual(asyncio.run(self.dm.reload())["status"], 409)
+
+
+class TestAdminReloadRoute(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(admin_router)
+        self.client = TestClient(app)
+
+    def test_token_required(self):
+        with mock.patch.dict(os.environ, {"ADMIN_TOKEN": ""}):
+            self.assertEqual(self.client.post("/api/v1/admin/reload").status_code, 403)
+        with mock.patch.dict(os.environ, {"ADMIN_TOKEN": "s3cret"}):
+            res = self.client.post("/api/v1/admin/reload", headers={"X-Admin-Token": "nope"})
+            self.assertEqual(res.status_code, 401)
+
+    def test_status(self):
+        with mock.patch.dict(os.environ, {"ADMIN_TOKEN": "s3cret"}):
+            res = self.client.get("/api/v1/admin/reload", headers={"X-Admin-Token": "s3cret"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["generation"], data_manager.generation)
+        self.assertIn("sector_index", res.json()["resident_bytes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,344 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import asyncio
+import unittest
+from datetime import date
+import polars as pl
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core.data_manager import data_manager
+from api.routes import router, prepare_static_payloads, _static_version
+from api.encoding import static_payloads
+from core.indicator_registry import nl_meta as build_nl_meta
+
+
+def make_client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+class RouteDataCase(unittest.TestCase):
+    """挂载小日线表并构造仅含 API 路由的测试应用。"""
+    def setUp(self):
+        self._saved = (data_manager.df_daily, data_manager.df_mapping, data_manager.postgres_url, data_manager.row_index)
+        data_manager.row_index = {}
+        data_manager.df_mapping = None
+        data_manager.postgres_url = None
+        data_manager.df_daily = pl.DataFrame({
+            "date": [date(2024, 1, 1), date(2024, 1, 2)] * 2,
+            "code": ["sh.600000", "sh.600000", "sz.000001", "sz.000001"],
+            "close": [10.0, 12.0, 10.0, 9.0],
+            "turn": [1.0, 2.0, 3.0, 4.0],
+        })
+        self.client = make_client()
+
+    def tearDown(self):
+        (data_manager.df_daily, data_manager.df_mapping,
+         data_manager.postgres_url, data_manager.row_index) = self._saved
+
+
+class TestSelectRoute(RouteDataCase):
+    def test_plain_select(self):
+        res = self.client.post("/api/v1/select", json={"formula": "CLOSE > 0"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(sorted(res.json()["results"]), ["sh.600000", "sz.000001"])
+
+    def test_columnar_json_projection(self):
+        res = self.client.post("/api/v1/select", json={"formula": "CLOSE > 0", "order_by": "TURN", "fields": ["TURN"]})
+        body = res.json()
+        self.assertEqual(body["results"], ["sz.000001", "sh.600000"])
+        self.assertEqual(body["columns"]["TURN"], [4.0, 2.0])
+        self.assertIn("name", body["columns"])
+
+    def test_arrow_projection(self):
+        res = self.client.post("/api/v1/select", json={"formula": "CLOSE > 0", "fields": ["TURN"], "format": "arrow"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers["content-type"], "application/vnd.apache.arrow.stream")
+        frame = pl.read_ipc_stream(io.BytesIO(res.content)).sort("code")
+        self.assertEqual(frame["TURN"].to_list(), [2.0, 4.0])
+
+    def test_profile_flag_returns_timings(self):
+        res = self.client.post("/api/v1/select?profile=1", json={"formula": "CLOSE > 11"})
+        body = res.json()
+        self.assertEqual(body["results"], ["sh.600000"])
+        self.assertIn("serialize", body["profile"]["timings_ms"])
+
+    def test_explain_endpoint(self):
+        res = self.client.post("/api/v1/explain", json={"formula": "CLOSE > 11"})
+        body = res.json()
+        self.assertEqual(body["count"], 1)
+        self.assertEqual(body["profile"]["canonical_formula"], "CLOSE > 11")
+        self.assertIn("plan", body["profile"])
+
+    def test_selection_runs_off_event_loop(self):
+        # 选股在线程池执行：被调用时当前线程没有运行中的事件循环
+        from core.engine import selection_engine
+        seen = []
+        original = selection_engine.select_frame
+
+        def probe(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                seen.append("loop")
+            except RuntimeError:
+                seen.append("thread")
+            return original(*args, **kwargs)
+
+        selection_engine.select_frame = probe
+        try:
+            self.assertEqual(self.client.post("/api/v1/select", json={"formula": "CLOSE > 11"}).status_code, 200)
+        finally:
+            selection_engine.select_frame = original
+        self.assertEqual(seen, ["thread"])
+
+    def test_bad_limit_rejected(self):
+        res = self.client.post("/api/v1/select", json={"formula": "CLOSE > 0", "limit": 0})
+        self.assertEqual(res.status_code, 400)
+
+
+class TestSelectBatchRoute(RouteDataCase):
+    def test_batch_with_sequential_comparison(self):
+        res = self.client.post("/api/v1/select-batch", json={
+            "formulas": ["CLOSE > 11", "CLOSE < 11"], "compare_sequential": True})
+        body = res.json()
+        self.assertEqual([b["results"] for b in body["batch"]], [["sh.600000"], ["sz.000001"]])
+        self.assertIn("sequential_ms", body)
+        self.assertIn("speedup", body)
+        self.assertNotIn("sequential_error", body)
+
+    def test_empty_batch_rejected(self):
+        self.assertEqual(self.client.post("/api/v1/select-batch", json={"formulas": []}).status_code, 400)
+
+
+class TestShardRouting(RouteDataCase):
+    """副本节点持有多个分片：请求可限定只回答某个分片"""
+    def setUp(self):
+        super().setUp()
+        self._saved_shards = (data_manager.shards, data_manager.shard_codes)
+        data_manager.shards = [0, 1]
+        data_manager.shard_codes = {0: ["sh.600000"], 1: ["sz.000001"]}
+
+    def tearDown(self):
+        data_manager.shards, data_manager.shard_codes = self._saved_shards
+        super().tearDown()
+
+    def test_health_reports_shards(self):
+        body = self.client.get("/api/v1/health").json()
+        self.assertEqual(body["status"], "healthy")
+        self.assertEqual(body["shards"], [0, 1])
+        self.assertIn("build_id", body)
+
+    def test_health_reports_load_failure(self):
+        data_manager.df_daily = None
+        data_manager.load_error = "shared loader failed: HF unavailable"
+        try:
+            body = self.client.get("/api/v1/health").json()
+        finally:
+            data_manager.load_error = None
+        self.assertEqual(body["status"], "failed")
+        self.assertEqual(body["error"], "shared loader failed: HF unavailable")
+
+    def test_select_restricted_to_shard(self):
+        res = self.client.post("/api/v1/select", json={"formula": "CLOSE > 0", "shards": [1]})
+        self.assertEqual(res.json()["results"], ["sz.000001"])
+        res = self.client.post("/api/v1/select", json={"formula": "CLOSE > 0", "shards": [0, 1]})
+        self.assertEqual(sorted(res.json()["results"]), ["sh.600000", "sz.000001"])
+
+    def test_batch_restricted_to_shard(self):
+        res = self.client.post("/api/v1/select-batch", json={"formulas": ["CLOSE > 0"], "shards": [0]})
+        self.assertEqual(res.json()["batch"][0]["results"], ["sh.600000"])
+
+    def test_unserved_shard_misdirected(self):
+        res = self.client.post("/api/v1/select", json={"formula": "CLOSE > 0", "shards": [2]})
+        self.assertEqual(res.status_code, 421)
+
+    def test_parse_shards(self):
+        self.assertEqual(data_manager.parse_shards("1, 2", 0, 3), [0, 1, 2])
+        self.assertEqual(data_manager.parse_shards(None, 2, 3), [2])
+        self.assertEqual(data_manager.parse_shards("5,x", 1, 3), [1])
+
+
+class KlineDataCase(RouteDataCase):
+    def setUp(self):
+        super().setUp()
+        # 故意打乱行序：构建索引时应按 [code, date] 重排
+        data_manager.df_daily = pl.DataFrame({
+            "date": [date(2024, 1, d) for d in (3, 1, 2)] + [date(2024, 1, d) for d in (1, 2, 3)],
+            "code": ["sh.600000"] * 3 + ["sz.000001"] * 3,
+            "close": [13.0, 11.0, 12.0, 21.0, 22.0, 23.0],
+            "volume": [300.0, 100.0, 200.0, 1.0, 2.0, 3.0],
+        }).sample(fraction=1.0, shuffle=True, seed=7)
+
+    def get(self, **params):
+        res = self.client.get("/api/v1/kline", params=params)
+        return res, (pl.read_parquet(io.BytesIO(res.content)) if res.status_code == 200 else None)
+
+
+class TestKlineRoute(KlineDataCase):
+    def test_row_index_slices_match_filter(self):
+        _, fallback = self.get(code="sh.600000")
+        data_manager._build_row_index("df_daily")
+        self.assertIn("df_daily", data_manager.row_index)
+        _, indexed = self.get(code="sh.600000")
+        self.assertEqual(indexed["close"].to_list(), [11.0, 12.0, 13.0])
+        self.assertTrue(indexed.equals(fallback))
+
+    def test_stale_index_falls_back(self):
+        data_manager._build_row_index("df_daily")
+        data_manager.df_daily = data_manager.df_daily.filter(pl.col("code") == "sz.000001")
+        _, df = self.get(code="sz.000001")
+        self.assertEqual(df["close"].to_list(), [21.0, 22.0, 23.0])
+
+    def test_same_height_resort_falls_back(self):
+        # 行数不变的重排同样使索引失效，不得按旧偏移切片
+        data_manager._build_row_index("df_daily")
+        data_manager.df_daily = data_manager.df_daily.sort(["code", "date"], descending=True)
+        _, df = self.get(code="sh.600000")
+        self.assertEqual(df["close"].to_list(), [11.0, 12.0, 13.0])
+
+    def test_index_follows_mounted_columns(self):
+        data_manager._build_row_index("df_daily")
+        df = data_manager.df_daily
+        data_manager.mount_columns(data_manager.view(), "df_daily", [(df["close"] * 2).alias("X2")])
+        self.assertIsNotNone(data_manager.row_spans("df_daily"))
+        self.assertEqual(data_manager.code_slice("df_daily", "sh.600000")["X2"].to_list(), [22.0, 24.0, 26.0])
+
+    def test_column_projection(self):
+        _, df = self.get(code="sh.600000", columns="volume")
+        self.assertEqual(df.columns, ["date", "code", "volume"])
+        res, _ = self.get(code="sh.600000", columns="nope")
+        self.assertEqual(res.status_code, 400)
+
+    def test_date_range_and_since(self):
+        data_manager._build_row_index("df_daily")
+        _, df = self.get(code="sh.600000", start="2024-01-02", end="2024-01-02")
+        self.assertEqual(df["close"].to_list(), [12.0])
+        _, df = self.get(code="sh.600000", since="2024-01-02")
+        self.assertEqual(df["close"].to_list(), [13.0])
+        # 无新 K 线：空表而非 404
+        res, df = self.get(code="sh.600000", since="2024-01-03")
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(df.is_empty())
+        self.assertEqual(self.get(code="sh.600000", start="bad")[0].status_code, 400)
+
+    def test_arrow_negotiation(self):
+        data_manager._build_row_index("df_daily")
+        for kwargs in ({"params": {"code": "sh.600000", "format": "arrow", "compression": "lz4"}},
+                       {"params": {"code": "sh.600000", "compression": "zstd"},
+                        "headers": {"Accept": "application/vnd.apache.arrow.stream"}},
+                       {"params": {"code": "sh.600000", "format": "arrow"}}):
+            res = self.client.get("/api/v1/kline", **kwargs)
+            self.assertEqual(res.headers["content-type"], "application/vnd.apache.arrow.stream")
+            df = pl.read_ipc_stream(io.BytesIO(res.content))
+            self.assertEqual(df["close"].to_list(), [11.0, 12.0, 13.0])
+        self.assertEqual(self.get(code="sh.600000", format="csv")[0].status_code, 400)
+        self.assertEqual(self.get(code="sh.600000", format="arrow", compression="gzip")[0].status_code, 400)
+
+    def test_points_decimation(self):
+        res, df = self.get(code="sh.600000", points=10)
+        self.assertNotIn("x-decimated", res.headers)
+        self.assertEqual(len(df), 3)
+        self.assertEqual(self.get(code="sh.600000", points=1)[0].status_code, 400)
+        self.assertEqual(self.get(code="sh.600000", points=10, decimate="nope")[0].status_code, 400)
+
+    def test_lttb_requires_close_and_header_reflects_rows(self):
+        data_manager.df_daily = pl.DataFrame({
+            "date": pl.date_range(date(2024, 1, 1), date(2024, 1, 30), eager=True),
+            "code": ["sh.600000"] * 30,
+            "close": [float(i % 7) for i in range(30)],
+            "volume": [1.0] * 30,
+        })
+        res, _ = self.get(code="sh.600000", columns="volume", points=10, decimate="lttb")
+        self.assertEqual(res.status_code, 422)
+        res, df = self.get(code="sh.600000", columns="close", points=10, decimate="lttb")
+        self.assertEqual((res.headers["x-decimated"], res.headers["x-source-count"]), ("lttb", "30"))
+        self.assertEqual(len(df), 10)
+
+    def test_unknown_code_404(self):
+        self.assertEqual(self.get(code="sh.999999")[0].status_code, 404)
+
+
+class TestKlineBatchRoute(KlineDataCase):
+    def test_batch_parquet_groups_by_code(self):
+        data_manager._build_row_index("df_daily")
+        res = self.client.post("/api/v1/kline-batch", json={
+            "codes": ["sz.000001", "sh.600000", "sh.999999"], "columns": ["close"], "since": "2024-01-01"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers["x-codes"], "2")
+        df = pl.read_parquet(io.BytesIO(res.content))
+        self.assertEqual(df.columns, ["date", "code", "close"])
+        self.assertEqual(df["code"].to_list(), ["sz.000001"] * 2 + ["sh.600000"] * 2)
+        self.assertEqual(df["close"].to_list(), [22.0, 23.0, 12.0, 13.0])
+
+    def test_batch_arrow_one_record_batch_per_code(self):
+        import pyarrow as pa
+        res = self.client.post("/api/v1/kline-batch", json={
+            "codes": ["sh.600000", "sz.000001"], "format": "arrow", "compression": "lz4"})
+        batches = list(pa.ipc.open_stream(res.content))
+        self.assertEqual([b.column("code")[0].as_py() for b in batches], ["sh.600000", "sz.000001"])
+
+    def test_batch_unowned_codes_skipped(self):
+        res = self.client.post("/api/v1/kline-batch", json={"codes": ["sh.999999"]})
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(pl.read_parquet(io.BytesIO(res.content)).is_empty())
+        self.assertEqual(self.client.post("/api/v1/kline-batch", json={"codes": []}).status_code, 400)
+
+
+class TestStaticPayloads(RouteDataCase):
+    def setUp(self):
+        super().setUp()
+        self._saved_names = (data_manager.code_to_name, data_manager.data_version)
+        data_manager.code_to_name = {"sh.600000": "浦发银行", "sz.000001": "平安银行", "sz.000002": " "}
+        data_manager.data_version += 1
+        static_payloads.clear()
+        static_payloads.put("nl-meta", data_manager.build_id, build_nl_meta())
+        data_manager._dataset_ready(data_manager, data_manager.data_version)
+
+    def tearDown(self):
+        data_manager.code_to_name, data_manager.data_version = self._saved_names
+        super().tearDown()
+
+    def test_stock_list_compressed_and_cached(self):
+        res = self.client.get("/api/v1/stock-list", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers["content-encoding"], "gzip")
+        self.assertEqual(res.json(), [{"code": "sh.600000", "name": "浦发银行"}, {"code": "sz.000001", "name": "平安银行"}])
+        etag = res.headers["etag"]
+        self.assertIn(data_manager.build_id, etag)
+        self.assertIn("max-age", res.headers["cache-control"])
+
+        res = self.client.get("/api/v1/stock-list", headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+
+        # 新数据版本：就绪回调预构建后 ETag 变化；未预构建的版本不在请求路径上现场构建
+        data_manager.data_version += 1
+        self.assertEqual(self.client.get("/api/v1/stock-list").status_code, 503)
+        data_manager._dataset_ready(data_manager, data_manager.data_version)
+        self.assertNotEqual(self.client.get("/api/v1/stock-list").headers["etag"], etag)
+
+    def test_previous_version_kept_during_swap(self):
+        # 切换前预构建新版本，旧版本在切换完成前仍可命中
+        old = _static_version()
+        prepare_static_payloads(data_manager, data_manager.data_version + 1)
+        self.assertIsNotNone(static_payloads.get("stock-list", old))
+
+    def test_nl_meta_identity_when_not_accepted(self):
+        res = self.client.get("/api/v1/nl-meta", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", res.headers)
+        self.assertIn("indicators", res.json())
+
+    def test_negotiate_encoding(self):
+        from api.encoding import negotiate_encoding
+        available = {"identity": b"", "gzip": b"", "zstd": b""}
+        self.assertEqual(negotiate_encoding("gzip, zstd", available), "zstd")
+        self.assertEqual(negotiate_encoding("gzip;q=1.0, zstd;q=0.5", available), "gzip")
+        self.assertEqual(negotiate_encoding("br", available), "identity")
+        self.assertEqual(negotiate_encoding("*", available), "zstd")
+        self.assertEqual(negotiate_encoding(None, available), "identity")
+
+
+if __name__ == "__main__":
+    unittest.main()
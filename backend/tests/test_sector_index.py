@@ -0,0 +1,68 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+import polars as pl
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core.data_manager import data_manager
+from core.sector_index import SectorIndex
+from api.routes import router
+
+
+MAPPING = pl.DataFrame({
+    "code": ["sh.600000", "sh.600000", "sz.000001", "sz.000001", "sz.000001", "sh.601398"],
+    "sector_code": ["BK0475", "BK0500", "BK0475", "BK0475", "BK0600", "BK0475"],
+    "sector_name": ["银行", "上海板块", "银行", "银行", "深圳板块", "银行"],
+    "type": ["行业板块", "地域板块", "行业板块", "行业板块", "地域板块", "行业板块"],
+})
+
+
+class TestSectorIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SectorIndex.build(MAPPING)
+
+    def test_both_directions(self):
+        self.assertEqual(self.index.sectors_of("sh.600000"),
+                         [("BK0475", "银行", "行业板块"), ("BK0500", "上海板块", "地域板块")])
+        self.assertEqual(self.index.constituents("BK0475"), ["sh.600000", "sh.601398", "sz.000001"])
+        self.assertEqual(self.index.constituents("BK0600"), ["sz.000001"])
+
+    def test_duplicates_collapsed(self):
+        self.assertEqual(len(self.index.sectors_of("sz.000001")), 2)
+        self.assertEqual(len(self.index.stock_indices), 5)
+        self.assertEqual(len(self.index.sector_indices), 5)
+
+    def test_missing_keys(self):
+        self.assertEqual(self.index.sectors_of("sh.999999"), [])
+        self.assertEqual(self.index.constituents("BK9999"), [])
+        self.assertIsNone(self.index.sector_info("BK9999"))
+        self.assertEqual(len(SectorIndex.build(MAPPING.head(0))), 0)
+
+
+class TestSectorRoutes(unittest.TestCase):
+    def setUp(self):
+        self._saved = (data_manager.sector_index, data_manager.code_to_name)
+        data_manager.sector_index = SectorIndex.build(MAPPING)
+        data_manager.code_to_name = {"sh.600000": "浦发银行"}
+        app = FastAPI()
+        app.include_router(router)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        data_manager.sector_index, data_manager.code_to_name = self._saved
+
+    def test_stock_sectors(self):
+        body = self.client.get("/api/v1/stock-sectors", params={"code": "sz.000001"}).json()
+        self.assertEqual([s["code"] for s in body["sectors"]], ["BK0475", "BK0600"])
+
+    def test_sector_constituents(self):
+        body = self.client.get("/api/v1/sector-constituents", params={"code": "BK0475"}).json()
+        self.assertEqual(body["name"], "银行")
+        self.assertEqual(body["count"], 3)
+        self.assertEqual(body["constituents"][0], {"code": "sh.600000", "name": "浦发银行"})
+        self.assertEqual(self.client.get("/api/v1/sector-constituents", params={"code": "BK9999"}).status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,7 @@ import ast
 import unittest
 import polars as pl
 from core.security import blink_parser, _require_whitelist_field, _require_positive_int, _split_arith_top_level, _strip_outer_parens
+from core.data_manager import data_manager
 
 def parse_call(src):
     return ast.parse(src, mode="eval").body
@@ -89,6 +90,19 @@ class TestCallBranch(unittest.TestCase):
         result = df.with_columns(expr.alias("m")).select(pl.col("m")).to_series().to_list()
         self.assertEqual(result, [None, 10.5, 11.5])
 
+    def test_parse_returns_hits_without_shared_state(self):
+        saved = data_manager.df_daily
+        data_manager.df_daily = pl.DataFrame({"close": [10.0, 11.0], "MA_CLOSE_20": [1.0, 1.0]})
+        try:
+            parsed = blink_parser.parse("MA(CLOSE, 20) > 0 AND MA(CLOSE, 5) > 0", "D")
+        finally:
+            data_manager.df_daily = saved
+        self.assertEqual(parsed.mounted, ["MA_CLOSE_20"])
+        self.assertEqual(parsed.live, ["MA_CLOSE_5"])
+        self.assertIsNone(parsed.universe)
+        for attr in ("universe", "mounted_hits", "live_calls"):
+            self.assertFalse(hasattr(blink_parser, attr))
+
     def test_fields_match_registry(self):
         from core.indicator_registry import FIELDS
         self.assertEqual(set(blink_parser.fields.keys()), set(FIELDS))
@@ -0,0 +1,201 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from datetime import date
+import polars as pl
+from core.shared_store import SharedStore
+from core import data_manager as dm_module
+from core.data_manager import DataManager
+from core.sector_index import SectorIndex
+
+
+def daily():
+    return pl.DataFrame({
+        "date": [date(2024, 1, 1), date(2024, 1, 2)] * 2,
+        "code": ["sh.600000", "sh.600000", "sz.000001", "sz.000001"],
+        "close": pl.Series([10.0, 12.0, 10.0, 9.0], dtype=pl.Float32),
+    })
+
+
+class TestSharedStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SharedStore(self.tmp.name)
+
+    def tearDown(self):
+        self.store.release()
+        self.tmp.cleanup()
+
+    def test_export_attach_roundtrip(self):
+        manifest = self.store.export({"df_daily": daily(), "df_weekly": None}, {"build_id": "b1"})
+        self.assertEqual((manifest["generation"], manifest["build_id"]), (1, "b1"))
+        self.assertEqual(list(manifest["tables"]), ["df_daily"])
+        tables = self.store.attach(self.store.manifest())
+        self.assertTrue(tables["df_daily"].equals(daily()))
+
+    def test_old_generations_cleaned(self):
+        for _ in range(3):
+            self.store.export({"df_daily": daily()})
+        self.assertEqual(self.store.manifest()["generation"], 3)
+        self.assertEqual(sorted(e for e in os.listdir(self.tmp.name) if e.startswith("gen-")), ["gen-2", "gen-3"])
+
+    def test_single_loader(self):
+        other = SharedStore(self.tmp.name)
+        self.assertTrue(self.store.try_lead())
+        self.assertFalse(other.try_lead())
+        self.store.release()
+        self.assertTrue(other.try_lead())
+        other.release()
+
+    def test_mount_publish_and_list(self):
+        self.store.export({"df_daily": daily()})
+        col = pl.Series("MA_CLOSE_2", [None, 11.0, None, 9.5])
+        published = self.store.publish_mount(1, "df_daily", col)
+        self.assertEqual(published.to_list(), col.to_list())
+        self.assertEqual(self.store.list_mounts(1), {"df_daily": ["MA_CLOSE_2"]})
+        self.assertIsNone(self.store.mounted_column(1, "df_daily", "../x"))
+
+    def test_reload_request_handoff(self):
+        self.assertIsNone(self.store.pop_reload_request())
+        self.store.request_reload(force=True)
+        self.assertTrue(self.store.pop_reload_request()["force"])
+        self.assertIsNone(self.store.pop_reload_request())
+
+    def test_load_error_cleared_by_export(self):
+        self.assertIsNone(self.store.load_error())
+        self.store.publish_load_error("HF unavailable")
+        self.assertEqual(self.store.load_error()["error"], "HF unavailable")
+        self.store.export({"df_daily": daily()})
+        self.assertIsNone(self.store.load_error())
+
+
+class TestSharedWorkers(unittest.TestCase):
+    """加载者导出 → worker 挂接；一个 worker 发布的 Hot-JIT 列被其他 worker 同步"""
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"SHARED_DATA_DIR": self.tmp.name})
+        self.env.start()
+        self.loader = DataManager()
+        self.assertTrue(self.loader.shared.try_lead())
+        self.loader.df_daily = daily()
+        self.loader.df_stock_names = pl.DataFrame({"code": ["sh.600000", "sz.000001"], "name": ["浦发银行", "平安银行"]})
+        self.loader.sector_index = SectorIndex.build(pl.DataFrame({
+            "code": ["sh.600000"], "sector_code": ["BK0475"], "sector_name": ["银行"], "type": ["行业板块"]}))
+        self.loader._export_shared(self.loader)
+
+    def tearDown(self):
+        self.loader.shared.release()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def worker(self):
+        dm = DataManager()
+        asyncio.run(dm.sync_shared())
+        return dm
+
+    def test_worker_attaches_generation(self):
+        dm = self.worker()
+        self.assertEqual((dm.shared_generation, dm.data_version, dm.generation), (1, 1, 1))
+        self.assertTrue(dm.df_daily.equals(daily()))
+        self.assertEqual(dm.code_to_name["sz.000001"], "平安银行")
+        self.assertEqual(dm.sector_index.constituents("BK0475"), ["sh.600000"])
+        self.assertEqual(dm.code_slice("df_daily", "sz.000001")["close"].to_list(), [10.0, 9.0])
+        self.assertEqual(dm.shared_status()["role"], "worker")
+
+    def test_hot_jit_column_shared(self):
+        a, b = self.worker(), self.worker()
+        col = a.df_daily.select(pl.col("close").rolling_mean(2).over("code").alias("MA_CLOSE_2")).to_series()
+        a.publish_column("df_daily", a.shared_generation, col)
+        self.assertNotIn("MA_CLOSE_2", b.df_daily.columns)
+        asyncio.run(b.sync_shared())
+        self.assertEqual(b.df_daily["MA_CLOSE_2"].to_list(), col.to_list())
+        # 已切换到其他代时不发布
+        self.assertIs(a.publish_column("df_daily", 99, col), col)
+
+    def test_worker_forwards_reload_to_loader(self):
+        dm = self.worker()
+        self.assertEqual(asyncio.run(dm.reload(force=True))["status"], "requested")
+        self.assertEqual(self.loader.shared.pop_reload_request()["force"], True)
+
+    def test_new_generation_picked_up(self):
+        dm = self.worker()
+        self.loader.df_daily = daily().with_columns(pl.col("close") * 2)
+        self.loader._export_shared(self.loader)
+        asyncio.run(dm.sync_shared())
+        self.assertEqual(dm.shared_generation, 2)
+        self.assertEqual(dm.df_daily["close"].to_list(), [20.0, 24.0, 20.0, 18.0])
+
+    def test_mount_sync_runs_off_event_loop(self):
+        dm = self.worker()
+        threads = []
+        with mock.patch.object(dm, "_sync_mounts", side_effect=lambda: threads.append(threading.current_thread())):
+            asyncio.run(dm.sync_shared())
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+
+class TestSharedLoaderFailure(unittest.TestCase):
+    """加载者失败：发布原因并释放锁，等待的 worker 上报错误并在退避后接手"""
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"SHARED_DATA_DIR": self.tmp.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def failing_loader(self):
+        loader = DataManager()
+        self.assertTrue(loader.shared.try_lead())
+
+        async def fail():
+            loader.load_error = "HF unavailable"
+            return False
+
+        with mock.patch.object(loader, "load", side_effect=fail):
+            self.assertFalse(asyncio.run(loader._lead_shared_load()))
+        return loader
+
+    def test_failure_published_and_lock_released(self):
+        loader = self.failing_loader()
+        self.assertFalse(loader.shared.is_loader)
+        self.assertEqual(loader.shared.load_error()["error"], "HF unavailable")
+        worker = DataManager()
+        with mock.patch.object(dm_module, "SHARED_LOAD_RETRY_S", 3600), \
+                mock.patch.object(worker, "load") as load:
+            asyncio.run(worker.sync_shared())
+        load.assert_not_called()
+        self.assertFalse(worker.shared.is_loader)
+        self.assertEqual(worker.load_error, "shared loader failed: HF unavailable")
+        self.assertEqual(worker.shared_status()["load_error"], worker.load_error)
+
+    def test_worker_takes_over_after_backoff(self):
+        self.failing_loader()
+        worker = DataManager()
+
+        async def load():
+            worker.df_daily = daily()
+            worker.load_error = None
+            return True
+
+        with mock.patch.object(dm_module, "SHARED_LOAD_RETRY_S", 0), \
+                mock.patch.object(worker, "load", side_effect=load):
+            asyncio.run(worker.sync_shared())
+        self.assertTrue(worker.shared.is_loader)
+        self.assertEqual(worker.shared.manifest()["generation"], 1)
+        self.assertIsNone(worker.shared.load_error())
+        # 下一次同步挂接自己导出的共享代
+        asyncio.run(worker.sync_shared())
+        self.assertEqual(worker.shared_generation, 1)
+        self.assertIsNone(worker.load_error)
+        worker.shared.release()
+
+
+if __name__ == "__main__":
+    unittest.main()
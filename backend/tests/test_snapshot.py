@@ -0,0 +1,131 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import socket
+import asyncio
+import threading
+import unittest
+from unittest import mock
+from datetime import date
+import polars as pl
+import uvicorn
+from fastapi import FastAPI
+from core.data_manager import DataManager, data_manager
+from core.sector_index import SectorIndex
+from core.snapshot import SnapshotClient, encode_part, decode_part, _concat_common
+from api.routes import router
+from api.admin import router as admin_router
+
+CODES = [f"sh.60{i:04d}" for i in range(12)]
+SAVED = DataManager.DATASET_ATTRS + ("build_id", "shards", "data_version")
+
+
+def daily():
+    return pl.DataFrame({
+        "date": [date(2024, 1, d) for _ in CODES for d in (1, 2, 3)],
+        "code": [c for c in CODES for _ in range(3)],
+        "close": [float(i) for i in range(len(CODES) * 3)],
+        "MA_CLOSE_2": [1.0] * (len(CODES) * 3),
+    })
+
+
+class PeerCase(unittest.TestCase):
+    """用单例 data_manager 充当对等节点（持有全部 3 个分片），在独立线程中运行 uvicorn"""
+    def setUp(self):
+        self._saved = {a: getattr(data_manager, a) for a in SAVED}
+        self.env = mock.patch.dict(os.environ, {"ADMIN_TOKEN": "peer-secret"})
+        self.env.start()
+        data_manager.build_id = "b1"
+        data_manager.shards = [0, 1, 2]
+        data_manager.row_index = {}
+        data_manager.df_daily = daily()
+        data_manager.df_weekly = data_manager.df_monthly = None
+        data_manager.df_sector_daily = pl.DataFrame({"date": [date(2024, 1, 1)] * 3, "code": ["BK1", "BK2", "BK3"],
+                                                     "close": [1.0, 2.0, 3.0]})
+        data_manager.df_sector_weekly = data_manager.df_sector_monthly = None
+        data_manager.df_stock_names = pl.DataFrame({"code": CODES, "name": [f"N{i}" for i in range(len(CODES))]})
+        data_manager.df_mapping = data_manager.df_sector_list = None
+        data_manager.sector_index = SectorIndex.build(pl.DataFrame({
+            "code": CODES[:2], "sector_code": ["BK1", "BK1"], "sector_name": ["银行", "银行"], "type": ["行业板块"] * 2}))
+        data_manager._build_row_indexes()
+        data_manager._build_shard_codes()
+
+        app = FastAPI()
+        app.include_router(router)
+        app.include_router(admin_router)
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off"))
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+
+    def tearDown(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+        for a, v in self._saved.items():
+            setattr(data_manager, a, v)
+        self.env.stop()
+
+    def receiver(self, build_id="b1"):
+        dm = DataManager()
+        dm.build_id = build_id
+        dm.shards = [0]
+        return dm
+
+
+class TestWarmStart(PeerCase):
+    def test_pulls_own_shard_from_peer(self):
+        dm = self.receiver()
+        # 每个分区 1 个代码，覆盖多分区拼接
+        with mock.patch("api.admin.SNAPSHOT_CODES_PER_PART", 1):
+            self.assertTrue(asyncio.run(dm.warm_start([self.url])))
+        expected = daily().filter((pl.col("code").hash() % 3) == 0)
+        self.assertTrue(dm.df_daily.sort(["code", "date"]).equals(expected.sort(["code", "date"])))
+        self.assertEqual(dm.shard_codes[0], sorted(set(expected["code"].to_list())))
+        code = expected["code"][0]
+        self.assertEqual(dm.code_slice("df_daily", code)["close"].to_list(),
+                         expected.filter(pl.col("code") == code)["close"].to_list())
+        self.assertEqual(dm.df_sector_daily.height, 3)
+        self.assertEqual(dm.code_to_name[CODES[1]], "N1")
+        self.assertEqual(dm.sector_index.constituents("BK1"), CODES[:2])
+        self.assertEqual(dm.data_version, 1)
+        self.assertGreater(len(dm.shard_codes[0]), 1)
+
+    def test_build_id_mismatch_falls_back(self):
+        self.assertFalse(asyncio.run(self.receiver("other").warm_start([self.url])))
+
+    def test_snapshot_requires_token(self):
+        import httpx
+        self.assertEqual(httpx.get(f"{self.url}/api/v1/admin/snapshot").status_code, 401)
+
+    def test_version_change_rejected(self):
+        import httpx
+        res = httpx.get(f"{self.url}/api/v1/admin/snapshot/part", headers={"X-Admin-Token": "peer-secret"},
+                        params={"table": "df_daily", "shard": "0", "part": 0, "version": 999})
+        self.assertEqual(res.status_code, 409)
+
+
+class TestSnapshotHelpers(unittest.TestCase):
+    def test_checksum_verified(self):
+        body, checksum = encode_part(daily())
+        self.assertTrue(decode_part(body, checksum).equals(daily()))
+        with self.assertRaises(ValueError):
+            decode_part(bytes([body[0] ^ 1]) + body[1:], checksum)
+
+    def test_plan_requires_every_shard(self):
+        manifests = {"a": {"shards": [0, 1]}, "b": {"shards": [1, 2]}}
+        self.assertEqual(SnapshotClient.plan(manifests, [1, 2]), {"all": "a", "1": "a", "2": "b"})
+        self.assertIsNone(SnapshotClient.plan({"a": {"shards": [0]}}, [0, 2]))
+
+    def test_only_common_columns_kept(self):
+        merged = _concat_common([daily(), daily().drop("MA_CLOSE_2")])
+        self.assertNotIn("MA_CLOSE_2", merged.columns)
+        self.assertEqual(merged.height, 2 * daily().height)
+
+
+if __name__ == "__main__":
+    unittest.main()
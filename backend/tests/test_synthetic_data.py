@@ -0,0 +1,78 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+import polars as pl
+from core.data_manager import DataManager
+from scripts.gen_synthetic_data import generate, trading_days
+
+
+class TestSyntheticDataset(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.dir = cls.tmp.name
+        cls.summary = generate(cls.dir, n_codes=60, years=2, end_year=2025, n_concepts=10, flow_years=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def read(self, name):
+        return pl.read_parquet(os.path.join(self.dir, f"{name}.parquet"))
+
+    def test_layout_and_schema(self):
+        self.assertEqual(sorted(self.summary["files"]), sorted([
+            "stock_list", "sector_list", "stock_kline_2024", "stock_kline_2025", "stock_money_flow_2025",
+            "sector_kline_2024", "sector_kline_2025", "sector_constituents_2025"]))
+        kline = self.read("stock_kline_2025")
+        self.assertEqual(kline.schema["date"], pl.String)
+        self.assertEqual(kline.schema["close"], pl.Float32)
+        self.assertEqual(kline.schema["isST"], pl.Int8)
+        self.assertTrue(kline["code"].str.contains(r"^(sh|sz|bj)\.\d{6}$").all())
+        self.assertTrue(kline.select(pl.col("code").is_sorted()).item())
+        self.assertTrue((kline["high"] >= kline["low"]).all())
+        members = self.read("sector_constituents_2025")
+        self.assertTrue(members["stock_code"].str.contains(r"^\d{6}$").all())
+        sectors = self.read("sector_list")
+        self.assertEqual(set(sectors["type"]), {"行业板块", "概念板块", "地域板块"})
+        # 示例查询 IN_SECTOR("BK1036") 在合成数据上可用
+        self.assertIn("BK1036", sectors["code"].to_list())
+
+    def test_calendar_and_adjust_factor(self):
+        days = trading_days(2025)
+        self.assertTrue(235 <= len(days) <= 250)
+        self.assertTrue(all(d.weekday() < 5 for d in days))
+        kline = pl.concat([self.read("stock_kline_2024"), self.read("stock_kline_2025")])
+        # 复权因子按代码单调不减（累乘后复权）
+        steps = kline.sort(["code", "date"]).select(
+            (pl.col("adjustFactor").diff().over("code") >= -1e-6).fill_null(True).all()).item()
+        self.assertTrue(steps)
+        self.assertGreater(kline["adjustFactor"].max(), 1.0)
+
+    def test_deterministic_for_seed(self):
+        with tempfile.TemporaryDirectory() as other:
+            generate(other, n_codes=60, years=2, end_year=2025, n_concepts=10, flow_years=1)
+            again = pl.read_parquet(os.path.join(other, "stock_kline_2025.parquet"))
+        self.assertTrue(again.equals(self.read("stock_kline_2025")))
+
+    def test_data_manager_loads_local_dir(self):
+        with mock.patch.dict(os.environ, {"DATA_DIR": self.dir, "NODE_SHARDS": "0,1,2"}):
+            dm = DataManager()
+        self.assertTrue(asyncio.run(dm.async_load_data()))
+        self.assertTrue(dm.dataset_revision.startswith("local-"))
+        self.assertEqual(dm.df_stock_names.height, 60)
+        self.assertEqual(dm.df_daily["code"].n_unique(), self.read("stock_list").height)
+        self.assertIn("net_amount", dm.df_daily.columns)
+        self.assertIsNotNone(dm.df_weekly)
+        self.assertIsNotNone(dm.df_sector_monthly)
+        self.assertEqual(dm.df_mapping.height, 60)
+        self.assertIn("download", dm.load_stages)
+        self.assertEqual(asyncio.run(dm.fetch_revision()), dm.dataset_revision)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite3
+import tempfile
+import unittest
+from core.usage import UsageAggregator, SqliteUsageBackend
+
+
+class FailingBackend:
+    def write(self, rows):
+        raise RuntimeError("db down")
+
+    def close(self):
+        pass
+
+
+class TestUsageAggregator(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "usage.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_counts(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return dict(conn.execute("SELECT metric_key, usage_count FROM metrics_stats").fetchall())
+        finally:
+            conn.close()
+
+    def test_counts_aggregated_into_single_flush(self):
+        agg = UsageAggregator(SqliteUsageBackend(self.path))
+        agg.record("CLOSE > MA(CLOSE, 20)")
+        agg.record("CROSS_UP(MA(CLOSE, 20), MA(CLOSE, 60))")
+        agg.record("PE_TTM < 20")
+        self.assertEqual(agg.pending(), 2)
+        self.assertEqual(agg.flush(), 2)
+        self.assertEqual(self.read_counts(), {"MA_CLOSE_20": 2, "MA_CLOSE_60": 1})
+        self.assertEqual(agg.pending(), 0)
+
+    def test_upsert_accumulates_across_flushes(self):
+        agg = UsageAggregator(SqliteUsageBackend(self.path))
+        agg.record("ema(close, 12) > 0")
+        agg.flush()
+        agg.record("EMA(CLOSE, 12) > 1")
+        agg.close()
+        self.assertEqual(self.read_counts(), {"EMA_CLOSE_12": 2})
+
+    def test_bounded_keys(self):
+        agg = UsageAggregator(SqliteUsageBackend(self.path), max_keys=2)
+        agg.record("MA(CLOSE, 1) > MA(CLOSE, 2) AND MA(CLOSE, 3) > 0")
+        self.assertEqual(agg.pending(), 2)
+        self.assertEqual(agg.dropped, 1)
+
+    def test_failed_flush_keeps_counts(self):
+        agg = UsageAggregator(FailingBackend())
+        agg.record("MA(CLOSE, 5) > 0")
+        self.assertEqual(agg.flush(), 0)
+        self.assertEqual(agg.pending(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()